@@ -0,0 +1,158 @@
+import os
+import posixpath
+import sys
+
+import file_access
+import profiling
+
+# Walk through tar and zip archives of calculations without extracting them (--archives on).
+# The members of an archive appear as directories below the path of the archive,
+# e.g. the member calc1/water.out of ./old/project.tar is parsed as ./old/project.tar/calc1/water.out.
+# The archive is read once from the beginning to the end: the tar stream (also compressed, .tar.zst needs zstandard)
+# member by member, the zip members in the order of their offsets. The files which the parsers may read
+# (the same selection by name as for prefetch.py) are kept in memory, the others are only listed.
+# A directory is complete, as soon as a member outside of it appears (tar and zip write the directories depth first),
+# then it is yielded with the contents of its files, which are registered in file_access while it is parsed.
+# In memory are only the files of the directories on the path to the current member.
+# A directory whose members are scattered over the archive is yielded once per part.
+# The signature of the files for the manifest cache is (size, mtime) for tar and (size, CRC) for zip members.
+# The ignore rules and --max_depth apply to the directories on disk, archives in archives are not entered.
+
+TAR_SUFFIXES = ('.tar', '.tgz', '.tar.gz', '.tar.xz', '.tar.bz2', '.tar.zst')
+ZIP_SUFFIXES = ('.zip',)
+
+
+def archive_format(filename):
+    """Returns 'tar' or 'zip' for the supported archives, None for other files"""
+    lower = filename.lower()
+    if lower.endswith(ZIP_SUFFIXES):
+        return 'zip'
+    if lower.endswith('.tar.zst') and not file_access.zstandard_available():
+        return None
+    if lower.endswith(TAR_SUFFIXES):
+        return 'tar'
+    return None
+
+
+def open_stream(path):
+    """Opens a tar archive for reading bytes, compressed archives are decompressed while they are read"""
+    if path.lower().endswith('.tgz'):
+        import gzip
+        return gzip.open(path, 'rb')
+    if path.lower().endswith('.tar'):
+        return open(path, 'rb')
+    return file_access.open_compressed(path)
+
+
+def member_path(name):
+    """Normalizes the name of a member to a relative path below the top of the archive ('' for the top)"""
+    return posixpath.normpath('/' + name.replace('\\', '/')).lstrip('/')
+
+
+def tar_members(path):
+    """Yields (name, is_dir, signature, read) for the members of a tar archive, read() returns the bytes of a file"""
+    import tarfile
+
+    with open_stream(path) as stream, tarfile.open(fileobj=stream, mode='r|') as archive:
+        for member in archive:
+            if member.isdir():
+                yield member.name, True, None, None
+            elif member.isfile():
+                yield member.name, False, (member.size, member.mtime), lambda member=member: archive.extractfile(member).read()
+            elif member.issym() or member.islnk():
+                yield member.name, False, None, None
+
+
+def zip_members(path):
+    """Yields (name, is_dir, signature, read) for the members of a zip archive in the order of their offsets"""
+    import zipfile
+
+    with zipfile.ZipFile(path) as archive:
+        for info in sorted(archive.infolist(), key=lambda info: info.header_offset):
+            if info.is_dir():
+                yield info.filename, True, None, None
+            else:
+                yield info.filename, False, (info.file_size, info.CRC), lambda info=info: archive.read(info)
+
+
+def keep_filter(args):
+    """Returns a function filename -> True for the files of archives which the enabled parsers may read"""
+    import prefetch
+
+    def keep(filename):
+        suffix = file_access.compression_of(filename)
+        plain = filename[:-len(suffix)] if suffix is not None else filename
+        return bool(prefetch.selected_filenames([plain], args))
+    return keep
+
+
+class OpenDirectory:
+    """Members of a directory of an archive which is not complete yet"""
+
+    def __init__(self):
+        self.dirs = []
+        self.files = []
+        self.signature = {}
+        self.contents = {}
+
+
+def walk_archive(path, keep):
+    """
+    Walks through the members of the archive at path in one pass and yields (root, dirs, files, signature, contents)
+    for every directory, as soon as it is complete (see above). The root of the top directory is path.
+
+    :param keep: function filename -> bool, the bytes of the files for which it is True are in contents (root/filename -> bytes).
+    Errors of corrupted archives are reported on stderr, the directories read until then are yielded.
+    """
+    members = zip_members(path) if archive_format(path) == 'zip' else tar_members(path)
+    opened = {} # relative path of the directory -> OpenDirectory, in the order of the walk
+    completed = set()
+
+    def root_of(directory):
+        return os.path.join(path, *directory.split('/')) if directory else path
+
+    def open_directory(directory):
+        """Returns the OpenDirectory of a relative path, its parents are opened as well"""
+        entry = opened.get(directory)
+        if entry is not None:
+            return entry
+        if directory in completed:
+            profiling.profiler.count('archive directories split')
+        if directory:
+            parent, name = posixpath.split(directory)
+            siblings = open_directory(parent).dirs
+            if name not in siblings:
+                siblings.append(name)
+        entry = opened[directory] = OpenDirectory()
+        return entry
+
+    def finished(directory):
+        """Yields and forgets the open directories which are not directory or one of its parents"""
+        for other in [other for other in opened if other and other != directory and not directory.startswith(other + '/')]:
+            entry = opened.pop(other)
+            completed.add(other)
+            yield root_of(other), entry.dirs, entry.files, entry.signature, entry.contents
+
+    try:
+        for name, is_dir, signature, read in members:
+            relative = member_path(name)
+            directory = relative if is_dir else posixpath.dirname(relative)
+            yield from finished(directory)
+            entry = open_directory(directory)
+            if is_dir:
+                continue
+            filename = posixpath.basename(relative)
+            entry.files.append(filename)
+            entry.signature[filename] = signature
+            if read is not None and keep(filename):
+                data = read()
+                entry.contents[os.path.join(root_of(directory), filename)] = data
+                profiling.profiler.count('archive files read')
+                profiling.profiler.count('archive bytes read', len(data))
+    except Exception as e:
+        print(f"Error in archive {path}: {type(e).__name__}: {e}", file=sys.stderr)
+
+    # the remaining directories, the parents first
+    for directory in list(opened):
+        entry = opened.pop(directory)
+        yield root_of(directory), entry.dirs, entry.files, entry.signature, entry.contents
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Compares the per-line cost of the LineScanner with the former parse_file,
+which compiled all patterns per call and tried all of them on every line.
+
+python3 benchmarks/bench_line_scanner.py [--atoms 50] [--cycles 50]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import my_constants as mc
+from parse_orca_calculation import orca_scanner
+from synthetic import orca_output
+
+
+def legacy_parse_file(lines, data):
+    """parse_file before the LineScanner, working on a list of lines"""
+    temperature_pattern =         re.compile(r'Temperature\s+\.\.\.\s+([\d\.]+)\s+K')
+    pressure_pattern =            re.compile(r'Pressure\s+\.\.\.\s+([\d\.]+)\s+atm')
+    mass_pattern =                re.compile(r'Total Mass\s+\.\.\.\s+([\d\.]+)\s+AMU')
+    gibbs_energy_pattern =        re.compile(r'Final Gibbs free energy\s+\.\.\.\s+([\d\.\-]+)\s+Eh')
+    inner_energy_pattern =        re.compile(r'Total correction\s+([\d\.\-]+)\s+Eh\s+([\d\.\-]+)\s+kcal/mol')
+    entropy_correction_pattern =  re.compile(r'Total entropy correction\s+\.\.\.\s+([\d\.\-]+)\s+Eh\s+([\d\.\-]+)\s+kcal/mol')
+    dipole_moment_pattern =       re.compile(r'Total Dipole Moment\s+:\s+([\d\.\-]+)\s+([\d\.\-]+)\s+([\d\.\-]+)')
+    num_atoms_pattern =           re.compile(r'Number of atoms\s+\.\.\.\s+(\d+)')
+    single_point_energy_pattern = re.compile(r'FINAL SINGLE POINT ENERGY\s+([\d\.\-]+)')
+    ge_el_pattern =               re.compile(r'G-E\(el\)\s+\.\.\.\s+([\d\.\-]+)\s+Eh\s+([\d\.\-]+)\s+kcal/mol')
+    zero_point_energy_pattern =   re.compile(r'Zero point energy\s+\.\.\.\s+([\d\.\-]+)\s+Eh\s+([\d\.\-]+)\s+kcal/mol')
+    for line in lines:
+        match = temperature_pattern.match(line)
+        if match:
+            data['Temperature'] = float(match.group(1))
+        match = pressure_pattern.match(line)
+        if match:
+            data['Pressure'] = float(match.group(1))
+        match = mass_pattern.match(line)
+        if match:
+            data['Total Mass'] = float(match.group(1))
+        match = single_point_energy_pattern.match(line)
+        if match:
+            data['Single Point Energy'] = float(match.group(1)) * mc.EH2KJMOL
+        match = gibbs_energy_pattern.match(line)
+        if match:
+            data['Final Gibbs Free Energy'] = float(match.group(1)) * mc.EH2KJMOL
+        match = ge_el_pattern.match(line)
+        if match:
+            data['G-E(el) Energy'] = float(match.group(1)) * mc.EH2KJMOL
+        match = inner_energy_pattern.match(line)
+        if match:
+            data['Inner Energy'] = float(match.group(1)) * mc.EH2KJMOL
+        match = entropy_correction_pattern.match(line)
+        if match:
+            data['Entropy Correction'] = float(match.group(1)) * mc.EH2KJMOL
+        match = dipole_moment_pattern.match(line)
+        if match:
+            data['Total Dipole Moment'] = [float(match.group(i)) for i in range(1, 4)]
+        match = num_atoms_pattern.match(line)
+        if match:
+            data['Number of Atoms'] = int(match.group(1))
+        match = zero_point_energy_pattern.search(line)
+        if match:
+            data['zpe'] = float(match.group(1))
+    return data
+
+
+def best_of(function, repeat):
+    """Returns the shortest of repeat runs in seconds and the result"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--atoms', type=int, default=50)
+    parser.add_argument('--cycles', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    lines = orca_output(n_atoms=args.atoms, n_cycles=args.cycles).splitlines(keepends=True)
+    legacy_time, legacy = best_of(lambda: legacy_parse_file(lines, {}), args.repeat)
+    scanner_time, scanned = best_of(lambda: orca_scanner().scan(lines, {}), args.repeat)
+    if legacy != scanned:
+        raise AssertionError(f"results differ:\n{legacy}\n{scanned}")
+
+    print(f"{len(lines)} lines")
+    print(f"legacy parse_file: {legacy_time*1e9/len(lines):8.1f} ns/line")
+    print(f"LineScanner:       {scanner_time*1e9/len(lines):8.1f} ns/line")
+    print(f"speedup:           {legacy_time/scanner_time:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Measures the crawl of a synthetic tree on a simulated network file system,
+every open() of a file in the tree is delayed by --latency ms.
+Compares the crawl without read-ahead with the crawl with --prefetch_threads threads,
+the parsed calculations have to be identical.
+
+python3 benchmarks/bench_prefetch.py [--directories 200] [--latency 5] [--threads 16]
+"""
+import argparse
+import builtins
+import contextlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic
+
+
+def make_tree(top, n_directories):
+    for i in range(n_directories):
+        directory = os.path.join(top, f'calc{i:05d}')
+        os.makedirs(directory)
+        synthetic.write(os.path.join(directory, 'mol.out'), synthetic.orca_output(n_atoms=12, n_cycles=5, seed=i))
+        geometry = synthetic.random_geometry(12, random.Random(i))
+        synthetic.write(os.path.join(directory, 'mol.xyz'),
+                        f"{len(geometry)}\n\n" + ''.join(f"{e} {x:.6f} {y:.6f} {z:.6f}\n" for e, x, y, z in geometry))
+
+
+def delayed_open(latency, top):
+    """Returns a replacement of open, which sleeps latency seconds for the files below top"""
+    real_open = builtins.open
+
+    def open_file(file, *args, **kwargs):
+        if isinstance(file, str) and os.path.abspath(file).startswith(top):
+            time.sleep(latency)
+        return real_open(file, *args, **kwargs)
+    return open_file, real_open
+
+
+def crawl(argv):
+    import qcdc
+    import symmetry
+    from parse_args import get_arguments
+    symmetry._cache.clear()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        calculations = list(qcdc.iter_calculations('.', get_arguments(argv)))
+    return time.perf_counter() - start, calculations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--directories', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=5, help="delay of every open in ms")
+    parser.add_argument('--threads', type=int, default=16)
+    args = parser.parse_args()
+
+    top = tempfile.mkdtemp(prefix='qcdc_prefetch_')
+    cwd = os.getcwd()
+    try:
+        make_tree(top, args.directories)
+        os.chdir(top)
+        open_file, real_open = delayed_open(args.latency * 1e-3, top)
+        builtins.open = open_file
+        try:
+            common = ['--xyz', 'off', '--ignore_folders', os.devnull]
+            crawl(common) # imports
+            plain_time, plain = crawl(common)
+            prefetch_time, prefetched = crawl(common + ['--prefetch_threads', str(args.threads)])
+        finally:
+            builtins.open = real_open
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(top)
+
+    same = repr(plain) == repr(prefetched)
+    n = args.directories
+    print(f"{n} directories, {args.latency:.1f} ms per open, identical results: {same}")
+    print(f"without read-ahead:      {plain_time:8.2f} s  {n/plain_time:8.1f} directories/s")
+    print(f"{args.threads:3d} read-ahead threads: {prefetch_time:8.2f} s  {n/prefetch_time:8.1f} directories/s")
+    print(f"speedup: {plain_time/prefetch_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Compares the walk of scanner.scan with the former os.walk wrapper (ignore_dirs_by_name)
+on a synthetic tree of empty files, both with the default ignore folders of qcdc.
+The visited directories have to be identical, unless the tree has an ./xyz directory (--xyz_files),
+which the wrapper did not prune, because the ignore list contained a nested list.
+
+python3 benchmarks/bench_scanner.py [--entries 1000000] [--files 20] [--xyz_files 0] [--repeat 3]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scanner
+
+IGNORE_FOLDERS = ['./xyz', '__pycache__', '.venv', '.git', '.qcdc_cache']
+# the former ignore list of read_ignore_folders
+LEGACY_IGNORE_FOLDERS = [['./xyz', './__pycache__', './.venv', './.git'], '.qcdc_cache']
+
+
+def legacy_walk(top, ignore_names):
+    """The former ignore_dirs_by_name of qcdc.py"""
+    for root, dirs, files in os.walk(top):
+        dirs[:] = [d for d in dirs if d not in ignore_names]
+        yield root, dirs, files
+
+
+def make_tree(top, n_entries, files_per_directory):
+    """Directories of files_per_directory empty files, 10 subdirectories per directory"""
+    count = 0
+    queue = [top]
+    while count < n_entries:
+        parent = queue.pop(0)
+        for i in range(10):
+            directory = os.path.join(parent, f'd{i}')
+            os.mkdir(directory)
+            for j in range(files_per_directory):
+                open(os.path.join(directory, f'f{j}.out'), 'w').close()
+            queue.append(directory)
+            count += files_per_directory + 1
+            if count >= n_entries:
+                break
+    return count
+
+
+def best_of(walk, repeat):
+    best, roots = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        roots = [root for root, dirs, files in walk()]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, roots
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=200000)
+    parser.add_argument('--files', type=int, default=20, help="files per directory")
+    parser.add_argument('--xyz_files', type=int, default=0, help="files in ./xyz")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    top = tempfile.mkdtemp(prefix='qcdc_scanner_')
+    cwd = os.getcwd()
+    try:
+        n_entries = make_tree(top, args.entries, args.files)
+        if args.xyz_files:
+            os.mkdir(os.path.join(top, 'xyz'))
+            for i in range(args.xyz_files):
+                open(os.path.join(top, 'xyz', f'calc_{i}.xyz'), 'w').close()
+            n_entries += args.xyz_files + 1
+        os.chdir(top)
+        rules = scanner.IgnoreRules(IGNORE_FOLDERS)
+        legacy_time, legacy_roots = best_of(lambda: legacy_walk('.', LEGACY_IGNORE_FOLDERS), args.repeat)
+        scan_time, scan_roots = best_of(lambda: scanner.scan('.', rules), args.repeat)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(top)
+
+    print(f"{n_entries} entries in {len(scan_roots)} directories, identical walk: {legacy_roots == scan_roots}")
+    print(f"os.walk wrapper: {legacy_time:8.3f} s  {n_entries/legacy_time/1e6:6.2f} M entries/s")
+    print(f"scanner.scan:    {scan_time:8.3f} s  {n_entries/scan_time/1e6:6.2f} M entries/s")
+    print(f"speedup: {legacy_time/scan_time:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
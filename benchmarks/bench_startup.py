@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Measures the startup time of 'qcdc.py --help' against a budget and
+lists the modules which are imported by it and take longest (python -X importtime).
+Exits with status 1 if the budget is exceeded.
+
+python3 benchmarks/bench_startup.py [--budget 150] [--repeat 10]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QCDC = os.path.join(ROOT, 'qcdc.py')
+
+
+def best_of(command, repeat):
+    """Returns the shortest wall time of repeat runs in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def slowest_imports(command, count):
+    """Returns the count top level imports with the largest cumulative import time (us, module)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + command[1:],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name[1:].startswith(' '): # top level imports only
+            imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget', type=float, default=150, help="budget for 'qcdc.py --help' in ms")
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    interpreter = best_of([sys.executable, '-c', 'pass'], args.repeat)
+    command = [sys.executable, QCDC, '--help']
+    help_time = best_of(command, args.repeat)
+
+    print(f"python -c pass:   {interpreter*1e3:8.1f} ms")
+    print(f"qcdc.py --help:   {help_time*1e3:8.1f} ms (budget {args.budget:.0f} ms)")
+    print("slowest imports:")
+    for cumulative, name in slowest_imports(command, 5):
+        print(f"  {cumulative/1e3:8.1f} ms  {name}")
+    if help_time * 1e3 > args.budget:
+        print("budget exceeded")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
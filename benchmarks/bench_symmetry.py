@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Compares symmetry.point_group_and_symmetry_number with the PointGroupAnalyzer of pymatgen
+on random molecules, which are symmetrized with the operations of the point groups of asymmetric tops,
+randomly rotated and distorted. The results have to be identical.
+
+python3 benchmarks/bench_symmetry.py [--molecules 40] [--atoms 8]
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import common_functions
+import elements
+import symmetry
+
+GENERATORS = {
+    'C1': [],
+    'Cs': [(1, 1, -1)],
+    'Ci': [(-1, -1, -1)],
+    'C2': [(-1, -1, 1)],
+    'C2v': [(-1, -1, 1), (1, -1, 1), (-1, 1, 1)],
+    'C2h': [(-1, -1, 1), (1, 1, -1), (-1, -1, -1)],
+    'D2': [(-1, -1, 1), (1, -1, -1), (-1, 1, -1)],
+    'D2h': [diagonal for diagonal in itertools.product((1, -1), repeat=3) if diagonal != (1, 1, 1)],
+}
+
+
+def symmetric_molecule(operations, n_orbits, rng):
+    """Returns atomic numbers and coordinates of n_orbits random atoms and their images"""
+    numbers, coordinates = [], []
+    for _ in range(n_orbits):
+        point = rng.uniform(-3, 3, 3) * [1.0, 1.4, 1.9]
+        orbit = [point] + [np.array(diagonal) * point for diagonal in operations]
+        if any(np.linalg.norm(p - q) < 0.7 for p, q in itertools.combinations(orbit, 2)):
+            continue
+        if any(np.linalg.norm(p - q) < 0.9 for p in orbit for q in coordinates):
+            continue
+        coordinates += orbit
+        numbers += [rng.choice([1, 6, 7, 8, 9, 17])] * len(orbit)
+    return np.array(numbers, dtype=np.uint8), np.array(coordinates)
+
+
+def random_rotation(rng):
+    q, r = np.linalg.qr(rng.normal(size=(3, 3)))
+    return q * np.sign(np.diag(r))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--molecules', type=int, default=40, help="molecules per point group")
+    parser.add_argument('--atoms', type=int, default=8, help="maximum number of orbits per molecule")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    molecules = []
+    for operations in GENERATORS.values():
+        for _ in range(args.molecules):
+            numbers, coordinates = symmetric_molecule(operations, rng.integers(2, args.atoms + 1), rng)
+            if len(numbers) < 3:
+                continue
+            coordinates = coordinates @ random_rotation(rng).T + rng.normal(size=3)
+            coordinates += rng.normal(scale=rng.choice([0.0, 0.01, 0.05, 0.1]), size=coordinates.shape)
+            molecules.append((numbers, coordinates))
+
+    start = time.perf_counter()
+    reference = [common_functions.determine_point_group_and_symmetry_number(elements.symbols(numbers), coordinates)
+                 for numbers, coordinates in molecules]
+    analyzer_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = [symmetry.point_group_and_symmetry_number(numbers, coordinates) for numbers, coordinates in molecules]
+    first_time = time.perf_counter() - start
+
+    # the same geometries again, translated (e.g. the SP after an optimization)
+    start = time.perf_counter()
+    for numbers, coordinates in molecules:
+        symmetry.point_group_and_symmetry_number(numbers, coordinates + 1.0)
+    cached_time = time.perf_counter() - start
+
+    differences = [(ref, result) for ref, result in zip(reference, results) if ref != result]
+    for ref, result in differences:
+        print(f"pymatgen {ref} symmetry {result}")
+
+    n = len(molecules)
+    print(f"{n} molecules, {len(differences)} differences, {symmetry.counts}")
+    print(f"pymatgen:         {analyzer_time*1e3/n:8.2f} ms/molecule")
+    print(f"symmetry:         {first_time*1e3/n:8.2f} ms/molecule")
+    print(f"symmetry, cached: {cached_time*1e3/n:8.2f} ms/molecule")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks of the parsers and of the thermochemistry on synthetic files (see synthetic.py).
+Reports MB/s (bytes of the parsed files) and records/s (parsed files or calculations) per benchmark
+and compares them with a stored baseline.
+
+python3 benchmarks/run_benchmarks.py                      # compare with benchmarks/baseline.json
+python3 benchmarks/run_benchmarks.py --save baseline.json # store the results as new baseline
+python3 benchmarks/run_benchmarks.py --check              # exit with status 1 on regressions
+python3 benchmarks/run_benchmarks.py --filter orca        # only the benchmarks containing 'orca'
+
+The baseline is specific to the machine, store a new one before comparing changes on another machine.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+import synthetic
+
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+Benchmark = namedtuple('Benchmark', ['name', 'function', 'n_bytes', 'n_records'])
+Benchmark.__doc__ = """
+name : name of the benchmark
+function : function without arguments, which is timed
+n_bytes : bytes of the files which are read by one call
+n_records : number of records (files, calculations) of one call
+"""
+
+
+def file_size(*paths):
+    return sum(os.path.getsize(path) for path in paths)
+
+
+def orca_benchmarks(top):
+    import parse_orca_calculation as orca
+
+    benchmarks = []
+    for label, n_atoms, n_cycles in (('small', 20, 5), ('large', 100, 50)):
+        path = os.path.join(top, f'orca_{label}.out')
+        synthetic.write(path, synthetic.orca_output(n_atoms=n_atoms, n_cycles=n_cycles))
+        size = file_size(path)
+        benchmarks += [
+            Benchmark(f'orca read_orca_output {label}', lambda path=path: orca.read_orca_output(path), size, 1),
+            Benchmark(f'orca read_orca_output trajectory {label}', lambda path=path: orca.read_orca_output(path, True), size, 1),
+            Benchmark(f'orca is_orca_output {label}', lambda path=path: orca.is_orca_output(path), size, 1),
+        ]
+    return benchmarks
+
+
+def turbomole_benchmarks(top):
+    import common_functions
+    import parse_turbomole_calculation as turbomole
+
+    benchmarks = []
+    for label, n_atoms, n_cycles in (('small', 20, 10), ('large', 200, 100)):
+        directory = os.path.join(top, f'turbomole_{label}')
+        synthetic.write_directory(directory, synthetic.turbomole_files(n_atoms=n_atoms, n_cycles=n_cycles))
+        path = lambda filename, directory=directory: os.path.join(directory, filename)
+        files = sorted(os.listdir(directory))
+        read_files = [path(filename) for filename in files if filename in turbomole.TURBOMOLE_FILES]
+        benchmarks += [
+            Benchmark(f'turbomole get_coord3 {label}', lambda d=directory: common_functions.get_coord3(d), file_size(path('coord')), 1),
+            Benchmark(f'turbomole get_vibspectrum {label}', lambda d=directory: turbomole.get_vibspectrum(d), file_size(path('vibspectrum')), 1),
+            Benchmark(f'turbomole get_energy2 {label}', lambda d=directory: turbomole.get_energy2(d), file_size(path('energy')), 1),
+            Benchmark(f'turbomole get_control2 {label}', lambda d=directory: turbomole.get_control2({}, d, 'control'), file_size(path('control')), 1),
+            Benchmark(f'turbomole get_gradients {label}', lambda d=directory: turbomole.get_gradients(d), file_size(path('gradient')), 1),
+            Benchmark(f'turbomole parse_turbomole {label}', lambda d=directory, f=files: turbomole.parse_turbomole(d, [], f),
+                      file_size(*read_files), 1),
+        ]
+    return benchmarks
+
+
+def censo_benchmarks(top):
+    import parse_censo_calculation as censo
+
+    benchmarks = []
+    for label, n_conformers, n_parts in (('small', 20, 3), ('large', 1000, 4)):
+        path = os.path.join(top, f'censo_{label}.out')
+        synthetic.write(path, synthetic.censo_output(n_conformers=n_conformers, n_parts=n_parts))
+        benchmarks.append(Benchmark(f'censo parse_censo_file {label}', lambda path=path: censo.parse_censo_file(path), file_size(path), 1))
+
+    # populations of 1000 conformers at 201 temperatures
+    table = censo.censo_table(censo.read_censo_tables(path)[-1][0])
+    temperatures = [200.0 + i for i in range(201)]
+    benchmarks.append(Benchmark('censo reweight large', lambda: censo.reweight(table, temperatures), 0, len(table) * len(temperatures)))
+    return benchmarks
+
+
+def thermochemistry_benchmarks(top, n_calculations=200):
+    import random
+    import common_functions
+
+    calculations = []
+    for i in range(n_calculations):
+        rng = random.Random(i)
+        geometry = synthetic.random_geometry(20, rng)
+        calculations.append({
+            'RootFile': f'./calc{i}/mol.out',
+            'Elements': [element for element, *_ in geometry],
+            'xyz Coordinates': [(x, y, z) for _, x, y, z in geometry],
+            'Frequencies': [rng.uniform(30, 3500) for _ in range(54)],
+            'Frequency Calculation': True,
+            'Symmetry Number': 1,
+        })
+
+    def single():
+        for calculation in calculations:
+            common_functions.derive_data(dict(calculation), calculation['Elements'], calculation['xyz Coordinates'],
+                                         calculation['Frequencies'], sigma=calculation['Symmetry Number'])
+
+    def batch():
+        common_functions.derive_data_batch([dict(calculation) for calculation in calculations])
+
+    return [
+        Benchmark('thermochemistry derive_data', single, 0, n_calculations),
+        Benchmark('thermochemistry derive_data_batch', batch, 0, n_calculations),
+    ]
+
+
+def measure(function, min_time, repeat):
+    """Returns the shortest time of one call, every measurement runs at least min_time seconds"""
+    best = None
+    for _ in range(repeat):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            function()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = elapsed / calls if best is None else min(best, elapsed / calls)
+    return best
+
+
+def run(benchmarks, min_time, repeat):
+    results = {}
+    for benchmark in benchmarks:
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds = measure(benchmark.function, min_time, repeat)
+        results[benchmark.name] = {
+            'MB/s': benchmark.n_bytes / seconds / 1e6 if benchmark.n_bytes else None,
+            'records/s': benchmark.n_records / seconds,
+            'bytes': benchmark.n_bytes,
+        }
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Prints the results with the ratio to the baseline (records/s), returns the names of the regressions"""
+    regressions = []
+    print(f"{'benchmark':52s} {'MB/s':>10s} {'records/s':>12s} {'vs baseline':>12s}")
+    for name, result in results.items():
+        mb_per_s = f"{result['MB/s']:10.1f}" if result['MB/s'] is not None else f"{'-':>10s}"
+        ratio = ''
+        reference = baseline.get(name)
+        if reference is not None:
+            value = result['records/s'] / reference['records/s']
+            ratio = f'{value:.2f}x'
+            if value < 1 - tolerance:
+                regressions.append(name)
+                ratio += ' slower'
+        print(f"{name:52s} {mb_per_s} {result['records/s']:12.1f} {ratio:>12s}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="JSON file with the results to compare with")
+    parser.add_argument('--save', default=None, help="store the results in this JSON file")
+    parser.add_argument('--filter', default=None, help="run only the benchmarks whose name contains this string")
+    parser.add_argument('--min_time', type=float, default=0.2, help="minimum time of one measurement in s")
+    parser.add_argument('--repeat', type=int, default=5, help="number of measurements, the fastest counts")
+    parser.add_argument('--tolerance', type=float, default=0.35, help="relative slowdown which counts as regression, above the noise of shared machines")
+    parser.add_argument('--check', action='store_true', help="exit with status 1 if there are regressions")
+    args = parser.parse_args()
+
+    top = tempfile.mkdtemp(prefix='qcdc_benchmarks_')
+    try:
+        benchmarks = orca_benchmarks(top) + turbomole_benchmarks(top) + censo_benchmarks(top) + thermochemistry_benchmarks(top)
+        if args.filter:
+            benchmarks = [benchmark for benchmark in benchmarks if args.filter in benchmark.name]
+        results = run(benchmarks, args.min_time, args.repeat)
+    finally:
+        shutil.rmtree(top)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'results': results}, file, indent=1)
+        print(f"results saved to {args.save}")
+    if regressions:
+        print(f"{len(regressions)} regressions: {regressions}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""
+Generates synthetic output files for benchmarks:
+ORCA outputs, Turbomole directories (control, coord, energy, gradient, vibspectrum) and censo.out files.
+The files contain the sections which the parsers of qcdc look for, filled with random numbers.
+"""
+import os
+import random
+
+ELEMENTS = ['C', 'H', 'H', 'O', 'N', 'H', 'C', 'H']
+
+
+def random_geometry(n_atoms, rng):
+    """Returns a list of (element, x, y, z) in Angstroem"""
+    return [(ELEMENTS[i % len(ELEMENTS)], rng.uniform(-5, 5), rng.uniform(-5, 5), rng.uniform(-5, 5))
+            for i in range(n_atoms)]
+
+
+def orca_output(n_atoms=20, n_cycles=10, frequencies=True, filler_lines=200, seed=0):
+    """
+    Returns the text of an ORCA geometry optimization (and frequency calculation).
+
+    n_atoms : number of atoms
+    n_cycles : number of optimization cycles, every cycle prints coordinates, SCF iterations and the energy
+    frequencies : append a frequency calculation with thermochemistry
+    filler_lines : number of SCF iteration lines per cycle, which none of the patterns match
+    """
+    rng = random.Random(seed)
+    atoms = random_geometry(n_atoms, rng)
+    lines = [
+        '',
+        '                                 *****************',
+        '                                 * O   R   C   A *',
+        '                                 *****************',
+        '',
+        '================================================================================',
+        '                                       INPUT FILE',
+        '================================================================================',
+        'NAME = input.inp',
+        '|  1> ! B3LYP def2-SVP Opt' + (' Freq' if frequencies else ''),
+        '|  2> *xyz 0 1',
+    ]
+    for i, (element, x, y, z) in enumerate(atoms):
+        lines.append(f'|{i+3:3d}> {element} {x:.6f} {y:.6f} {z:.6f}')
+    lines.append(f'|{n_atoms+3:3d}> *')
+    lines.append(f'|{n_atoms+4:3d}>                          ****END OF INPUT****')
+    lines.append('================================================================================')
+    lines.append(f'Number of atoms                             ...    {n_atoms:3d}')
+
+    energy = -40.0 * n_atoms
+    for cycle in range(n_cycles):
+        lines += ['', '---------------------------------', 'CARTESIAN COORDINATES (ANGSTROEM)', '---------------------------------']
+        for element, x, y, z in atoms:
+            lines.append(f'  {element:<2s}   {x:12.6f}  {y:12.6f}  {z:12.6f}')
+        lines += ['', '----------------------------', 'CARTESIAN COORDINATES (A.U.)', '----------------------------']
+        for element, x, y, z in atoms:
+            lines.append(f'   0 {element:<2s}    6.0000    0   12.011  {x*1.8897:12.6f}  {y*1.8897:12.6f}  {z*1.8897:12.6f}')
+        lines += ['', 'ITER       Energy         Delta-E        Max-DP      RMS-DP      [F,P]     Damp']
+        for iteration in range(filler_lines):
+            lines.append(f'  {iteration:3d}   {energy:16.10f}  {rng.uniform(-1e-3, 0):.6e}  {rng.random():.6e}  {rng.random():.6e}  0.0  0.7000')
+        energy -= rng.uniform(0, 1e-3)
+        lines += ['', f'FINAL SINGLE POINT ENERGY     {energy:18.12f}', '']
+        lines += [
+            '                    Geometry convergence',
+            'Item                value                   Tolerance       Converged',
+            '---------------------------------------------------------------------',
+            f'Energy change      {-rng.random()*1e-4:.8f}            0.0000050000      NO',
+            f'RMS gradient        {rng.random()*1e-3:.8f}            0.0001000000      NO',
+            f'MAX gradient        {rng.random()*1e-3:.8f}            0.0003000000      NO',
+            f'RMS step            {rng.random()*1e-2:.8f}            0.0020000000      NO',
+            f'MAX step            {rng.random()*1e-2:.8f}            0.0040000000      NO',
+            '........................................................',
+        ]
+        atoms = [(element, x + rng.uniform(-1e-3, 1e-3), y, z) for element, x, y, z in atoms]
+
+    lines.append('Total Dipole Moment    :     -0.123456       0.234567       0.345678')
+    if frequencies:
+        lines += ['', '-----------------------', 'VIBRATIONAL FREQUENCIES', '-----------------------', '',
+                  'Scaling factor for frequencies =  1.000000000  (already applied!)', '']
+        for mode in range(3 * n_atoms):
+            frequency = 0.0 if mode < 6 else rng.uniform(30, 3500)
+            lines.append(f'  {mode:4d}:    {frequency:10.2f} cm**-1')
+        lines += [
+            '',
+            'Temperature         ...   298.15 K',
+            'Pressure            ...     1.00 atm',
+            f'Total Mass          ...   {12.0 * n_atoms:8.2f} AMU',
+            'Zero point energy                ...      0.150000 Eh      94.13 kcal/mol',
+            'Total correction                  0.160000 Eh     100.40 kcal/mol',
+            'Total entropy correction          ...     -0.050000 Eh    -31.38 kcal/mol',
+            'G-E(el)                           ...      0.110000 Eh     69.03 kcal/mol',
+            f'Final Gibbs free energy         ...   {energy + 0.11:14.8f} Eh',
+        ]
+    lines += ['', '                             ****ORCA TERMINATED NORMALLY****', '']
+    return '\n'.join(lines)
+
+
+BOHR = 1.8897259886 # bohr per Angstroem
+
+
+def turbomole_files(n_atoms=20, n_cycles=10, frequencies=True, seed=0):
+    """
+    Returns the files of a Turbomole geometry optimization as dict of filename -> text.
+
+    n_atoms : number of atoms
+    n_cycles : number of optimization cycles in energy and gradient
+    frequencies : add a vibspectrum with 3 * n_atoms modes
+    """
+    rng = random.Random(seed)
+    atoms = random_geometry(n_atoms, rng)
+    elements = sorted(set(element.lower() for element, *_ in atoms))
+    files = {}
+    files['control'] = '\n'.join([
+        '$title', '$symmetry c1', '$coord    file=coord', '$energy    file=energy', '$grad    file=gradient',
+        '$atoms',
+        *[f'{element:<2s} {", ".join(str(i + 1) for i, atom in enumerate(atoms) if atom[0].lower() == element)}'
+          f'  basis ={element} def2-SVP' for element in elements],
+        '$scfconv 7', '$rij', '$dft', '   functional b3-lyp', '   gridsize   m4',
+        '$ssquare from ridft', '          0.000 (not to be modified here)',
+        '$dipole from ridft', '  x     0.12345678901234    y    -0.23456789012345    z     0.34567890123456    a.u.',
+        '$end', '',
+    ])
+    files['coord'] = '$coord\n' + ''.join(
+        f'{x*BOHR:20.14f} {y*BOHR:20.14f} {z*BOHR:20.14f}      {element.lower()}\n' for element, x, y, z in atoms) + '$end\n'
+
+    energy = -40.0 * n_atoms
+    energy_lines = ['$energy      SCF               SCFKIN            SCFPOT']
+    gradient_lines = ['$grad          cartesian gradients']
+    for cycle in range(n_cycles):
+        energy -= rng.uniform(0, 1e-3)
+        energy_lines.append(f'{cycle+1:6d}   {energy:.10f}   {-energy:.10f}   {2*energy:.10f}')
+        gradient_lines.append(f'  cycle = {cycle+1:6d}    SCF energy = {energy:18.10f}   |dE/dxyz| = {rng.random()*1e-2:.6f}')
+        for element, x, y, z in atoms:
+            gradient_lines.append(f'{x*BOHR:20.14f} {y*BOHR:20.14f} {z*BOHR:20.14f}      {element.lower()}')
+        for _ in atoms:
+            gradient_lines.append(''.join(f'  {rng.uniform(-1, 1)*1e-3:.14E}'.replace('E', 'D') for _ in range(3)))
+    files['energy'] = '\n'.join(energy_lines + ['$end', ''])
+    files['gradient'] = '\n'.join(gradient_lines + ['$end', ''])
+
+    if frequencies:
+        lines = ['$vibrational spectrum',
+                 '#  mode     symmetry     wave number   IR intensity    selection rules',
+                 '#                         cm**(-1)        km/mol         IR     RAMAN']
+        for mode in range(3 * n_atoms):
+            if mode < 6:
+                lines.append(f'{mode+1:6d}                    0.00         0.00000    -       -')
+            else:
+                lines.append(f'{mode+1:6d}        a   {rng.uniform(30, 3500):12.2f}    {rng.uniform(0, 100):12.5f}    YES     YES')
+        files['vibspectrum'] = '\n'.join(lines + ['$end', ''])
+    return files
+
+
+CENSO_HEADER = 'CONF#  E(GFNn-xTB) ΔE(GFNn-xTB)  E [Eh]  Gsolv [Eh]  GmRRHO [Eh]  Gtot  ΔGtot  Boltzmannweight'
+
+
+def censo_output(n_conformers=50, n_parts=3, filler_lines=100, seed=0):
+    """
+    Returns the text of a censo.out with one ranking table per part.
+
+    n_conformers : number of conformers in every table
+    n_parts : number of tables (part0 to part3 of CENSO)
+    filler_lines : number of log lines in front of every table
+    """
+    rng = random.Random(seed)
+    lines = ['CENSO - Commandline Energetic SOrting of Conformer Rotamer Ensembles', '']
+    for part in range(n_parts):
+        lines += [f'  part{part}: calculating Gtot for {n_conformers} conformers ...' for _ in range(filler_lines)]
+        energies = [-40.0 + rng.uniform(0, 0.01) for _ in range(n_conformers)]
+        lowest = min(energies)
+        lines += [CENSO_HEADER, '       [Eh]   [kcal/mol]   [Eh]   [Eh]   [Eh]   [Eh]   [kcal/mol]', '-' * 100]
+        for i, energy in enumerate(energies):
+            delta = (energy - lowest) * 627.5
+            row = (f'CONF{i+1}  {energy - 1:.7f}  {delta:.2f}  {energy:.7f}  {-0.01:.7f}  {0.2:.7f}  '
+                   f'{energy + 0.19:.7f}  {delta:.2f}  {100.0 / n_conformers:.2f}')
+            lines.append(row + ('  <------' if energy == lowest else ''))
+        lines.append('')
+    lines.append('CENSO all done!')
+    return '\n'.join(lines) + '\n'
+
+
+def write(path, text):
+    with open(path, 'w') as file:
+        file.write(text)
+
+
+def write_directory(directory, files):
+    """Writes a dict of filename -> text into a directory"""
+    os.makedirs(directory, exist_ok=True)
+    for filename, text in files.items():
+        write(os.path.join(directory, filename), text)
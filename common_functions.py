@@ -1,11 +1,11 @@
 import my_constants as mc
+import elements as element_table
+import file_access
+import thermochemistry
 import os
 import numpy as np
 import re
-from molmass import Formula
-from scipy.constants import h, k, c, N_A, R, pi, milli
-from pymatgen.core.structure import Molecule
-from pymatgen.symmetry.analyzer import PointGroupAnalyzer
+from physical_constants import h, k, c, N_A, R, pi, milli
 
 #this file contains functions which are used by both, 
 #the turbomole parser and orca parser
@@ -21,7 +21,7 @@ def set_paths (ser, root, filename):
 def parse_xyz(file_path):
     """ Extracts number of atoms, coordinates and element symbols from file in xyz format"""
     # Read the file content
-    with open(file_path, 'r') as file:
+    with file_access.open_text(file_path) as file:
         lines = file.readlines()
     
     # Number of atoms
@@ -45,18 +45,78 @@ def parse_xyz(file_path):
 
 #Regex searches for 3 floats and one element symbol
 RE_COORD = re.compile("([-+]?\d*\.\d+)[ ]+([-+]?\d*\.\d+)[ ]+([-+]?\d*\.\d+)[ ]+([a-zA-Z]{1,2})")
+def data_group_lines(text, group='$coord'):
+    """Returns the non-empty lines of a Turbomole data group (e.g. $coord) up to the next group, or None"""
+    start = text.find(group)
+    if start == -1:
+        return None
+    start = text.find('\n', start)
+    if start == -1:
+        return []
+    end = text.find('\n$', start)
+    block = text[start:end] if end != -1 else text[start:]
+    return [line for line in block.split('\n') if line.strip()]
+
+
+def coordinates_and_elements(lines, element_column=3):
+    """
+    Converts the lines 'x y z element' of $coord blocks (or 'element x y z' with element_column=0)
+    into the Nx3 coordinates and the element symbols.
+    All numbers are converted at once, lines with further columns (e.g. frozen atom flags 'f') are split one by one.
+    """
+    tokens = '\n'.join(lines).split()
+    numbers = slice(1, 4) if element_column == 0 else slice(0, 3)
+    if len(tokens) == 4 * len(lines):
+        elements = tokens[element_column::4]
+        del tokens[element_column::4]
+    else:
+        rows = [line.split() for line in lines]
+        elements = [row[element_column] for row in rows]
+        tokens = [value for row in rows for value in row[numbers]]
+    return np.array(tokens, dtype=float).reshape(-1, 3), elements
+
+
 def get_coord3(root, dat='coord'):
     """Reads coord file and returns xyz coordinates in bohr"""
-    with open(root+os.sep+dat) as file:
-        xyzelem = re.findall(RE_COORD, file.read())
-        if bool(xyzelem):
-            xyzelem = np.asarray(xyzelem)
-            return (xyzelem[:,:3].astype(float), xyzelem[:,3]) #atomic units
-        else:
-            return (None, None)
+    with file_access.open_text(root+os.sep+dat) as file:
+        text = file.read()
+    lines = data_group_lines(text)
+    if lines:
+        try:
+            xyz, elements = coordinates_and_elements(lines)
+            return (xyz, np.asarray(elements)) #atomic units
+        except (ValueError, IndexError):
+            pass
+    # files without $coord or with unexpected lines
+    xyzelem = re.findall(RE_COORD, text)
+    if bool(xyzelem):
+        xyzelem = np.asarray(xyzelem)
+        return (xyzelem[:,:3].astype(float), xyzelem[:,3]) #atomic units
+    else:
+        return (None, None)
         #return xyzelem[:,:3].astype(float)*BOHR2ANGSTROM, xyzelem[:,3]
 
-def write_xyz(elements, coordinates, file_path, comment="Generated by script", bottom_info=None):
+
+def set_trajectory(ser, energies, coordinates=None, gradients=None):
+    """
+    Sets the trajectory of a geometry optimization and the convergence of the last cycle.
+
+    energies : energies of the cycles in Eh
+    coordinates : cycles x N x 3 coordinates in Angstroem, or None
+    gradients : cycles x N x 3 Cartesian gradients in Eh/bohr, or None
+    """
+    ser['Optimization Cycles'] = len(energies)
+    ser['Trajectory Energies'] = np.asarray(energies, dtype=float) * mc.EH2KJMOL
+    if coordinates is not None:
+        ser['Trajectory Coordinates'] = coordinates
+    if gradients is not None and len(gradients):
+        ser['Trajectory Gradients'] = gradients
+        last = gradients[-1]
+        ser['RMS Gradient'] = float(np.sqrt(np.mean(last * last)))
+        ser['Max Gradient'] = float(np.max(np.abs(last)))
+
+
+def write_xyz(elements, coordinates, file_path, comment="Generated by script", bottom_info=None, skip_unchanged=False):
     """
     Write elements and coordinates to a file in XYZ format.
 
@@ -66,21 +126,33 @@ def write_xyz(elements, coordinates, file_path, comment="Generated by script", b
     file_path (str): Path to the output file.
     comment (str): Comment line to be included in the output file.
     bottom_info: Can include a string with charge, dipole, zero point energy, solvation model, frequencies
+    skip_unchanged (bool): The file is not rewritten if it already has the same content.
+
+    Returns:
+    bool: False if the write was skipped.
     """
     if len(elements) != len(coordinates):
         raise ValueError("The number of elements must match the number of coordinate sets.")
 
+    # Number of atoms, comment line, element symbols and coordinates
+    lines = [f"{len(elements)}\n", f"{comment}\n"]
+    lines += [f"{element} {coord[0]:.6f} {coord[1]:.6f} {coord[2]:.6f}\n" for element, coord in zip(elements, coordinates)]
+    if bottom_info:
+        lines.append(bottom_info)
+    content = ''.join(lines)
+
+    if skip_unchanged:
+        try:
+            with open(file_path, 'r') as file:
+                if file.read(len(content) + 1) == content:
+                    return False
+        except (FileNotFoundError, UnicodeDecodeError):
+            pass
+
     with open(file_path, 'w') as file:
-        # Write the number of atoms
-        file.write(f"{len(elements)}\n")
-        # Write the comment line
-        file.write(f"{comment}\n")
-        # Write the element symbols and coordinates
-        for element, coord in zip(elements, coordinates):
-            file.write(f"{element} {coord[0]:.6f} {coord[1]:.6f} {coord[2]:.6f}\n")
-        if bottom_info:
-            file.write(bottom_info)
-        
+        file.write(content)
+    return True
+
 def format_properties(charge=None, s2=None, dipole=None, vibration=None, zpe=None):
     """
     Format properties into a specified string format.
@@ -134,7 +206,7 @@ def read_xyz(file_path):
         - elements (list of str): The list of element symbols.
         - coordinates (list of list of float): The Nx3 list of coordinates.
     """
-    with open(file_path, 'r') as file:
+    with file_access.open_text(file_path) as file:
         lines = file.readlines()
 
     # Number of atoms is the first line
@@ -169,10 +241,10 @@ def center_of_mass(coords, mass):
 
 def mass_of_elements(elems):
     """
-    Takes list of element strings and converts the most frequently abundant isotope to the corresponding mass
-    Probably it would be faster to write a dictionary but this is more convenient for now
+    Takes list of element strings (or atomic numbers) and returns the masses of the most frequently abundant isotopes
+    The masses are looked up in the precomputed table of elements.py
     """
-    return [Formula(elem.capitalize()).isotope.mass for elem in elems]
+    return element_table.masses(elems)
 
 def zero_point_energy(frequencies):
     """
@@ -181,45 +253,59 @@ def zero_point_energy(frequencies):
     """
     return 0.5 * np.sum(frequencies)*mc.WAVENUMBERS2KJMOL
 
-def translational_partition_function(mass, volume=mc.MOLES * R * mc.TEMPERATURE / mc.PRESSURE, temperature=mc.TEMPERATURE, n_part = mc.MOLES):
+def translational_partition_function(mass, volume=None, temperature=None, n_part=None):
     """
     takes the molar mass [g/mol] of a molecule and
     returns the translational partition function (ideal gas)
     default volume is molar volume of ideal gases, 
     choose a volume of 0.001 m^3 for liquids
+    the defaults are taken from config.yml
     """
+    if volume is None:
+        volume = mc.MOLES * R * mc.TEMPERATURE / mc.PRESSURE
+    if temperature is None:
+        temperature = mc.TEMPERATURE
+    if n_part is None:
+        n_part = mc.MOLES
     mass = mass/1000/N_A#kg
-    print(volume)
     return (mass*temperature*2*pi*k/h/h)**1.5 * volume /n_part/N_A
 
-def vibrational_partition_function(frequencies, temperature=mc.TEMPERATURE):
+def vibrational_partition_function(frequencies, temperature=None):
     """
     takes array of positive non-zero frequencies and
     returns vibrational partition function
     """
+    if temperature is None:
+        temperature = mc.TEMPERATURE
     return np.prod(1/(1-np.exp(-frequencies*100 *c*h/k/temperature)))
 
-def rotational_partition_function(moments_of_inertia, sigma=1, temperature=mc.TEMPERATURE):
+def rotational_partition_function(moments_of_inertia, sigma=1, temperature=None):
     """
     takes moments of inertia (np.array) and 
     returns rotational partition function
     sigma : symmetry number
     """
+    if temperature is None:
+        temperature = mc.TEMPERATURE
     return (temperature*temperature*temperature * np.prod(moments_of_inertia))**0.5 / sigma * mc.CONSTANTX 
     # mc.CONSTANTX : *pi**0.5 * ((8*pi*pi*k/h/h)**3 *(mc.AMU**3*mc.BOHR2METER**6))**0.5
 
-def chemical_potential(zero_point_energy, q_translation, q_vibration, q_rotation, temperature=mc.TEMPERATURE):
+def chemical_potential(zero_point_energy, q_translation, q_vibration, q_rotation, temperature=None):
     """
     takes partition functions (q) and zero point energy and
     returns chemical potential in kJ/mol (Gibbs free energy)
     """
+    if temperature is None:
+        temperature = mc.TEMPERATURE
     return zero_point_energy - R*temperature*np.log(q_translation*q_vibration*q_rotation)/1000 
 
-def calc_grimme_short (freq_cm, temperature=mc.TEMPERATURE):
+def calc_grimme_short (freq_cm, temperature=None):
     """
     takes np array with positive vibrational frequencies in wavenumbers
     Return value corrects the Gibbs free enthalpy.
     """
+    if temperature is None:
+        temperature = mc.TEMPERATURE
     Bav = 1e-44 #kg*m^2
     freq_s = freq_cm*100.0*c #1/s
     xx = freq_s*h/k/temperature #no unit
@@ -231,95 +317,89 @@ def calc_grimme_short (freq_cm, temperature=mc.TEMPERATURE):
     S_final = w_damp*R*Sv + ( (1.0-w_damp) *R*(1 + np.log(8.0*pi*pi*pi*mue*Bav /(mue + Bav) *k*temperature/h/h) ) /2) #m^4*J/mol/K
     return np.sum((S_final - R*Sv )*milli)*temperature #m^4*kJ/mol
 
-#Frequency dependent stuff could be moved into different function,
-#such that this can be executed for all calculations
-def derive_data (ser, elements, coordinates, frequencies, temperature=mc.TEMPERATURE, sigma=1):
+def derive_data (ser, elements, coordinates, frequencies, temperature=None, sigma=1, context=None):
     """
     This function derives all kind of physical data from the collected values
     Frequencies are needed for most of the values
+    The values are calculated with thermochemistry.thermochemistry_batch for a single molecule,
+    such that derive_data and derive_data_batch give the same results.
+    The conditions are taken from the context (thermochemistry.ThermoContext), temperature overrides its temperature.
     """
-    # We need mass information of the elements
-    # molecular mass
-    coordinates = np.array(coordinates)
-    bohr_coordinates = coordinates * mc.ANGSTROM2BOHR
-    elem_masses =  mass_of_elements(elements) #g/mol)
-    ser[mc.M_MASS] = np.sum (elem_masses) #g/mol)
-
-    # Calculate Partition Functions
-    ser['Translational Partition Function'] = translational_partition_function(ser[mc.M_MASS])
-    ser['Translational Partition Function for Liquids'] = translational_partition_function(ser[mc.M_MASS], volume=1e-3)
-
-
-    if len(coordinates) == 1:
-        ser['Single Atom'] = True
-        ser['Translational Partition Function'] = translational_partition_function(ser[mc.M_MASS])
-        ser['Translational Partition Function for Liquids'] = translational_partition_function(ser[mc.M_MASS], volume=1e-3)
+    if context is None:
+        context = thermochemistry.ThermoContext(temperature=temperature)
+    coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 3)
+    frequencies = np.asarray(frequencies, dtype=float)
+    elem_masses = np.asarray(mass_of_elements(elements), dtype=float) #g/mol
+    columns = thermochemistry.thermochemistry_batch(
+        elem_masses, coordinates, np.array([0, len(coordinates)]),
+        frequencies, np.array([0, len(frequencies)]), [sigma],
+        context=context,
+        )
+    thermochemistry.assign_columns(ser, columns, 0)
+
+def pack_calculations (calculations):
+    """
+    Collects masses, coordinates and frequencies of all frequency calculations in a list into flat arrays.
+    Calculations with missing data are skipped with a message, like in derive_data.
+    Returns the selected calculations and the arguments of thermochemistry.thermochemistry_batch.
+    """
+    selected = []
+    masses = []
+    coordinates = []
+    frequencies = []
+    sigmas = []
+    for ser in calculations:
+        if not ser.get('Frequency Calculation'):
+            continue
+        try:
+            xyz = np.asarray(ser['xyz Coordinates'], dtype=float).reshape(-1, 3)
+            numbers = ser.get('Atomic Numbers')
+            elem_masses = mass_of_elements(ser['Elements'] if numbers is None else numbers)
+            vibrations = np.asarray(ser['Frequencies'], dtype=float)
+            sigma = ser.get('Symmetry Number', 1)
+        except KeyError as e:
+            print(f"{e} in derive_data. Some data not found")
+            continue
+        except ValueError as e:
+            print(f"{e} in derive_data for {ser.get('RootFile')}")
+            continue
+        if len(elem_masses) != len(xyz):
+            print(f"Number of elements and coordinates differ in derive_data for {ser.get('RootFile')}")
+            continue
+        selected.append(ser)
+        masses.append(elem_masses)
+        coordinates.append(xyz)
+        frequencies.append(vibrations)
+        sigmas.append(sigma)
+
+    masses, atom_offsets = thermochemistry.pack_ragged(masses)
+    frequencies, frequency_offsets = thermochemistry.pack_ragged(frequencies)
+    coordinates = np.concatenate(coordinates) if coordinates else np.zeros((0, 3))
+    return selected, (masses, coordinates, atom_offsets, frequencies, frequency_offsets, sigmas)
+
+def derive_data_batch (calculations, context=None):
+    """
+    Derives the physical data (see derive_data) of all frequency calculations in a list at once.
+    Calculations with missing data are skipped with a message, like in derive_data.
+    """
+    selected, arrays = pack_calculations(calculations)
+    if not selected:
         return
-        # to be implemented
+    columns = thermochemistry.thermochemistry_batch(*arrays, context=context)
+    for i, ser in enumerate(selected):
+        thermochemistry.assign_columns(ser, columns, i)
 
-    ser['Linear Molecule'] = is_molecule_linear(coordinates)
-    if ser['Linear Molecule']:
-        return
-        # to be implemented
-
-    # Calculate moments of inertia I (amu/bohr^2)'
-    # We need centralized coordinates
-    xyz_central = bohr_coordinates - center_of_mass(bohr_coordinates, elem_masses)
-    ser['I_xx'] = moment_of_inertia(xyz_central, elem_masses, 1, 2)
-    ser['I_yy'] = moment_of_inertia(xyz_central, elem_masses, 0, 2)
-    ser['I_zz'] = moment_of_inertia(xyz_central, elem_masses, 0, 1)
-    momi = np.asarray([ser['I_xx'], ser['I_yy'], ser['I_zz']]) 
-
-    # Ignore frequencies 
-    frequencies = np.array(frequencies)
-    #print('f', frequencies)
-    positive_frequencies = frequencies[frequencies > 0]
-    #print('p', positive_frequencies)
-
-    # Calculate Partition Functions
-    ser['Translational Partition Function'] = translational_partition_function(ser[mc.M_MASS])
-    ser['Translational Partition Function for Liquids'] = translational_partition_function(ser[mc.M_MASS], volume=1e-3)
-    ser['Rotational Partition Function'] = rotational_partition_function(momi, sigma=sigma)
-
-    ser['Vibrational Partition Function'] = vibrational_partition_function(positive_frequencies)
-    ser['Zero Point Energy'] = zero_point_energy(positive_frequencies)
-    ser['Chemical Potential'] = chemical_potential(ser['Zero Point Energy'], ser['Translational Partition Function'],
-                                                   ser['Vibrational Partition Function'], ser['Rotational Partition Function'])
-    ser['Chemical Potential for Liquids'] = chemical_potential(ser['Zero Point Energy'], ser['Translational Partition Function for Liquids'],
-                                                   ser['Vibrational Partition Function'], ser['Rotational Partition Function'])
-
-    # Calculate and Apply Correcture Term for Vibrational Partition Function
-    low_positive_frequencies = positive_frequencies[positive_frequencies < mc.QRRHO_CUTOFF]
-    ser['qRRHO'] = calc_grimme_short(low_positive_frequencies, temperature)
-    ser['Chemical Potential'] -= ser['qRRHO']
-    ser['Chemical Potential for Liquids'] -= ser['qRRHO']
-
-    # Calculate Partition Functions with sign inversion for imaginary frequencies smaller than 100 in magnitude. Change value in config file.
-    sign_inverted_frequencies = frequencies[frequencies > -np.abs(mc.SIGN_INV_THR)] # we take every frequency larger than the threshold
-    sign_inverted_frequencies = np.abs(sign_inverted_frequencies) # turn them positive
-    sign_inverted_frequencies = sign_inverted_frequencies[sign_inverted_frequencies > 0] # remove 0 values
-    #print('1', sign_inverted_frequencies)
-
-
-    # Calculate Partition Functions which are effected by sign inversion in frequencies
-    ser['Chemical Potential (sign inverted)'] = chemical_potential(
-            zero_point_energy(sign_inverted_frequencies), 
-            ser['Translational Partition Function'], 
-            vibrational_partition_function(sign_inverted_frequencies), 
-            ser['Rotational Partition Function']
-            )
-    ser['Chemical Potential for Liquids (sign inverted)'] = chemical_potential(
-            zero_point_energy(sign_inverted_frequencies), 
-            ser['Translational Partition Function for Liquids'], 
-            vibrational_partition_function(sign_inverted_frequencies), 
-            ser['Rotational Partition Function']
-            )
-
-    # Calculate and Apply Correcture Term for Vibrational Partition Function
-    low_sign_inverted_frequencies = sign_inverted_frequencies[sign_inverted_frequencies < mc.QRRHO_CUTOFF]
-    ser['qRRHO (sign inverted)'] = calc_grimme_short(low_sign_inverted_frequencies, temperature)
-    ser['Chemical Potential (sign inverted)'] -= ser['qRRHO (sign inverted)']
-    ser['Chemical Potential for Liquids (sign inverted)'] -= ser['qRRHO (sign inverted)']
+def derive_grid (calculations, temperatures, pressures, context=None):
+    """
+    Derives the free energies of all frequency calculations in a list for every pair of
+    temperatures (K) and pressures (Pa), without parsing the outputs again.
+    Returns a long table (calculation x temperature x pressure) as dictionary of flat arrays.
+    """
+    selected, arrays = pack_calculations(calculations)
+    columns = thermochemistry.thermochemistry_grid(*arrays, temperatures, pressures, context=context)
+    table = thermochemistry.grid_table(columns, temperatures, pressures)
+    root_files = np.array([ser.get('RootFile') for ser in selected], dtype=object)
+    return {'RootFile': root_files[table.pop('Molecule')], **table}
 
 
 def is_molecule_linear(coordinates):
@@ -427,6 +507,10 @@ def determine_point_group_and_symmetry_number(elements, coordinates):
     if len(elements) == 1:
         return "Single Atom", 1  # Single atom, sigma = 1
 
+    # pymatgen takes seconds to import, it is only loaded if a molecule has to be analyzed
+    from pymatgen.core.structure import Molecule
+    from pymatgen.symmetry.analyzer import PointGroupAnalyzer
+
     capital_elements = [element.capitalize() for element in elements]
     # Create the Molecule object using pymatgen
     molecule = Molecule(capital_elements, coordinates)
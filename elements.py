@@ -0,0 +1,92 @@
+import numpy as np
+
+import my_constants as mc
+
+# Elements are stored as uint8 arrays of atomic numbers.
+# The symbols are normalized once, when a parser has read them,
+# the masses of all atoms of many molecules are then a single lookup in the mass table.
+
+SYMBOLS = (
+    'X',
+    'H', 'He',
+    'Li', 'Be', 'B', 'C', 'N', 'O', 'F', 'Ne',
+    'Na', 'Mg', 'Al', 'Si', 'P', 'S', 'Cl', 'Ar',
+    'K', 'Ca', 'Sc', 'Ti', 'V', 'Cr', 'Mn', 'Fe', 'Co', 'Ni', 'Cu', 'Zn', 'Ga', 'Ge', 'As', 'Se', 'Br', 'Kr',
+    'Rb', 'Sr', 'Y', 'Zr', 'Nb', 'Mo', 'Tc', 'Ru', 'Rh', 'Pd', 'Ag', 'Cd', 'In', 'Sn', 'Sb', 'Te', 'I', 'Xe',
+    'Cs', 'Ba',
+    'La', 'Ce', 'Pr', 'Nd', 'Pm', 'Sm', 'Eu', 'Gd', 'Tb', 'Dy', 'Ho', 'Er', 'Tm', 'Yb', 'Lu',
+    'Hf', 'Ta', 'W', 'Re', 'Os', 'Ir', 'Pt', 'Au', 'Hg', 'Tl', 'Pb', 'Bi', 'Po', 'At', 'Rn',
+    'Fr', 'Ra',
+    'Ac', 'Th', 'Pa', 'U', 'Np', 'Pu', 'Am', 'Cm', 'Bk', 'Cf', 'Es', 'Fm', 'Md', 'No', 'Lr',
+    'Rf', 'Db', 'Sg', 'Bh', 'Hs', 'Mt', 'Ds', 'Rg', 'Cn', 'Nh', 'Fl', 'Mc', 'Lv', 'Ts', 'Og',
+)
+
+# lower case symbol -> atomic number, the dummy atom X is not a valid element
+ATOMIC_NUMBERS = {symbol.lower(): number for number, symbol in enumerate(SYMBOLS) if number}
+
+_mass_table = None
+
+
+def atomic_numbers(symbols):
+    """
+    Takes element symbols in any case (list or array of strings) and returns a uint8 array of atomic numbers.
+    Arrays of atomic numbers are returned unchanged.
+    Raises ValueError for unknown symbols.
+    """
+    if isinstance(symbols, np.ndarray) and symbols.dtype == np.uint8:
+        return symbols
+    try:
+        return np.array([ATOMIC_NUMBERS[symbol.strip().lower()] for symbol in symbols], dtype=np.uint8)
+    except KeyError as e:
+        raise ValueError(f"Unknown element symbol {e}")
+
+
+def symbols(numbers):
+    """Takes atomic numbers and returns the list of element symbols"""
+    return [SYMBOLS[number] for number in numbers]
+
+
+def normalize(element_symbols):
+    """Returns the list of capitalized symbols, e.g. ['c', 'H'] -> ['C', 'H']"""
+    return symbols(atomic_numbers(element_symbols))
+
+
+def build_mass_table(overrides=None):
+    """
+    Returns an array with the mass of the most abundant isotope for every atomic number [g/mol].
+    Elements which molmass does not know are NaN.
+    overrides : dictionary {symbol or atomic number: mass}, e.g. {'H': 2.01410177812} for deuterium
+    """
+    from molmass import Formula
+    table = np.full(len(SYMBOLS), np.nan)
+    for number, symbol in enumerate(SYMBOLS[1:], start=1):
+        try:
+            table[number] = Formula(symbol).isotope.mass
+        except ValueError:
+            pass
+    for key, mass in (overrides or {}).items():
+        number = key if isinstance(key, int) else ATOMIC_NUMBERS[key.lower()]
+        table[number] = mass
+    return table
+
+
+def mass_table():
+    """Returns the mass table with the ISOTOPE_MASSES of config.yml, built at the first call"""
+    global _mass_table
+    if _mass_table is None:
+        _mass_table = build_mass_table(getattr(mc, 'ISOTOPE_MASSES', None))
+    return _mass_table
+
+
+def masses(numbers, table=None):
+    """
+    Takes atomic numbers (or symbols) and returns the array of masses [g/mol].
+    Raises ValueError if the table has no mass for one of the elements.
+    """
+    if table is None:
+        table = mass_table()
+    numbers = atomic_numbers(numbers)
+    values = table[numbers]
+    if np.isnan(values).any():
+        raise ValueError(f"No mass for the elements {sorted(set(symbols(numbers[np.isnan(values)])))}")
+    return values
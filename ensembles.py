@@ -0,0 +1,159 @@
+import re
+
+import numpy as np
+
+import my_constants as mc
+import thermochemistry
+from physical_constants import R, milli
+
+# Boltzmann averages over the conformers of an ensemble (--ensembles on).
+# The same calculation in different CONF<n> directories (e.g. of CENSO or CREST) forms an ensemble,
+# whose key is the RootFile with every /CONF<n> replaced by /CONF*, e.g. ./ens/CONF*/water.out.
+# The records are grouped once with a dictionary by ensemble and conformer number (the last record of a conformer wins),
+# afterwards every sum runs over flat arrays with the ensemble index of every conformer (np.bincount),
+# like the molecules in thermochemistry, which scales to millions of conformers.
+# All conformers of an ensemble share one definition of the free energy, such that different definitions are never mixed
+# in a Boltzmann sum, conformers without it are dropped and counted (see free_energies).
+
+RE_CONF = re.compile(r'/CONF\d+')
+
+
+def ensemble_key(root_file):
+    """Returns the RootFile with /CONF<n> replaced by /CONF*, None outside of CONF directories"""
+    key, count = RE_CONF.subn('/CONF*', root_file)
+    return key if count else None
+
+
+def column(records, key):
+    """Returns the values of key in the records as float array, missing values are NaN"""
+    return np.array([np.nan if value is None else value for value in [ser.get(key) for ser in records]], dtype=float)
+
+
+# Definitions of the free energy of a conformer in kJ/mol, the best first: the electronic energy plus the Chemical Potential
+# of derive_data, the Final Gibbs Free Energy of ORCA, the electronic energy only
+DEFINITIONS = {
+    'E + Chemical Potential': lambda records: column(records, 'Single Point Energy') + column(records, 'Chemical Potential'),
+    'Final Gibbs Free Energy': lambda records: column(records, 'Final Gibbs Free Energy'),
+    'Single Point Energy': lambda records: column(records, 'Single Point Energy'),
+}
+
+
+def free_energies(records, index, n_ensembles):
+    """
+    Free energies of the conformers in kJ/mol with one of the DEFINITIONS per ensemble (index: ensemble of every conformer),
+    the best one which all conformers of the ensemble have, otherwise the one which the most have.
+    Returns the free energies (NaN for the conformers without the definition of their ensemble)
+    and the number of the definition of every ensemble.
+    """
+    values = np.array([function(records) for function in DEFINITIONS.values()]).reshape(len(DEFINITIONS), len(records))
+    missing = np.array([np.bincount(index, weights=np.isnan(row), minlength=n_ensembles) for row in values])
+    # the first of the definitions with the least missing values
+    choice = np.argmin(missing, axis=0)
+    return values[choice[index], np.arange(len(records))], choice
+
+
+def dipole_moments(records):
+    """Total dipole moments of ORCA (norm of the vector) or Turbomole, NaN if not parsed"""
+    missing = (np.nan, np.nan, np.nan)
+    vectors = np.array([ser.get('Total Dipole Moment') or missing for ser in records], dtype=float).reshape(-1, 3)
+    moments = np.sqrt(np.einsum('ij,ij->i', vectors, vectors))
+    for i in np.flatnonzero(np.isnan(moments)):
+        dipole = records[i].get('Dipole')
+        if isinstance(dipole, dict) and dipole.get('total') is not None:
+            moments[i] = dipole['total']
+    return moments
+
+
+# Properties which are averaged with the Boltzmann weights, name -> function of the records which returns a float array
+PROPERTIES = {
+    'Dipole Moment': dipole_moments,
+    'HOMO': lambda records: column(records, 'HOMO'),
+    'LUMO': lambda records: column(records, 'LUMO'),
+}
+
+
+def group_conformers(calculations):
+    """Returns a dict of (ensemble key, conformer number) -> record for the records with a conformer number"""
+    conformers = {}
+    for ser in calculations:
+        number = ser.get('Censo Conformer Number')
+        if number is None or ser.get('RootFile') is None:
+            continue
+        key = ensemble_key(ser['RootFile'])
+        if key is not None:
+            conformers[(key, number)] = ser
+    return conformers
+
+
+def boltzmann_averages(calculations, temperature=None):
+    """
+    Groups the conformers of all ensembles in a list of records and returns one row per ensemble
+    as dictionary of arrays: number of conformers, lowest conformer, lowest, Boltzmann averaged and ensemble free energy
+    (G_min - RT ln(sum exp(-(G_i - G_min)/RT)), kJ/mol), the definition of the free energy (see free_energies)
+    with the number of conformers dropped for lack of it, the averages of PROPERTIES (over the conformers which have them)
+    and the conformer numbers with their Boltzmann weights. None if there are no ensembles.
+    temperature : K, default: TEMPERATURE of config.yml
+    """
+    if temperature is None:
+        temperature = mc.TEMPERATURE
+    conformers = group_conformers(calculations)
+    records = list(conformers.values())
+    keys = {}
+    index = np.array([keys.setdefault(key, len(keys)) for key, _ in conformers], dtype=np.int64)
+    energies, choice = free_energies(records, index, len(keys))
+    valid = ~np.isnan(energies)
+    if not valid.any():
+        return None
+    dropped = np.bincount(index[~valid], minlength=len(keys))
+    numbers = np.array([number for _, number in conformers], dtype=np.int64)
+    properties = {name: function(records) for name, function in PROPERTIES.items()}
+
+    # conformers without the free energy of their ensemble are dropped, ensembles without any are dropped as well,
+    # the others are numbered again
+    index, numbers, energies = index[valid], numbers[valid], energies[valid]
+    used, index = np.unique(index, return_inverse=True)
+    names = np.array(list(keys), dtype=object)[used]
+    properties = {name: values[valid] for name, values in properties.items()}
+    n_ensembles = len(names)
+    rt = R * temperature * milli
+
+    lowest = np.full(n_ensembles, np.inf)
+    np.minimum.at(lowest, index, energies)
+    factors = np.exp((lowest[index] - energies) / rt)
+    sums = thermochemistry.segment_sum(factors, index, n_ensembles)
+    weights = factors / sums[index]
+    is_lowest = energies == lowest[index]
+    lowest_conformer = np.zeros(n_ensembles, dtype=np.int64)
+    lowest_conformer[index[is_lowest]] = numbers[is_lowest]
+
+    columns = {
+        'Ensemble': names,
+        'Conformers': np.bincount(index, minlength=n_ensembles),
+        'Lowest Conformer': lowest_conformer,
+        'Lowest Free Energy': lowest,
+        'Average Free Energy': thermochemistry.segment_sum(weights * energies, index, n_ensembles),
+        'Ensemble Free Energy': lowest - rt * np.log(sums),
+        'Free Energy': np.array(list(DEFINITIONS), dtype=object)[choice[used]],
+        'Dropped Conformers': dropped[used],
+    }
+    for name, values in properties.items():
+        present = ~np.isnan(values)
+        total = thermochemistry.segment_sum(np.where(present, weights, 0.0), index, n_ensembles)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            columns['Average ' + name] = thermochemistry.segment_sum(
+                np.where(present, weights * values, 0.0), index, n_ensembles) / total
+
+    # conformer numbers and weights of every ensemble, sorted by the conformer number
+    order = np.lexsort((numbers, index))
+    offsets = np.searchsorted(index[order], np.arange(1, n_ensembles))
+    columns['Conformer Numbers'] = list_column(np.split(numbers[order], offsets))
+    columns['Boltzmann Weights'] = list_column(np.split(weights[order], offsets))
+    return columns
+
+
+def list_column(parts):
+    """Converts a list of arrays into an object array of lists (one list per row)"""
+    column = np.empty(len(parts), dtype=object)
+    for i, part in enumerate(parts):
+        column[i] = part.tolist()
+    return column
@@ -0,0 +1,251 @@
+import io
+import mmap
+import os
+from contextlib import contextmanager
+
+import profiling
+
+# Functions to look at the beginning or the end of large output files without reading them completely.
+# The files are memory mapped, only the pages which are searched are actually read.
+# Files which were read ahead (see prefetch.py) are registered with their contents,
+# open_text and mapped then work on the contents in memory instead of the file system.
+#
+# Compressed files (water.out.gz, control.xz, ...) appear to the parsers under their plain names:
+# compressed_files maps the plain names of a directory listing to the compressed files, which are registered
+# while the directory is parsed. open_text, find_markers and tail_lines decompress while reading
+# in chunks of CHUNK_BYTES, such that the memory stays bounded: the head markers are checked on the first limit bytes,
+# a file without them is not decompressed any further. Only mapped decompresses the whole file into memory.
+# A plain file wins over a compressed one with the same name. .zst needs the zstandard package.
+
+# Size of the header in which start markers are searched (bytes)
+HEAD_BYTES = 64 * 1024
+# Size of the chunks in which compressed files are searched (bytes)
+CHUNK_BYTES = 1024 * 1024
+
+
+# Contents of the prefetched files of the directories which are parsed in this process, normalized path -> bytes
+_contents = {}
+# Compressed files of the directories which are parsed in this process, normalized plain path -> compressed path
+_compressed = {}
+
+# Suffix -> module which opens the compressed files
+COMPRESSIONS = {'.gz': 'gzip', '.xz': 'lzma', '.bz2': 'bz2', '.zst': 'zstandard'}
+
+
+@contextmanager
+def registered(contents):
+    """Registers the contents of prefetched files (path -> bytes) while the block is executed"""
+    contents = {os.path.normpath(path): data for path, data in contents.items()}
+    _contents.update(contents)
+    try:
+        yield
+    finally:
+        for path in contents:
+            _contents.pop(path, None)
+
+
+def contents_of(file_path):
+    """Returns the registered contents of a file or None"""
+    if not _contents:
+        return None
+    return _contents.get(os.path.normpath(file_path))
+
+
+def compression_of(filename):
+    """Returns the suffix of a supported compression (e.g. '.gz') or None"""
+    suffix = os.path.splitext(filename)[1]
+    if suffix not in COMPRESSIONS:
+        return None
+    if suffix == '.zst' and not zstandard_available():
+        return None
+    return suffix
+
+
+_zstandard = None
+
+def zstandard_available():
+    global _zstandard
+    if _zstandard is None:
+        import importlib.util
+        _zstandard = importlib.util.find_spec('zstandard') is not None
+    return _zstandard
+
+
+def compressed_files(files):
+    """Returns a dict of plain filename -> compressed filename for the compressed files of a directory listing"""
+    present = set(files)
+    compressed = {}
+    for filename in files:
+        suffix = compression_of(filename)
+        if suffix is not None:
+            plain = filename[:-len(suffix)]
+            if plain not in present:
+                compressed[plain] = filename
+    return compressed
+
+
+def plain_filenames(files, compressed):
+    """Returns the directory listing with the plain names of the compressed files"""
+    if not compressed:
+        return files
+    compressed_names = set(compressed.values())
+    return [filename for filename in files if filename not in compressed_names] + list(compressed)
+
+
+@contextmanager
+def registered_compressed(root, compressed):
+    """Registers the compressed files of the directory root (plain filename -> compressed filename) while the block is executed"""
+    paths = {os.path.normpath(os.path.join(root, plain)): os.path.join(root, filename) for plain, filename in compressed.items()}
+    _compressed.update(paths)
+    try:
+        yield
+    finally:
+        for path in paths:
+            _compressed.pop(path, None)
+
+
+def resolve(file_path):
+    """Returns the path of the compressed file which is registered for file_path, or file_path"""
+    if not _compressed:
+        return file_path
+    return _compressed.get(os.path.normpath(file_path), file_path)
+
+
+def open_compressed(file_path):
+    """Opens a compressed file for reading bytes, the data is decompressed while it is read"""
+    suffix = compression_of(file_path)
+    data = contents_of(file_path)
+    raw = io.BytesIO(data) if data is not None else open(file_path, 'rb')
+    if data is None and profiling.profiler.enabled:
+        profiling.profiler.count('files opened')
+        profiling.profiler.count('bytes read', os.fstat(raw.fileno()).st_size)
+    profiling.profiler.count('compressed files read')
+    if suffix == '.gz':
+        import gzip
+        return gzip.GzipFile(fileobj=raw)
+    if suffix == '.xz':
+        import lzma
+        return lzma.LZMAFile(raw)
+    if suffix == '.bz2':
+        import bz2
+        return bz2.BZ2File(raw)
+    import zstandard
+    return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True))
+
+
+def open_text(file_path):
+    """
+    Opens a file for reading text like open(file_path, 'r'), prefetched files are read from memory,
+    registered compressed files are decompressed.
+    """
+    file_path = resolve(file_path)
+    if compression_of(file_path) is not None:
+        return io.TextIOWrapper(open_compressed(file_path))
+    data = contents_of(file_path)
+    if data is None:
+        file = open(file_path, 'r')
+        if profiling.profiler.enabled:
+            profiling.profiler.count('files opened')
+            profiling.profiler.count('bytes read', os.fstat(file.fileno()).st_size)
+        return file
+    profiling.profiler.count('prefetched files read')
+    return io.TextIOWrapper(io.BytesIO(data))
+
+
+@contextmanager
+def mapped(file_path):
+    """
+    Memory maps a file for reading, empty files give an empty bytes object (mmap can not map them).
+    Registered compressed files are decompressed completely into memory.
+    """
+    file_path = resolve(file_path)
+    if compression_of(file_path) is not None:
+        with open_compressed(file_path) as file:
+            yield file.read()
+        return
+    data = contents_of(file_path)
+    if data is not None:
+        profiling.profiler.count('prefetched files read')
+        yield data
+        return
+    with open(file_path, 'rb') as file:
+        if profiling.profiler.enabled:
+            profiling.profiler.count('files mapped')
+            profiling.profiler.count('bytes mapped', os.fstat(file.fileno()).st_size)
+        try:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty file
+            yield b''
+            return
+        try:
+            yield buffer
+        finally:
+            buffer.close()
+
+
+def find_markers(file_path, head_markers=(), forward_markers=(), backward_markers=(), limit=HEAD_BYTES):
+    """
+    Checks markers in the order of their costs and stops at the first missing one.
+
+    head_markers : have to be found in the first limit bytes
+    forward_markers : searched from the beginning of the file, for markers which appear early
+    backward_markers : searched from the end of the file, for markers which appear late
+
+    Returns True if all markers are found.
+    """
+    if compression_of(resolve(file_path)) is not None:
+        return find_markers_streamed(resolve(file_path), head_markers, list(forward_markers) + list(backward_markers), limit)
+    with mapped(file_path) as buffer:
+        for marker in head_markers:
+            if buffer.find(marker.encode(), 0, limit) == -1:
+                return False
+        for marker in forward_markers:
+            if buffer.find(marker.encode()) == -1:
+                return False
+        for marker in backward_markers:
+            if buffer.rfind(marker.encode()) == -1:
+                return False
+    return True
+
+
+def find_markers_streamed(file_path, head_markers, markers, limit):
+    """
+    find_markers of a compressed file: the head markers are searched in the first limit bytes,
+    the other markers in chunks, which overlap by the length of the longest marker.
+    """
+    with open_compressed(file_path) as file:
+        buffer = file.read(limit)
+        if any(buffer.find(marker.encode()) == -1 for marker in head_markers):
+            return False
+        missing = [marker.encode() for marker in markers]
+        overlap = max((len(marker) for marker in missing), default=1) - 1
+        while True:
+            missing = [marker for marker in missing if buffer.find(marker) == -1]
+            if not missing:
+                return True
+            chunk = file.read(CHUNK_BYTES)
+            if not chunk:
+                return False
+            buffer = buffer[max(0, len(buffer) - overlap):] + chunk
+
+
+def tail_lines(file_path, count):
+    """
+    Returns the last count lines of a file (like file.readlines()[-count:]), scanning backward from the end.
+    Compressed files are read from the beginning, only count lines are kept.
+    """
+    if compression_of(resolve(file_path)) is not None:
+        from collections import deque
+        with open_compressed(resolve(file_path)) as file:
+            return [line.decode('utf-8', errors='replace') for line in deque(file, maxlen=count)]
+    with mapped(file_path) as buffer:
+        size = len(buffer)
+        # a newline at the very end does not start a new line
+        position = size - 1 if buffer[size-1:size] == b'\n' else size
+        for _ in range(count):
+            position = buffer.rfind(b'\n', 0, position)
+            if position == -1:
+                break
+        return buffer[position+1:size].decode('utf-8', errors='replace').splitlines(keepends=True)
+
@@ -0,0 +1,125 @@
+import re
+from collections import namedtuple
+
+# Declarative pattern tables for the line oriented parsers.
+# A LineScanner sorts the keywords of a table by the first character, if the keyword has to start the line,
+# or keeps them in a short list of substrings, if the keyword can be anywhere in the line.
+# Every line costs one dictionary lookup and a few substring tests,
+# the regular expressions are only tried on lines which contain their keyword.
+
+LinePattern = namedtuple('LinePattern', ['key', 'keyword', 'pattern', 'convert', 'anchored'], defaults=(True,))
+LinePattern.__doc__ = """
+One entry of a pattern table.
+
+key : key of the value in the data dictionary
+keyword : literal string which is contained in every matching line
+pattern : compiled regular expression which extracts the value
+convert : function which takes the match object and returns the value (including unit conversions)
+anchored : True: the line starts with the keyword and pattern.match() is used,
+           False: the keyword is anywhere in the line and pattern.search() is used
+"""
+
+
+def to_float(group=1, factor=None):
+    """Returns a converter for LinePattern, which takes a group as float and optionally multiplies a factor"""
+    if factor is None:
+        return lambda match: float(match.group(group))
+    return lambda match: float(match.group(group)) * factor
+
+
+def to_floats(groups):
+    """Returns a converter for LinePattern, which takes several groups as list of floats"""
+    return lambda match: [float(match.group(group)) for group in groups]
+
+
+def to_int(group=1):
+    """Returns a converter for LinePattern, which takes a group as integer"""
+    return lambda match: int(match.group(group))
+
+
+class LineScanner:
+    """
+    Matches lines against a table of LinePattern entries.
+    Only the patterns whose keyword is found in a line are tried.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = tuple(patterns)
+        keywords = []
+        for entry in self.patterns:
+            if (entry.keyword, entry.anchored) not in keywords:
+                keywords.append((entry.keyword, entry.anchored))
+
+        # first character -> ((keyword, entries), ...) for keywords at the start of the line
+        self._starts = {}
+        # ((keyword, entries), ...) for keywords anywhere in the line
+        self._anywhere = ()
+        for keyword, anchored in keywords:
+            entries = tuple(entry for entry in self.patterns if entry.keyword == keyword and entry.anchored == anchored)
+            if anchored:
+                self._starts[keyword[:1]] = self._starts.get(keyword[:1], ()) + ((keyword, entries),)
+            else:
+                self._anywhere += ((keyword, entries),)
+
+    def _candidates(self, line):
+        """Yields the entries whose keyword is found in the line"""
+        for keyword, entries in self._starts.get(line[:1], ()):
+            if line.startswith(keyword):
+                yield from entries
+        for keyword, entries in self._anywhere:
+            if keyword in line:
+                yield from entries
+
+    def match_line(self, line):
+        """Returns a list of (key, value) tuples for all patterns matching the line"""
+        values = []
+        for entry in self._candidates(line):
+            match = entry.pattern.match(line) if entry.anchored else entry.pattern.search(line)
+            if match:
+                values.append((entry.key, entry.convert(match)))
+        return values
+
+    def scan_line(self, line, data):
+        """Saves the values of all patterns matching the line in data"""
+        candidates = self._starts.get(line[:1])
+        if candidates is not None:
+            for keyword, entries in candidates:
+                if line.startswith(keyword):
+                    for entry in entries:
+                        match = entry.pattern.match(line)
+                        if match:
+                            data[entry.key] = entry.convert(match)
+        for keyword, entries in self._anywhere:
+            if keyword in line:
+                for entry in entries:
+                    match = entry.pattern.search(line)
+                    if match:
+                        data[entry.key] = entry.convert(match)
+
+    def scan(self, lines, data):
+        """Scans all lines (e.g. an open file), later values overwrite earlier ones"""
+        # same as scan_line, inlined to save the call per line
+        starts = self._starts
+        anywhere = self._anywhere
+        for line in lines:
+            candidates = starts.get(line[:1])
+            if candidates is not None:
+                for keyword, entries in candidates:
+                    if line.startswith(keyword):
+                        for entry in entries:
+                            match = entry.pattern.match(line)
+                            if match:
+                                data[entry.key] = entry.convert(match)
+            for keyword, entries in anywhere:
+                if keyword in line:
+                    for entry in entries:
+                        match = entry.pattern.search(line)
+                        if match:
+                            data[entry.key] = entry.convert(match)
+        return data
+
+    def iter_matches(self, lines):
+        """Yields (line index, key, value) for every match"""
+        for i, line in enumerate(lines):
+            for key, value in self.match_line(line):
+                yield i, key, value
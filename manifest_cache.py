@@ -0,0 +1,113 @@
+import os
+import pickle
+
+import my_constants as mc
+
+# Persistent manifest of parsed directories, such that a re-crawl only parses new or modified directories.
+# Every directory is keyed by its root and stores the signature (size, mtime, inode) of all of its files,
+# the post-processed calculations and the is_orca_output verdicts of its .out files.
+
+CACHE_DIR = '.qcdc_cache'
+MANIFEST_FILE = 'manifest.pkl'
+# Increase, if the layout of the cached calculations changes
+CACHE_VERSION = 3
+
+
+def file_signature(path):
+    """Returns (size, mtime in ns, inode) of a file, None if the file vanished in the meantime"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+def directory_signature(root, files):
+    """Returns a dictionary with the signatures of all files in a directory"""
+    return {filename: file_signature(os.path.join(root, filename)) for filename in files}
+
+
+def settings_key(args):
+    """
+    Everything that changes the content of a cached calculation.
+    A manifest written with different settings is discarded.
+    """
+    return (
+        CACHE_VERSION,
+        tuple(sorted((key, repr(value)) for key, value in mc.yaml_variables.items())),
+        args.orca,
+        args.turbomole,
+        args.censo,
+        args.trajectory,
+    )
+
+
+class Manifest:
+    """
+    In-memory view of the manifest.
+    Entries of the last run are looked up with lookup(), the entries of this run are collected with store().
+    save() only writes the entries of this run, such that deleted directories are dropped.
+    """
+
+    def __init__(self, settings, entries=None):
+        self.settings = settings
+        self.old_entries = entries or {}
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, args, cache_dir=CACHE_DIR):
+        """Loads the manifest of the last run, returns an empty manifest if it is missing or outdated"""
+        settings = settings_key(args)
+        path = os.path.join(cache_dir, MANIFEST_FILE)
+        try:
+            with open(path, 'rb') as file:
+                content = pickle.load(file)
+        except FileNotFoundError:
+            return cls(settings)
+        except (pickle.UnpicklingError, EOFError, AttributeError) as e:
+            print(f"{e}: could not read the cache {path}, starting with an empty cache")
+            return cls(settings)
+        if content.get('settings') != settings:
+            print(f"Settings changed since the last run, the cache {path} is not used")
+            return cls(settings)
+        return cls(settings, content.get('entries'))
+
+    def lookup(self, root, signature):
+        """
+        Returns the cached calculations of a directory if none of its files changed, otherwise None.
+        """
+        entry = self.old_entries.get(root)
+        if entry is not None and entry['signature'] == signature:
+            self.hits += 1
+            return entry['calculations']
+        self.misses += 1
+        return None
+
+    def known_orca_verdicts(self, root, signature):
+        """Returns the is_orca_output verdicts of the files in a directory which did not change"""
+        entry = self.old_entries.get(root)
+        if entry is None:
+            return {}
+        old_signature = entry['signature']
+        return {filename: verdict for filename, verdict in entry['orca_verdicts'].items()
+                if filename in signature and old_signature.get(filename) == signature[filename]}
+
+    def store(self, root, signature, calculations, orca_verdicts):
+        """Saves the result of a directory for the next run"""
+        self.entries[root] = {
+            'signature': signature,
+            'calculations': calculations,
+            'orca_verdicts': orca_verdicts or {},
+        }
+
+    def save(self, cache_dir=CACHE_DIR):
+        """Writes the entries of this run, the file is replaced atomically"""
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        path = os.path.join(cache_dir, MANIFEST_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump({'settings': self.settings, 'entries': self.entries}, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
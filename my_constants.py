@@ -1,39 +1,44 @@
-import yaml
 import os
 
 # Get the absolute path of the yaml file
 yaml_file_path = os.path.dirname(os.path.abspath(__file__)) + '/config.yml'
 current_file_path = 'config.yml'
-#print(current_file_path)
+
+# The variables of config.yml are read at the first access of one of them (e.g. mc.TEMPERATURE),
+# not at import time, such that importing the modules stays cheap and has no side effects.
 
 # Function to import variables from YAML into a Python dictionary
 def import_yaml_variables(yaml_path):
+    import yaml
     with open(yaml_path, 'r') as file:
         data = yaml.safe_load(file)
     return data
 
-# Retrieve the variables
-if os.path.exists(current_file_path):
-    print('config exists here')
-    print(current_file_path)
-    yaml_variables = import_yaml_variables(current_file_path)
-elif not os.path.exists(current_file_path):
-    print('config does not exist, using default')
-    print(yaml_file_path)
-    yaml_variables = import_yaml_variables(yaml_file_path)
-else:
-    print(f"Error while reading the YAML file")
-    print(current_file_path)
-    raise FileNotFoundError
+def config_path():
+    """Returns config.yml of the working directory if it exists, otherwise the default next to this file"""
+    if os.path.exists(current_file_path):
+        return current_file_path
+    return yaml_file_path
 
+def load(path=None):
+    """Reads the YAML file and imports the variables into the namespace of this module"""
+    global yaml_variables, config_file
+    config_file = config_path() if path is None else path
+    yaml_variables = import_yaml_variables(config_file)
+    # Import the variables into the current namespace
+    globals().update(yaml_variables)
+    return yaml_variables
 
-# Import the variables into the current namespace
-for key, value in yaml_variables.items():
-    globals()[key] = value
+def __getattr__(name):
+    # only called for names which are not (yet) in the namespace
+    if 'yaml_variables' not in globals() and not name.startswith('__'):
+        load()
+        if name in globals():
+            return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Optional: Print variables for verification
 if __name__ == '__main__':
-    print("Variables imported from YAML:")
-    for key, value in yaml_variables.items():
+    print(f"Variables imported from YAML ({config_path()}):")
+    for key, value in load().items():
         print(f"{key}: {value}")
-
@@ -0,0 +1,296 @@
+import json
+from collections import namedtuple
+
+import numpy as np
+
+# Output of the collected calculations as JSON (pandas), JSON Lines or in the columnar formats of pyarrow.
+# 'jsonl' is written record by record while the directories are parsed (JsonLinesWriter).
+# Coordinates, frequencies and the other ragged arrays become typed list columns
+# (list<fixed_size_list<double, 3>> for coordinates), scalar properties native columns with nulls.
+# 'arrow' is the uncompressed Arrow IPC file, which can be memory-mapped without copying,
+# 'feather' is the same container with compression.
+
+FORMATS = ('json', 'jsonl', 'parquet', 'arrow', 'feather')
+EXTENSIONS = {'json': '.json', 'jsonl': '.jsonl', 'parquet': '.parquet', 'arrow': '.arrow', 'feather': '.feather'}
+DEFAULT_COMPRESSION = {'json': None, 'jsonl': None, 'parquet': 'zstd', 'arrow': None, 'feather': 'lz4'}
+
+# Columns which are only kept in memory (iter_calculations), never saved
+MEMORY_COLUMNS = ['CENSO Tables']
+# Columns which are only saved with --savexyz on
+XYZ_COLUMNS = ['xyz Coordinates', 'Frequencies', 'Elements', 'Atomic Numbers', 'Trajectory Coordinates', 'Trajectory Gradients']
+
+RaggedColumn = namedtuple('RaggedColumn', ['dtype', 'width', 'prepare'])
+RaggedColumn.__doc__ = """
+Typed list column.
+
+dtype : numpy type of the values
+width : length of the fixed size lists of the values (3 for coordinates), or None for a plain list
+prepare : function which converts a value of the records into something np.asarray accepts, or None
+"""
+
+
+def surface_points(surface):
+    """Converts the surface scan dictionary {'0': [coordinate, energy], ...} into the list of points"""
+    return [surface[key] for key in sorted(surface, key=int)]
+
+
+RAGGED_COLUMNS = {
+    'xyz Coordinates': RaggedColumn(np.float64, 3, None),
+    'xyz Input Coordinates': RaggedColumn(np.float64, 3, None),
+    'Frequencies': RaggedColumn(np.float64, None, None),
+    'Atomic Numbers': RaggedColumn(np.uint8, None, None),
+    'Surface': RaggedColumn(np.float64, 2, surface_points),
+    'Trajectory Energies': RaggedColumn(np.float64, None, None),
+    'Trajectory Coordinates': RaggedColumn(np.float64, 3, None),
+    'Trajectory Gradients': RaggedColumn(np.float64, 3, None),
+    'Trajectory Convergence': RaggedColumn(np.float64, 5, None),
+}
+
+
+def is_missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def record_columns(records, columns=None, exclude=()):
+    """
+    Returns the column names in the order of their first appearance (like pandas.DataFrame),
+    or the selected columns which exist, without the excluded ones.
+    """
+    present = {}
+    for record in records:
+        for key in record:
+            present.setdefault(key, None)
+    if columns is not None:
+        missing = [column for column in columns if column not in present]
+        if missing:
+            print(f"Columns not found: {missing}")
+        present = {column: None for column in columns if column in present}
+    return [column for column in present if column not in exclude]
+
+
+def ragged_array(values, column):
+    """Converts a list of arrays (or None) into a typed list array of pyarrow"""
+    import pyarrow as pa
+    pieces = []
+    valid = np.ones(len(values), dtype=bool)
+    width = column.width or 1
+    for i, value in enumerate(values):
+        piece = np.zeros(0, dtype=column.dtype)
+        if is_missing(value):
+            valid[i] = False
+        else:
+            try:
+                if column.prepare is not None:
+                    value = column.prepare(value)
+                piece = np.asarray(value, dtype=column.dtype).reshape(-1, width).reshape(-1)
+            except (ValueError, TypeError) as e:
+                print(f"{e} in column conversion, value is saved as null")
+                valid[i] = False
+        pieces.append(piece)
+
+    offsets = np.zeros(len(pieces) + 1, dtype=np.int64)
+    np.cumsum([len(piece) // width for piece in pieces], out=offsets[1:])
+    flat = np.concatenate(pieces) if pieces else np.zeros(0, dtype=column.dtype)
+    items = pa.array(flat)
+    if column.width:
+        items = pa.FixedSizeListArray.from_arrays(items, column.width)
+    if offsets[-1] < 2**31:
+        return pa.ListArray.from_arrays(pa.array(offsets, type=pa.int32()), items, mask=pa.array(~valid))
+    return pa.LargeListArray.from_arrays(pa.array(offsets), items, mask=pa.array(~valid))
+
+
+def scalar_array(values):
+    """
+    Converts a list of values into a pyarrow array with the inferred type (float, int, bool, string, lists, ...).
+    Columns with mixed types or empty dictionaries are saved as strings (JSON for lists and dictionaries).
+    """
+    import pyarrow as pa
+    try:
+        array = pa.array(values, from_pandas=True)
+        if not (pa.types.is_struct(array.type) and array.type.num_fields == 0):
+            return array
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        pass
+    strings = []
+    for value in values:
+        if is_missing(value):
+            strings.append(None)
+        elif isinstance(value, (dict, list, tuple)):
+            strings.append(json.dumps(value, default=str))
+        else:
+            strings.append(str(value))
+    return pa.array(strings, type=pa.string())
+
+
+def records_to_table(records, columns=None, exclude=()):
+    """Converts a list of calculation dictionaries into a pyarrow Table"""
+    import pyarrow as pa
+    arrays = {}
+    for column in record_columns(records, columns, exclude):
+        values = [record.get(column) for record in records]
+        if column in RAGGED_COLUMNS:
+            arrays[column] = ragged_array(values, RAGGED_COLUMNS[column])
+        else:
+            arrays[column] = scalar_array(values)
+    return pa.table(arrays)
+
+
+def columns_to_table(columns):
+    """Converts a dictionary of flat arrays (e.g. the thermochemistry grid) into a pyarrow Table"""
+    import pyarrow as pa
+    return pa.table({key: scalar_array(list(values)) if np.asarray(values).dtype == object else pa.array(values)
+                     for key, values in columns.items()})
+
+
+def write_table(table, path, output_format, compression=None):
+    """Writes a pyarrow Table as parquet, arrow (IPC file) or feather file"""
+    import pyarrow as pa
+    if compression is None:
+        compression = DEFAULT_COMPRESSION[output_format]
+    if compression == 'none':
+        compression = None
+    if output_format == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, path, compression=compression or 'none')
+    elif output_format == 'arrow':
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        with pa.OSFile(path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+    elif output_format == 'feather':
+        import pyarrow.feather as feather
+        feather.write_feather(table, path, compression=compression or 'uncompressed')
+    else:
+        raise ValueError(f"Unknown output format {output_format}")
+
+
+def read_table(path, columns=None):
+    """
+    Reads a parquet, arrow or feather file written by qcdc as pyarrow Table (table.to_pandas() for a DataFrame).
+    Arrow and feather files are memory-mapped, uncompressed arrow files are read without copying.
+    """
+    import pyarrow as pa
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.read_table(path, columns=columns, memory_map=True)
+    if path.endswith('.feather'):
+        import pyarrow.feather as feather
+        return feather.read_table(path, columns=columns, memory_map=True)
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    return table.select(columns) if columns is not None else table
+
+
+def json_default(value):
+    """Converts numpy arrays and scalars for json.dumps"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def json_value(value):
+    """
+    Converts a value for json.dumps, NaN and infinity become null like in the output of pandas,
+    also in arrays, lists and dictionaries (e.g. frequencies, trajectories, CENSO Tables), sets become sorted lists
+    """
+    if isinstance(value, float):
+        return value if np.isfinite(value) else None
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind in 'iub' or (value.dtype.kind == 'f' and np.isfinite(value).all()):
+            return value.tolist()
+        return json_value(value.tolist())
+    if isinstance(value, np.generic):
+        return json_value(value.item())
+    if isinstance(value, (list, tuple)):
+        return [json_value(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return [json_value(item) for item in sorted(value, key=str)]
+    if isinstance(value, dict):
+        return {key: json_value(item) for key, item in value.items()}
+    return value
+
+
+class JsonLinesWriter:
+    """
+    Writes one calculation per line (JSON Lines) and flushes after every record,
+    such that the memory stays constant and the written records survive an interrupted run.
+
+    with JsonLinesWriter('data.jsonl', columns, exclude) as writer:
+        writer.write(calculation)
+    """
+
+    def __init__(self, path, columns=None, exclude=()):
+        self.path = path
+        self.columns = columns
+        self.exclude = set(exclude)
+        self.count = 0
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'w')
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+        self.file = None
+
+    def write(self, record):
+        if self.columns is not None:
+            keys = [column for column in self.columns if column in record and column not in self.exclude]
+        else:
+            keys = [key for key in record if key not in self.exclude]
+        line = json.dumps({key: json_value(record[key]) for key in keys}, default=json_default, allow_nan=False)
+        self.file.write(line + '\n')
+        self.file.flush()
+        self.count += 1
+
+
+def read_json_lines(path):
+    """Reads a data.jsonl file as DataFrame"""
+    import pandas as pd
+    return pd.read_json(path, lines=True)
+
+
+def output_path(stem, output_format):
+    return stem + EXTENSIONS[output_format]
+
+
+def write_records(records, stem, args, exclude=()):
+    """
+    Writes the calculations in the format of the arguments (--format, --columns, --compression).
+    Returns the path and the written DataFrame (json) or pyarrow Table.
+    """
+    path = output_path(stem, args.format)
+    if args.format == 'jsonl':
+        with JsonLinesWriter(path, args.columns, exclude) as writer:
+            for record in records:
+                writer.write(record)
+        return path, read_json_lines(path)
+    if args.format == 'json':
+        import pandas as pd
+        df = pd.DataFrame(records)
+        df = df[record_columns(records, args.columns, exclude)]
+        df.to_json(path)
+        return path, df
+    table = records_to_table(records, args.columns, exclude)
+    write_table(table, path, args.format, args.compression)
+    return path, table
+
+
+def write_columns(columns, stem, args, json_orient='records'):
+    """Writes a dictionary of flat arrays in the format of the arguments, returns the path and the number of rows"""
+    path = output_path(stem, args.format)
+    if args.format == 'json':
+        import pandas as pd
+        df = pd.DataFrame(columns)
+        df.to_json(path, orient=json_orient)
+        return path, len(df)
+    if args.format == 'jsonl':
+        import pandas as pd
+        df = pd.DataFrame(columns)
+        df.to_json(path, orient='records', lines=True)
+        return path, len(df)
+    table = columns_to_table(columns)
+    write_table(table, path, args.format, args.compression)
+    return path, table.num_rows
@@ -11,10 +11,38 @@ def on_off_type(value):
     else:
         raise argparse.ArgumentTypeError("Accepted values are 'on' or 'off'.")
 
-def get_arguments():
+def range_type(value):
+    """
+    Parses a list of values for a grid, either 'start:stop:step' (stop included) or comma separated values.
+    """
+    try:
+        if ':' in value:
+            start, stop, step = (float(part) for part in value.split(':'))
+            if step <= 0 or stop < start:
+                raise ValueError
+            count = int(round((stop - start) / step)) + 1
+            values = [start + i * step for i in range(count)]
+            return [x for x in values if x <= stop + step * 1e-9]
+        return [float(part) for part in value.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError("Accepted values are 'start:stop:step' with step > 0 or comma separated numbers.")
+
+def list_type(value):
+    """Parses a comma separated list of names, e.g. column names."""
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+def store_type(value):
+    """Parses the results store, 'sqlite:path.db'."""
+    backend, _, path = value.partition(':')
+    if backend != 'sqlite' or not path:
+        raise argparse.ArgumentTypeError("Accepted values are 'sqlite:path.db'.")
+    return value
+
+def get_arguments(argv=None):
     """
     Parses command-line arguments for --orca, --turbomole, and --censo.
     Defaults to True but can be explicitly set with 'on'/'off'.
+    argv : list of arguments instead of sys.argv, get_arguments([]) returns the defaults
     """
     parser = argparse.ArgumentParser(description='Process boolean arguments with on/off control.')
 
@@ -23,10 +51,35 @@ def get_arguments():
     parser.add_argument('--turbomole', type=on_off_type, default=True, help="Control TURBOMOLE (default: on).")
     parser.add_argument('--censo', type=on_off_type, default=True, help="Control CENSO (default: on).")
     parser.add_argument('--savexyz', type=on_off_type, default=False, help="Save xyz data in dataframe in addition to folders (default: off).")
-    parser.add_argument('--ignore_folders', type=str, default='ignore_folders', help="File with Foldernames to be ignored. (default: ignore_folders, set by 'ls -d ./*/ > ignore_folders')")
+    parser.add_argument('--xyz', type=str, default='files', choices=['files', 'archive', 'off'], help="Geometries as one file per calculation in ./xyz, as one indexed extxyz archive ./xyz/geometries.extxyz, or not at all (default: files).")
+    parser.add_argument('--skip_unchanged', type=on_off_type, default=True, help="Do not rewrite xyz files or archive frames whose content did not change (default: on).")
+    parser.add_argument('--trajectory', type=on_off_type, default=False, help="Parse all cycles of geometry optimizations: energies, geometries, gradients and the RMS and max gradient of the last cycle (default: off).")
+    parser.add_argument('--ensembles', type=on_off_type, default=False, help="Boltzmann average the conformers of the same calculation in CONF<n> directories and write ensembles.<format> (default: off).")
+    parser.add_argument('--ignore_folders', type=str, default='ignore_folders', help="File with the directories to be ignored, one name, glob, ./path or re:regex per line. (default: ignore_folders, set by 'ls -d ./*/ > ignore_folders')")
+    parser.add_argument('--max_depth', type=int, default=None, help="Directories deeper than max_depth below the working directory are not searched (default: no limit).")
+    parser.add_argument('--archives', type=on_off_type, default=False, help="Walk through the members of tar and zip archives (.tar, .tgz, .tar.gz, .tar.xz, .tar.bz2, .tar.zst, .zip) like directories, without extracting them (default: off).")
+    parser.add_argument('--follow_symlinks', type=on_off_type, default=False, help="Enter symlinked directories, directories reached twice are parsed once (default: off).")
+    parser.add_argument('--prune_scratch', type=on_off_type, default=False, help="Skip the scratch directories of the calculations, SCRATCH_DIRS in config.yml (default: off).")
+    parser.add_argument('--jobs', type=int, default=1, help="Number of worker processes which parse the directories (default: 1).")
+    parser.add_argument('--cache', type=on_off_type, default=False, help="Reuse the results of unchanged directories from the manifest in .qcdc_cache (default: off).")
+    parser.add_argument('--batch_size', type=int, default=64, help="Number of directories handed to a worker at once (default: 64).")
+    parser.add_argument('--prefetch_threads', type=int, default=0, help="Number of threads which read the files of the next directories ahead, for network file systems (default: 0, off).")
+    parser.add_argument('--prefetch_dirs', type=int, default=256, help="Number of directories which are read ahead (default: 256).")
+    parser.add_argument('--prefetch_mb', type=int, default=512, help="Budget of the read ahead files in memory in MB, larger files are read by the parsers (default: 512).")
+    parser.add_argument('--watch', type=on_off_type, default=False, help="Crawl once and keep polling the directories, directories with new or finished calculations are parsed again and data.<format> and the store are updated, until Ctrl+C or SIGTERM (default: off).")
+    parser.add_argument('--watch_interval', type=float, default=10.0, help="Seconds between two polls of --watch (default: 10).")
+    parser.add_argument('--watch_settle', type=float, default=30.0, help="Seconds without changes of the files of a directory before --watch parses it, such that files being written are not parsed (default: 30).")
+    parser.add_argument('--profile', type=on_off_type, default=False, help="Time the stages and parsers, count the files and bytes read and write the report to profile.json (default: off).")
+    parser.add_argument('--profile_top', type=int, default=20, help="Number of the slowest directories in profile.json (default: 20).")
+    parser.add_argument('--format', type=str, default='json', choices=['json', 'jsonl', 'parquet', 'arrow', 'feather'], help="Format of the output data.<format>, jsonl writes every calculation as soon as it is parsed (default: json).")
+    parser.add_argument('--columns', type=list_type, default=None, help="Comma separated list of the columns in the output (default: all).")
+    parser.add_argument('--compression', type=str, default=None, help="Compression of parquet, arrow or feather output, e.g. zstd, lz4 or none (default: zstd for parquet, lz4 for feather, none for arrow).")
+    parser.add_argument('--store', type=store_type, default=None, help="Upsert the calculations into a database in addition to data.<format>, e.g. sqlite:results.db (default: off).")
+    parser.add_argument('--temperatures', type=range_type, default=None, help="Temperatures in K for the grid of free energies in thermo_grid.<format>, e.g. 250:400:10 or 273.15,298.15 (default: off).")
+    parser.add_argument('--pressures', type=range_type, default=None, help="Pressures in Pa for the grid of free energies in thermo_grid.<format>, e.g. 1e5,1e6 (default: PRESSURE of config.yml, if --temperatures is given).")
 
     # Parse and return the arguments
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 # Optional: Testing directly if executed as a standalone script
 if __name__ == '__main__':
@@ -35,3 +88,8 @@ if __name__ == '__main__':
     print(f"Turbomole: {args.turbomole}")
     print(f"Censo: {args.censo}")
     print(f"saveXYZ: {args.savexyz}")
+    print(f"xyz: {args.xyz}")
+    print(f"Jobs: {args.jobs}")
+    print(f"Format: {args.format}")
+    print(f"Temperatures: {args.temperatures}")
+    print(f"Pressures: {args.pressures}")
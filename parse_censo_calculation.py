@@ -1,10 +1,16 @@
-
 import os
 import re
 
 import common_functions
+import file_access
 import my_constants as mc
 import numpy as np
+import thermochemistry
+
+
+def prefetch_filenames(filenames):
+    """Returns the filenames which parse_censo may read"""
+    return [filename for filename in filenames if filename == 'censo.out']
 
 
 def parse_censo(root, dirs, files):
@@ -20,10 +26,18 @@ def parse_censo(root, dirs, files):
         ser['Type of Calculation'] = 'censo'
 
         #do default parsing operations
-        ser['censo conformers'], best_values = parse_censo_file (ser['RootFile'])
+        tables = read_censo_tables(ser['RootFile'])
+        ser['censo conformers'], best_values = last_table(tables, ser['RootFile'])
         if bool(best_values):
             for (key, value) in zip (censo_columns, best_values):
                 ser[key] = value
+        if tables:
+            # ranking tables of all parts, the last one is reweighted at TEMPERATURE of config.yml
+            ser['CENSO Tables'] = [censo_table(rows, lowest) for rows, lowest in tables]
+            ser['Conformers'] = len(ser['CENSO Tables'][-1])
+            if ser['Conformers']:
+                _, free_energy = reweight(ser['CENSO Tables'][-1], mc.TEMPERATURE)
+                ser['Ensemble Free Energy'] = free_energy[0] * mc.EH2KJMOL
         #parse_censo_file (ser['RootFile'], ser)
 
     return ser
@@ -31,50 +45,157 @@ def parse_censo(root, dirs, files):
 
 # Columns for the table
 censo_columns = ["CONF#", "E(GFNn-xTB)", "dE(GFNn-xTB)", "E [Eh]", "Gsolv [Eh]", "GmRRHO [Eh]", "Gtot", "dGtot", "Boltzmannweight"]
-
-# Pattern to match the table header
+# Typed columns of the ranking tables (energies in Eh, dE and dGtot in kcal/mol, Boltzmannweight in %),
+# the names of E [Eh], Gsolv [Eh] and GmRRHO [Eh] without the unit
+CENSO_DTYPE = np.dtype([
+    ('CONF#', np.int32), ('E(GFNn-xTB)', np.float64), ('dE(GFNn-xTB)', np.float64), ('E', np.float64), ('Gsolv', np.float64),
+    ('GmRRHO', np.float64), ('Gtot', np.float64), ('dGtot', np.float64), ('Boltzmannweight', np.float64), ('lowest', np.bool_),
+])
+
+# Pattern to match the table header, only tried on the lines containing CONF#
 header_pattern = re.compile(r"CONF#\s+E\(GFNn-xTB\)\s+ΔE\(GFNn-xTB\)\s+E\s\[Eh\]\s+Gsolv\s\[Eh\]\s+GmRRHO\s\[Eh\]\s+Gtot\s+ΔGtot\s+Boltzmannweight")
 #header_pattern = re.compile(r"CONF#\s+E\(GFNn-xTB\)\s+..E\(GFNn-xTB\)\s+E\s\[Eh\]\s+Gsolv\s\[Eh\]\s+GmRRHO\s\[Eh\]\s+Gtot\s+..Gtot\s+Boltzmannweight")
 #header_pattern = re.compile(r"CONF#\s+E\(GFNn-xTB\)\s+�~TE\(GFNn-xTB\)\s+E\s\[Eh\]\s+Gsolv\s\[Eh\]\s+GmRRHO\s\[Eh\]\s+Gtot\s+�~TGtot\s+Boltzmannweight")
+CENSO_DONE = 'CENSO all done!\n'
 
 
 # This only works if headers match censo headers (mRRHO has to be switched on)
 # And only for part 2 and part 3?
-def parse_censo_file(file_path):
-    all_data = []
-    all_lowest_conformers = []
-    with open(file_path, 'r') as file:
-        lines = file.readlines()
-
-    if lines[-1] != 'CENSO all done!\n':
-        return None, None
-
-    for i, line in enumerate(lines):
-        data = []
-        lowest_conformer = []
-        if header_pattern.search(line):
+def read_censo_tables(file_path):
+    """
+    Reads the ranking tables of all parts of a finished censo.out (None if CENSO did not finish).
+    Returns a list of (rows, lowest) per table, the rows are lists of strings,
+    lowest is the row of the conformer marked with <------ (or []).
+    Only the lines containing CONF# are tested for the header, the rows end with an empty line.
+    """
+    with file_access.open_text(file_path) as file:
+        text = file.read()
+    if not text.endswith(CENSO_DONE):
+        return None
+
+    tables = []
+    position = text.find('CONF#')
+    while position != -1:
+        line_start = text.rfind('\n', 0, position) + 1
+        line_end = text.find('\n', position)
+        if line_end == -1:
+            break
+        if header_pattern.search(text, line_start, line_end):
             # Skip the header and the two following metadata lines
-            for j in range(i + 3, len(lines)):
-                if lines[j].strip() == "":  # Stop if we reach an empty line
-                    all_data.append(data)
-                    all_lowest_conformers.append(lowest_conformer)
-                    break
-                row = re.split(r'\s+', lines[j].strip())
-                if len(row) == len(censo_columns):
-                    data.append(row)
-                elif len(row) == len(censo_columns) + 1:
-                    lowest_conformer = row[:-1]
-                    data.append(lowest_conformer)
-
+            start = text.find('\n', text.find('\n', line_end + 1) + 1) + 1
+            rows, lowest, end = table_rows(text, start) if start else ([], [], None)
+            if end is None:
+                break
+            tables.append((rows, lowest))
+            line_end = end
+        position = text.find('CONF#', line_end)
+    return tables
+
+
+def table_rows(text, start):
+    """Returns the rows, the lowest conformer and the end of a table which starts at start, end is None without empty line"""
+    rows = []
+    lowest = []
+    while True:
+        end = text.find('\n', start)
+        if end == -1:
+            return rows, lowest, None
+        row = text[start:end].split()
+        if not row:  # Stop if we reach an empty line
+            return rows, lowest, end
+        if len(row) == len(censo_columns):
+            rows.append(row)
+        elif len(row) == len(censo_columns) + 1:
+            lowest = row[:-1]
+            rows.append(lowest)
+        start = end + 1
+
+
+def last_table(tables, file_path):
+    """Returns the rows and the lowest conformer of the last table, like parse_censo_file"""
+    if tables is None:
+        return None, None
     try:
-        last=all_data[-1]
-        lowest=all_lowest_conformers[-1]
-        return last, lowest
+        return tables[-1]
     except IndexError as e:
         print(f'{e} in parse_censo_file, we might miss some column in the censo output: {file_path}')
         return None, None
 
 
+def parse_censo_file(file_path):
+    """Returns the rows (lists of strings) and the lowest conformer of the last ranking table in censo.out"""
+    return last_table(read_censo_tables(file_path), file_path)
+
+
+def cell_value(cell):
+    """Converts a cell of a ranking table to float, placeholders of failed conformers (e.g. --- or NaN*) are NaN"""
+    try:
+        return float(cell)
+    except ValueError:
+        return np.nan
+
+
+def censo_table(rows, lowest=None):
+    """
+    Converts the rows of a ranking table into a structured array with CENSO_DTYPE.
+    Cells which are no numbers are NaN.
+    """
+    table = np.zeros(len(rows), dtype=CENSO_DTYPE)
+    if not rows:
+        return table
+    try:
+        values = np.array([row[1:] for row in rows], dtype=float)
+    except ValueError:
+        values = np.array([[cell_value(cell) for cell in row[1:]] for row in rows], dtype=float)
+    for i, name in enumerate(CENSO_DTYPE.names[1:-1]):
+        table[name] = values[:, i]
+    table['CONF#'] = [int(row[0][4:]) if row[0][4:].isdigit() else -1 for row in rows]
+    table['lowest'] = table['dGtot'] == 0 if lowest is None else [row is lowest for row in rows]
+    return table
+
+
+def reweight(table, temperatures):
+    """
+    Boltzmann populations (temperatures x conformers) and ensemble free energies (Eh) of a ranking table
+    at other temperatures (K) than the one of the CENSO run, from Gtot without running CENSO again.
+    Conformers without Gtot (NaN, failed in CENSO) have the weight 0.
+    """
+    energies = table['Gtot']
+    found = ~np.isnan(energies)
+    if found.all():
+        return thermochemistry.boltzmann_ensemble(energies, temperatures)
+    found_weights, free_energies = thermochemistry.boltzmann_ensemble(energies[found], temperatures)
+    weights = np.zeros((len(free_energies), len(energies)))
+    weights[:, found] = found_weights
+    return weights, free_energies
+
+
+def derive_censo_grid(calculations, temperatures):
+    """
+    Reweights the last ranking table of all CENSO calculations in a list for every temperature (K).
+    Returns a long table (conformer x temperature) as dictionary of flat arrays, energies in kJ/mol.
+    """
+    temperatures = np.asarray(temperatures, dtype=float)
+    pieces = []
+    for ser in calculations:
+        tables = ser.get('CENSO Tables')
+        if not tables or not len(tables[-1]):
+            continue
+        table = tables[-1]
+        weights, free_energies = reweight(table, temperatures)
+        pieces.append({
+            'RootFile': np.full(weights.size, ser['RootFile'], dtype=object),
+            'Temperature': np.repeat(temperatures, len(table)),
+            'CONF#': np.tile(table['CONF#'], len(temperatures)),
+            'Gtot': np.tile(table['Gtot'], len(temperatures)) * mc.EH2KJMOL,
+            'Boltzmann Weight': weights.ravel(),
+            'Ensemble Free Energy': np.repeat(free_energies, len(table)) * mc.EH2KJMOL,
+        })
+    if not pieces:
+        return None
+    return {key: np.concatenate([piece[key] for piece in pieces]) for key in pieces[0]}
+
+
 # This is not really needed anymore,
 # but it also finds the result of the Boltzmann sum
 # However, applying the Boltzmann sum does only make sense with a proper preprocessing of the geometries.
@@ -1,16 +1,28 @@
 import common_functions
+import file_access
+import functools
 import my_constants as mc
+import numpy as np
+import profiling
 import re
+from line_scanner import LinePattern, LineScanner, to_float, to_floats, to_int
 
-def parse_orca(root, dirs, files):
+def parse_orca(root, dirs, files, orca_verdicts=None, trajectory=False):
     """
     function parses orca files and returns content as dict
+    orca_verdicts : optional dict of filename -> is_orca_output result, known verdicts are reused and new ones are added
+    trajectory : collect the geometries, energies and convergence of all optimization cycles (--trajectory)
     """
-    orca_filenames = filter_orca_filenames(files, root)
+    # is_orca_output only reads the beginning and the end of the files
+    with profiling.profiler.stage('orca/is_orca_output'):
+        orca_filenames = filter_orca_filenames(files, root, orca_verdicts)
     calculations = []
-    #print(orca_filenames)
     for filename in orca_filenames:
 
+        # every output file is read only once, see read_orca_output
+        with profiling.profiler.stage('orca/read_orca_output'):
+            output = read_orca_output(root+'/'+filename, trajectory)
+
         #ser reflects one series, although we use dict to be faster
         ser = dict()
         ser['Type of Calculation'] = 'orca'
@@ -18,19 +30,15 @@ def parse_orca(root, dirs, files):
         #save path and filename related variables in ser
         common_functions.set_paths(ser, root, filename)
 
-        #extract orca input from output
-        _, input_file = extract_orca_input(ser ['RootFile'])
-        parse_orca_input (ser, input_file, files)
-        
-
-
+        #orca input from output
+        parse_orca_input (ser, output['Input'], files)
 
-        #do default parsing operations
-        parse_file ( ser['RootFile'], ser )
+        #default parsing operations
+        ser.update(output['Properties'])
 
         if ser['Potential Energy Surface Scan']:
-            #parse scan-file
-            ser ['Surface'] = parse_scan_file(ser['RootFile'])
+            #scan data
+            ser ['Surface'] = output['Surface']
 
         if filename.endswith('.out'):
             ser ['BaseName'] = filename[:-4]
@@ -46,28 +54,209 @@ def parse_orca(root, dirs, files):
         # after changing this, the BaseName above is not necessary anymore
         if xyz_file in files:
             ser['Number of Atoms'], _, ser['Elements'], ser['xyz Coordinates'] = common_functions.read_xyz (root + '/' + xyz_file)
-        
-        frequencies = None
-        if ser['Frequency Calculation']:
-            ser['Frequencies'] = extract_last_vibrational_frequencies (ser['RootFile'], ser['Number of Atoms']*3)
+        elif output['Geometries']:
+            # without the .xyz file, the last geometry printed in the output
+            coordinates, elements = common_functions.coordinates_and_elements(output['Geometries'][-1], element_column=0)
+            ser['Number of Atoms'], ser['Elements'], ser['xyz Coordinates'] = len(elements), elements, coordinates
 
+        if trajectory and output['Geometries']:
+            set_orca_trajectory(ser, output)
 
-        
-        #thermodynamic calculations
-        #if xyz_content:
+        if ser['Frequency Calculation']:
+            ser['Frequencies'] = select_last_frequencies (output['Frequencies'], ser['Number of Atoms']*3)
 
         calculations.append(ser)
     return calculations
 
 
-    
+# Indicators which have to be found in an orca output file
+ORCA_INDICATORS = (
+    "* O   R   C   A *",
+    "CARTESIAN COORDINATES (A.U.)",
+    "FINAL SINGLE POINT ENERGY",
+)
+SURFACE_HEADER = "The Calculated Surface using the 'Actual Energy'"
+SURFACE_LINE_RE = re.compile(r'\s*(\d+\.\d+)\s+(-?\d+\.\d+)\s*$')
+GEOMETRY_HEADER = "CARTESIAN COORDINATES (ANGSTROEM)"
+ENERGY_HEADER = "FINAL SINGLE POINT ENERGY"
+# Items of the table 'Geometry convergence', the columns of 'Trajectory Convergence' (Eh, Eh/bohr, bohr)
+CONVERGENCE_ITEMS = ('Energy change', 'RMS gradient', 'MAX gradient', 'RMS step', 'MAX step')
+CONVERGED_MESSAGE = "THE OPTIMIZATION HAS CONVERGED"
+
+def read_orca_output(file_path, trajectory=False):
+    """
+    Reads an ORCA output file once, line by line, and collects everything parse_orca needs.
+    Only the echoed input and the last block of frequencies are kept in memory.
+
+    Returns:
+        dict: with the keys
+            'ORCA Output' (bool): all ORCA_INDICATORS found, see is_orca_output
+            'Input' (list of str): lower case lines of the input, see parse_orca_input
+            'Properties' (dict): numerical values, see orca_scanner
+            'Surface' (dict or None): surface scan data, index -> [coordinate, energy in kJ/mol]
+            'Frequencies' (list of float): frequencies of the last VIBRATIONAL FREQUENCIES block
+            'Geometries' (list of list of str): lines of the CARTESIAN COORDINATES (ANGSTROEM) blocks,
+                all of them with trajectory, otherwise only the last one
+            'Energies' (list of float): FINAL SINGLE POINT ENERGY of every cycle in Eh, only with trajectory
+            'Convergence' (list of list of float): values of the CONVERGENCE_ITEMS of every cycle, only with trajectory
+            'Converged' (bool): the optimization has converged, only with trajectory
+    """
+    missing_indicators = list(ORCA_INDICATORS)
+    input_lines = None
+    input_done = False
+    skip_input_lines = 0
+    properties = {}
+    surface = None
+    surface_state = None # None: header not found yet, 'reading': data lines, 'done'
+    frequencies = []
+    geometries = []
+    geometry = None # lines of the coordinate block which is read
+    energies = []
+    convergence = []
+    convergence_row = None # values of the convergence table which is read
+    converged = False
+    scanner = orca_scanner()
+
+    with file_access.open_text(file_path) as file:
+        for line in file:
 
-def filter_orca_filenames(filenames, root):
+            # coordinate blocks: the header, a line of dashes, one line per atom and an empty line
+            if geometry is not None:
+                if line.strip():
+                    if not line.startswith('---'):
+                        geometry.append(line)
+                    continue
+                if trajectory or not geometries:
+                    geometries.append(geometry)
+                else:
+                    geometries[0] = geometry
+                geometry = None
+            elif line.startswith(GEOMETRY_HEADER):
+                geometry = []
+                continue
+
+            if missing_indicators:
+                missing_indicators = [indicator for indicator in missing_indicators if indicator not in line]
+
+            # echoed input: starts three lines after "INPUT FILE", ends with "****END OF INPUT****"
+            if not input_done:
+                if "INPUT FILE" in line:
+                    input_lines = []
+                    skip_input_lines = 2
+                elif skip_input_lines:
+                    skip_input_lines -= 1
+                elif input_lines is not None:
+                    # cut off "|  ?> " and convert to lower case
+                    input_lines.append(line[5:].lower())
+                if "****END OF INPUT****" in line:
+                    input_done = True
+                continue
+
+            scanner.scan_line(line, properties)
+
+            if trajectory:
+                if convergence_row is not None:
+                    if line.lstrip().startswith('....'):
+                        convergence.append(convergence_row)
+                        convergence_row = None
+                    else:
+                        parts = line.split()
+                        item = ' '.join(parts[:2])
+                        if item in CONVERGENCE_ITEMS and len(parts) > 2:
+                            try:
+                                convergence_row[CONVERGENCE_ITEMS.index(item)] = float(parts[2])
+                            except ValueError:
+                                pass
+                elif line.startswith(ENERGY_HEADER):
+                    match = single_point_energy_pattern.match(line)
+                    if match:
+                        energies.append(float(match.group(1)))
+                elif 'Geometry convergence' in line:
+                    convergence_row = [float('nan')] * len(CONVERGENCE_ITEMS)
+                elif CONVERGED_MESSAGE in line:
+                    converged = True
+
+            # only the first surface is taken
+            if surface_state == 'reading':
+                match_surface = SURFACE_LINE_RE.match(line)
+                if match_surface:
+                    surface[str(len(surface))] = [float(match_surface.group(1)), float(match_surface.group(2))*mc.EH2KJMOL]
+                elif line.strip():
+                    surface_state = 'done'
+            elif surface_state is None and line.rstrip('\n').endswith(SURFACE_HEADER):
+                surface_state = 'reading'
+                surface = {}
+
+            # only the frequencies of the last block are kept
+            if 'cm**-1' in line:
+                parts = line.split()
+                try:
+                    frequencies.append(float(parts[1]))
+                except (ValueError, IndexError):
+                    pass
+            elif "VIBRATIONAL FREQUENCIES" in line:
+                frequencies = []
+
+    if not surface:
+        surface = None
+
+    return {
+        'ORCA Output': not missing_indicators,
+        'Input': input_lines,
+        'Properties': properties,
+        'Surface': surface,
+        'Frequencies': frequencies,
+        'Geometries': geometries,
+        'Energies': energies,
+        'Convergence': convergence,
+        'Converged': converged,
+    }
+
+
+def set_orca_trajectory(ser, output):
+    """
+    Sets the trajectory of a geometry optimization from read_orca_output(..., trajectory=True):
+    the geometries and energies of the cycles and the convergence of every cycle.
+    """
+    n_cycles = min(len(output['Geometries']), len(output['Energies']))
+    if n_cycles == 0:
+        return
+    geometries = output['Geometries'][:n_cycles]
+    n_atoms = len(geometries[-1])
+    # restarts with another molecule: only the cycles with the atoms of the last one
+    cycles = [i for i, geometry in enumerate(geometries) if len(geometry) == n_atoms]
+    coordinates, _ = common_functions.coordinates_and_elements(
+        [line for i in cycles for line in geometries[i]], element_column=0)
+    common_functions.set_trajectory(ser, [output['Energies'][i] for i in cycles], coordinates.reshape(len(cycles), n_atoms, 3))
+
+    if output['Convergence']:
+        ser['Trajectory Convergence'] = np.array(output['Convergence'])
+        ser['RMS Gradient'] = float(ser['Trajectory Convergence'][-1, CONVERGENCE_ITEMS.index('RMS gradient')])
+        ser['Max Gradient'] = float(ser['Trajectory Convergence'][-1, CONVERGENCE_ITEMS.index('MAX gradient')])
+    ser['Optimization Converged'] = output['Converged']
+
+def filter_orca_candidates(filenames):
+    """
+    Returns the filenames which could be orca outputs, judging from the name only.
+    """
+    # List of invalid filenames to be excluded
+    invalid_filenames = ['xtb.out','crest.out','censo.out']
+
+    return [filename for filename in filenames
+            if filename.endswith('out') and filename not in invalid_filenames and not filename.startswith('slurm')]
+
+def prefetch_filenames(filenames):
+    """Returns the filenames which parse_orca may read: the candidates for outputs and the xyz files"""
+    return filter_orca_candidates(filenames) + [filename for filename in filenames if filename.lower().endswith('.xyz')]
+
+def filter_orca_filenames(filenames, root, verdicts=None):
     """
     Filters a list of filenames based on specific criteria and returns valid filenames.
 
     Args:
         filenames (list): A list of filenames to be filtered.
+        verdicts (dict): Optional cache of filename -> is_orca_output result.
+            Files found in there are not opened again, new results are added.
 
     Returns:
         list: A list containing valid filenames that meet the specified criteria.
@@ -77,206 +266,71 @@ def filter_orca_filenames(filenames, root):
         >>> filtered_files = filter_filenames(file_list)
         >>> print(filtered_files)
     """
+    valid_filenames = filter_orca_candidates(filenames)
 
-
-    # List of invalid filenames to be excluded
-    invalid_filenames = ['xtb.out','crest.out','censo.out']
-
-    # Initialize a list to store valid filenames
-    valid_filenames = []
-
-    # Iterate through each filename in the input list
-    for filename in filenames:
-        # Check if the filename meets the specified criteria
-        if filename.endswith('out') and filename not in invalid_filenames and not filename.startswith('slurm'):
-            # If criteria are met, add the filename to the list of valid filenames
-            valid_filenames.append(filename)
-
+    if verdicts is None:
+        verdicts = {}
     orca_filenames = []
     for filename in valid_filenames:
-        if is_orca_output(root+'/'+filename):
+        if filename not in verdicts:
+            verdicts[filename] = is_orca_output(root+'/'+filename)
+        if verdicts[filename]:
             orca_filenames.append(filename)
 
     # Return the list of valid filenames
     return orca_filenames
 
 
-def parse_file(file_path, data={}):
-    """
-    Parses a ORCA output file and extracts relevant numerical values.
-
-    Args:
-        file_path (str): The path to the file to be parsed.
-
-    Returns:
-        dict: A dictionary containing extracted numerical values from the file.
-
-    Example:
-        >>> file_path = 'your_file.txt'
-        >>> result = parse_file(file_path)
-        >>> print(result)
-    """
-
-    # Define regular expression patterns for each type of information
-    temperature_pattern =         re.compile(r'Temperature\s+\.\.\.\s+([\d\.]+)\s+K')
-    pressure_pattern =            re.compile(r'Pressure\s+\.\.\.\s+([\d\.]+)\s+atm')
-    mass_pattern =                re.compile(r'Total Mass\s+\.\.\.\s+([\d\.]+)\s+AMU')
-    gibbs_energy_pattern =        re.compile(r'Final Gibbs free energy\s+\.\.\.\s+([\d\.\-]+)\s+Eh')
-    #enthalpy_pattern =            re.compile(r'Total enthalpy\s+\.\.\.\s+([\d\.\-]+)\s+Eh')
-    inner_energy_pattern =        re.compile(r'Total correction\s+([\d\.\-]+)\s+Eh\s+([\d\.\-]+)\s+kcal/mol')
-    entropy_correction_pattern =  re.compile(r'Total entropy correction\s+\.\.\.\s+([\d\.\-]+)\s+Eh\s+([\d\.\-]+)\s+kcal/mol')
-    dipole_moment_pattern =       re.compile(r'Total Dipole Moment\s+:\s+([\d\.\-]+)\s+([\d\.\-]+)\s+([\d\.\-]+)')
-    num_atoms_pattern =           re.compile(r'Number of atoms\s+\.\.\.\s+(\d+)')
-    single_point_energy_pattern = re.compile(r'FINAL SINGLE POINT ENERGY\s+([\d\.\-]+)')
-    #ge_el_pattern = re.compile(r'G-E\(el\)\s+\.\.\.\s+([\d\.]+)\s+Eh\s+([\d\.]+)\s+kcal/mol')
-    ge_el_pattern =               re.compile(r'G-E\(el\)\s+\.\.\.\s+([\d\.\-]+)\s+Eh\s+([\d\.\-]+)\s+kcal/mol')
-    zero_point_energy_pattern =   re.compile(r'Zero point energy\s+\.\.\.\s+([\d\.\-]+)\s+Eh\s+([\d\.\-]+)\s+kcal/mol')
-
-
-    # Open the file and process each line
-    with open(file_path, 'r') as file:
-        for line in file:
-
-            # Match each line against the defined patterns and extract values
-            match_temperature = temperature_pattern.match(line)
-            if match_temperature:
-                data['Temperature'] = float(match_temperature.group(1))
-
-            match_pressure = pressure_pattern.match(line)
-            if match_pressure:
-                data['Pressure'] = float(match_pressure.group(1))
+# Regular expression patterns for each type of information
+temperature_pattern =         re.compile(r'Temperature\s+\.\.\.\s+([\d\.]+)\s+K')
+pressure_pattern =            re.compile(r'Pressure\s+\.\.\.\s+([\d\.]+)\s+atm')
+mass_pattern =                re.compile(r'Total Mass\s+\.\.\.\s+([\d\.]+)\s+AMU')
+gibbs_energy_pattern =        re.compile(r'Final Gibbs free energy\s+\.\.\.\s+([\d\.\-]+)\s+Eh')
+#enthalpy_pattern =            re.compile(r'Total enthalpy\s+\.\.\.\s+([\d\.\-]+)\s+Eh')
+inner_energy_pattern =        re.compile(r'Total correction\s+([\d\.\-]+)\s+Eh\s+([\d\.\-]+)\s+kcal/mol')
+entropy_correction_pattern =  re.compile(r'Total entropy correction\s+\.\.\.\s+([\d\.\-]+)\s+Eh\s+([\d\.\-]+)\s+kcal/mol')
+dipole_moment_pattern =       re.compile(r'Total Dipole Moment\s+:\s+([\d\.\-]+)\s+([\d\.\-]+)\s+([\d\.\-]+)')
+num_atoms_pattern =           re.compile(r'Number of atoms\s+\.\.\.\s+(\d+)')
+single_point_energy_pattern = re.compile(r'FINAL SINGLE POINT ENERGY\s+([\d\.\-]+)')
+#ge_el_pattern = re.compile(r'G-E\(el\)\s+\.\.\.\s+([\d\.]+)\s+Eh\s+([\d\.]+)\s+kcal/mol')
+ge_el_pattern =               re.compile(r'G-E\(el\)\s+\.\.\.\s+([\d\.\-]+)\s+Eh\s+([\d\.\-]+)\s+kcal/mol')
+zero_point_energy_pattern =   re.compile(r'Zero point energy\s+\.\.\.\s+([\d\.\-]+)\s+Eh\s+([\d\.\-]+)\s+kcal/mol')
+
+# careful! Orca either includes the electronic energy or not, depending on availability. (see therm.out files for example)
+# therefore the enthalpy_pattern is not in the table
+@functools.lru_cache(maxsize=None)
+def orca_scanner():
+    """The LineScanner of the ORCA properties, built at the first use, when the factors of config.yml are read"""
+    return LineScanner((
+        LinePattern('Temperature',             'Temperature',               temperature_pattern,         to_float()),
+        LinePattern('Pressure',                'Pressure',                  pressure_pattern,            to_float()),
+        LinePattern('Total Mass',              'Total Mass',                mass_pattern,                to_float()),
+        LinePattern('Single Point Energy',     'FINAL SINGLE POINT ENERGY', single_point_energy_pattern, to_float(factor=mc.EH2KJMOL)),
+        LinePattern('Final Gibbs Free Energy', 'Final Gibbs free energy',   gibbs_energy_pattern,        to_float(factor=mc.EH2KJMOL)),
+        LinePattern('G-E(el) Energy',          'G-E(el)',                   ge_el_pattern,               to_float(factor=mc.EH2KJMOL)),
+        LinePattern('Inner Energy',            'Total correction',          inner_energy_pattern,        to_float(factor=mc.EH2KJMOL)),
+        LinePattern('Entropy Correction',      'Total entropy correction',  entropy_correction_pattern,  to_float(factor=mc.EH2KJMOL)),
+        LinePattern('Total Dipole Moment',     'Total Dipole Moment',       dipole_moment_pattern,       to_floats((1, 2, 3))),
+        LinePattern('Number of Atoms',         'Number of atoms',           num_atoms_pattern,           to_int()),
+        LinePattern('zpe',                     'Zero point energy',         zero_point_energy_pattern,   to_float(), anchored=False),
+    ))
 
-            match_mass = mass_pattern.match(line)
-            if match_mass:
-                data['Total Mass'] = float(match_mass.group(1))
-
-            match_single_point_energy = single_point_energy_pattern.match(line)
-            if match_single_point_energy:
-                data['Single Point Energy'] = float(match_single_point_energy.group(1)) * mc.EH2KJMOL
-
-
-            match_gibbs_energy = gibbs_energy_pattern.match(line)
-            if match_gibbs_energy:
-                data['Final Gibbs Free Energy'] = float(match_gibbs_energy.group(1)) * mc.EH2KJMOL
-
-            match_ge_el = ge_el_pattern.match(line)
-            if match_ge_el:
-                data['G-E(el) Energy'] = float(match_ge_el.group(1)) * mc.EH2KJMOL
-                #data['G-E(el) kcal/mol'] = float(match_ge_el.group(2))
-
-#           careful! Orca either includes the electronic energy or not, depending on availability. (see therm.out files for example)
-#            match_enthalpy = enthalpy_pattern.match(line)
-#            if match_enthalpy:
-#                data['Total Enthalpy'] = float(match_enthalpy.group(1)) * mc.EH2KJMOL
-
-            match_inner_energy = inner_energy_pattern.match(line)
-            if match_inner_energy:
-                inner_energy = float(match_inner_energy.group(1))
-                kcal_per_mol = float(match_inner_energy.group(2))
-                data['Inner Energy'] = float(inner_energy) * mc.EH2KJMOL
-                #print(inner_energy)
-
-            match_entropy_correction = entropy_correction_pattern.match(line)
-            if match_entropy_correction:
-                entropy_energy = float(match_entropy_correction.group(1))
-                kcal_per_mol = float(match_entropy_correction.group(2))
-                data['Entropy Correction'] = float(entropy_energy) * mc.EH2KJMOL
-
-            match_dipole_moment = dipole_moment_pattern.match(line)
-            if match_dipole_moment:
-                dipole_values = [float(match_dipole_moment.group(i)) for i in range(1, 4)]
-                data['Total Dipole Moment'] = dipole_values
-
-            match_num_atoms = num_atoms_pattern.match(line)
-            if match_num_atoms:
-                data['Number of Atoms'] = int(match_num_atoms.group(1))
-
-            match_zpe = zero_point_energy_pattern.search(line)
-            if match_zpe:
-                data['zpe'] = float(match_zpe.group(1))
-
-    # Return the extracted data
-    return data
-
-def parse_scan_file(file_path, surface_data_with_indices=None):
+def is_orca_output(file_path):
     """
-    Parses a ORCA output file and extracts surface scan data.
-
-    Args:
-        file_path (str): The path to the file to be parsed.
-
-    Returns:
-        dict: A dictionary containing extracted numerical values from the file.
-
-    Example:
-        >>> file_path = 'your_file.txt'
-        >>> result = parse_file(file_path)
-        >>> print(result)
+    Checks for the ORCA_INDICATORS without reading the whole file.
+    The banner has to be found at the beginning of the file, the coordinates are searched from the beginning
+    and the final energy is searched backward from the end of the file.
+    Files without the banner are rejected after reading file_access.HEAD_BYTES.
     """
-
-   
-    # Define regular expression pattern for extracting scan energy data
-    surface_data_pattern = re.compile(r'(?<=The Calculated Surface using the \'Actual Energy\'\n)(\s*\d+\.\d+\s+-?\d+\.\d+\s*\n)+')
+    banner, coordinates, energy = ORCA_INDICATORS
+    return file_access.find_markers(
+        file_path,
+        head_markers=[banner],
+        forward_markers=[coordinates],
+        backward_markers=[energy],
+    )
 
 
-    with open(file_path, 'r') as file:
-
-        # Find matches in the text using the pattern
-        match_surface_data = surface_data_pattern.search(file.read())
-    
-        if match_surface_data:
-            # Extract the matched text and split it into lines
-            surface_data_lines = match_surface_data.group(0).strip().split('\n')
-
-            ## Extract values from each line and store them in a list of tuples
-            #surface_data = [(float(line.split()[0]), float(line.split()[1])) for line in surface_data_lines]
-
-            surface_data_with_indices = {}
-
-            for i, line in enumerate(surface_data_lines):
-                data = [float(coord) for coord in line.split()]
-                #print(type(data))
-                surface_data_with_indices[str(i)] = [data[0], data[1]*mc.EH2KJMOL]
-
-    # Return the extracted data
-    return surface_data_with_indices
-
-def is_orca_output(file_path):
-    with open(file_path, 'r') as file:
-        content = file.read()
-    
-    # Check for specific indicators in the content
-    indicators = [
-        "* O   R   C   A *",
-        "CARTESIAN COORDINATES (A.U.)",
-        "FINAL SINGLE POINT ENERGY"
-    ]
-    
-    return all(indicator in content for indicator in indicators)
-
-
-
-def extract_orca_input(file_path):
-    with open(file_path, 'r') as file:
-        lines = file.readlines()
-    
-    input_start = None
-    input_end = None
-    
-    # Find the start and end of the input section
-    for i, line in enumerate(lines):
-        if "INPUT FILE" in line:
-            input_start = i + 3
-        if "****END OF INPUT****" in line:
-            input_end = i + 1
-            break
-    #print(lines[input_start - 1])
-    name_of_input = lines[input_start - 1].split('=')[1]
-
-    # print( [line.lower() for line in lines[input_start:input_end]])
-
-    # cut off "|  ?> " and convert to lower case
-    return name_of_input, [line[5:].lower() for line in lines[input_start:input_end]]
 
 def parse_orca_input(ser, input_file, files):
     """Look for keyword in input and return bool whether found or not"""
@@ -391,38 +445,10 @@ def parse_orca_input_coordinates(lines):
 
     return elements, coordinates, num_elements
 
-def further_input_parsing(file_content):
-    #extracts string with elements, coordinates, and number of atoms
-    #lines = file_content.split('\n')
-    start_line = None
-    end_line = None
-    #print(file_content)
-
-    for i, line in enumerate(file_content):
-        if '*' in line:
-            #print(line)
-            if start_line is None:
-                start_line = i
-            else:
-                end_line = i
-                break
-
-    return end_line - start_line - 1
-
-def extract_last_vibrational_frequencies(file_path, degrees_of_freedom):
-    with open(file_path, 'r') as file:
-        orca_output = file.readlines()
-
-    frequency_lines = [line for line in orca_output if 'cm**-1' in line]
-
-    frequencies = []
-    for line in frequency_lines:
-        parts = line.split()
-        try:
-            freq = float(parts[1])
-            frequencies.append(freq)
-        except ValueError:
-            continue
+def select_last_frequencies(frequencies, degrees_of_freedom):
+    """
+    Takes the frequencies found in an ORCA output and returns the sorted frequencies of the last calculation.
+    """
     # This happens for TS-Optimizations
     if len(frequencies) % degrees_of_freedom != 0:
         raise ValueError
@@ -436,7 +462,3 @@ def extract_last_vibrational_frequencies(file_path, degrees_of_freedom):
     #print('Frequencies:', frequencies)
     frequencies.sort()
     return frequencies
-
-
-    #print ([float(freq) for freq in last_frequencies])
-    return [float(freq) for freq in last_frequencies]
@@ -1,14 +1,29 @@
 import os
 import re
+import sys
 
 import common_functions
+import file_access
 import my_constants as mc
 import numpy as np
 
 
-def parse_turbomole(root, dirs, files):
+# Files which parse_turbomole may read
+TURBOMOLE_FILES = ('control', 'energy', 'coord', 'xtbopt.xyz', 'xtbopt.coord', 'vibspectrum', 'eiger.out', 'out.tab', 'cosmotherm.tab')
+# Files which are read in addition with --trajectory
+TRAJECTORY_FILES = ('gradient',)
+
+
+def prefetch_filenames(filenames, trajectory=False):
+    """Returns the filenames which parse_turbomole may read"""
+    selected = TURBOMOLE_FILES + TRAJECTORY_FILES if trajectory else TURBOMOLE_FILES
+    return [filename for filename in filenames if filename in selected]
+
+
+def parse_turbomole(root, dirs, files, trajectory=False):
     """
     Parses Turbomole calculation files.
+    trajectory : parse all cycles of the geometry optimization from energy and gradient (--trajectory)
     """
     ser = {}
 
@@ -44,6 +59,9 @@ def parse_turbomole(root, dirs, files):
             ser['Elements'] = elem
             ser['xyz File Name'] = f'./xyz/{(root[2:] + f"/{filename}").replace("/", "_")}.xyz'
 
+    if trajectory:
+        get_trajectory(ser, root, files)
+
     filename = 'xtbopt.xyz'
     if filename in files:
         ser['Number of Atoms'], _, ser['Elements'], ser['xyz Coordinates'] = \
@@ -85,7 +103,7 @@ def get_control2(ser, root, filename):
     """
     Scans the text and produces tokens from the control file.
     """
-    with open(os.path.join(root, filename)) as file:
+    with file_access.open_text(os.path.join(root, filename)) as file:
         string = file.read()
         tokens = string.split('$')
         for token in tokens:
@@ -166,19 +184,22 @@ def get_vibspectrum(root):
     """
     Extracts information (frequencies) from 'vibspectrum'.
     """
-    with open(os.path.join(root, 'vibspectrum')) as file:
+    with file_access.open_text(os.path.join(root, 'vibspectrum')) as file:
         return [float(match) for match in re.findall(RE_VIBSPECTRUM, file.read())]
 
 
+# cosmotherm tables: the value is in the columns after 80 of the line containing 'out',
+# lines without a number there raise ValueError
 def get_cosmors(ser, root, dat='out.tab'):
-    with open(os.path.join(root, dat)) as file:
+    with file_access.open_text(os.path.join(root, dat)) as file:
         for line in file:
             if 'out' in line:
                 ser['CosmoRS'] = float(line[80:])*mc.CAL2J
 
 
+# eiger: the orbital energy is in the columns 28 to 39, the number of the orbital is the second word
 def get_eiger(ser, root, dat='eiger.out'):
-    with open(os.path.join(root, dat)) as file:
+    with file_access.open_text(os.path.join(root, dat)) as file:
         for line in file:
             if 'HOMO:' in line:
                 ser['HOMO'] = float(line[28:39])
@@ -195,5 +216,91 @@ def get_energy2(root, dat='energy'):
     """
     Returns vector with element[0]: total energy [1]:kinetic energy, [2]:potential energy.
     """
-    with open(os.path.join(root, dat)) as file:
-        return np.array(re.findall(RE_ENERGY, file.readlines()[-2])[0]).astype(float)
+    # the energy of the last cycle is in the second to last line, in front of $end
+    line = file_access.tail_lines(os.path.join(root, dat), 2)[-2]
+    return np.array(re.findall(RE_ENERGY, line)[0]).astype(float)
+
+
+def get_energies(root, dat='energy'):
+    """
+    Returns the energies of all cycles in 'energy' as array (cycles x columns) in Eh,
+    the columns are the total, kinetic and potential energy (and e.g. MP2).
+    """
+    with file_access.open_text(os.path.join(root, dat)) as file:
+        lines = common_functions.data_group_lines(file.read(), '$energy')
+    if not lines:
+        return np.zeros((0, 3))
+    tokens = '\n'.join(lines).split()
+    width = len(lines[0].split())
+    if len(tokens) != width * len(lines):
+        # lines with different numbers of columns, the common ones are kept
+        width = min(len(line.split()) for line in lines)
+        tokens = [value for line in lines for value in line.split()[:width]]
+    return np.array(tokens, dtype=float).reshape(len(lines), width)[:, 1:]
+
+
+RE_GRADIENT_ENERGY = re.compile(r"energy\s*=\s*(\S+)")
+
+
+def get_gradients(root, dat='gradient'):
+    """
+    Returns the energies (Eh), coordinates (cycles x N x 3, bohr) and Cartesian gradients (cycles x N x 3, Eh/bohr)
+    of all cycles in 'gradient' and the element symbols.
+    Every cycle consists of a header line, N coordinate lines and N gradient lines,
+    the numbers of all cycles are converted at once.
+    """
+    with file_access.open_text(os.path.join(root, dat)) as file:
+        text = file.read()
+    start = text.find('$grad')
+    end = text.find('$end', start)
+    sections = text[start:end if end != -1 else len(text)].split('cycle =')[1:]
+
+    cycles = []
+    for section in sections:
+        header, _, body = section.partition('\n')
+        lines = body.rstrip().split('\n')
+        match = RE_GRADIENT_ENERGY.search(header)
+        if match is None or len(lines) < 2 or len(lines) % 2:
+            continue
+        cycles.append((float(match[1].replace('D', 'E')), lines))
+    # restarts with another molecule: only the cycles with the atoms of the last one
+    if cycles:
+        n_lines = len(cycles[-1][1])
+        cycles = [cycle for cycle in cycles if len(cycle[1]) == n_lines]
+    if not cycles:
+        return np.zeros(0), np.zeros((0, 0, 3)), np.zeros((0, 0, 3)), []
+
+    n_atoms = len(cycles[0][1]) // 2
+    energies = np.array([energy for energy, _ in cycles])
+    coordinates, elements = common_functions.coordinates_and_elements(
+        [line for _, lines in cycles for line in lines[:n_atoms]])
+    gradients = np.array(' '.join([' '.join(lines[n_atoms:]) for _, lines in cycles]).replace('D', 'E').split(), dtype=float)
+    return (energies, coordinates.reshape(len(cycles), n_atoms, 3), gradients.reshape(len(cycles), n_atoms, 3),
+            elements[:n_atoms])
+
+
+def get_trajectory(ser, root, files):
+    """
+    Sets the trajectory of a jobex optimization: the energies of all cycles from 'energy',
+    the geometries and the gradients from 'gradient' (names from $energy and $grad of control).
+    Both files end with the last cycle, if their numbers of cycles differ (restarts, interrupted jobs),
+    only the last cycles which are in both are kept.
+    """
+    filenames = ser.get('filenames', {})
+    energy_file = filenames.get('energy', 'energy')
+    gradient_file = filenames.get('grad', 'gradient')
+    energies = get_energies(root, energy_file)[:, 0] if energy_file in files else None
+    if gradient_file in files:
+        gradient_energies, coordinates, gradients, _ = get_gradients(root, gradient_file)
+        if len(gradient_energies):
+            if energies is None or not len(energies):
+                energies = gradient_energies
+            elif len(energies) != len(gradient_energies):
+                n_cycles = min(len(energies), len(gradient_energies))
+                print(f"Warning in {root}: {len(energies)} cycles in {energy_file} and {len(gradient_energies)} in {gradient_file}, "
+                      f"the trajectory has the last {n_cycles}", file=sys.stderr)
+                energies, coordinates, gradients = energies[-n_cycles:], coordinates[-n_cycles:], gradients[-n_cycles:]
+            common_functions.set_trajectory(ser, energies, coordinates * mc.BOHR2ANGSTROM, gradients)
+            return
+    if energies is not None and len(energies):
+        common_functions.set_trajectory(ser, energies)
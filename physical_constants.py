@@ -0,0 +1,10 @@
+from math import pi
+
+# Exact SI values (CODATA 2018), identical to scipy.constants,
+# which needs about 80 ms to import because it parses the whole CODATA table.
+h = 6.62607015e-34 # Planck constant, J*s
+k = 1.380649e-23 # Boltzmann constant, J/K
+c = 299792458.0 # speed of light, m/s
+N_A = 6.02214076e+23 # Avogadro constant, 1/mol
+R = N_A * k # molar gas constant, J/(mol*K)
+milli = 1e-3
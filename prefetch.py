@@ -0,0 +1,120 @@
+import os
+import threading
+from collections import deque
+
+import file_access
+import profiling
+
+# Read-ahead for network file systems (NFS, Lustre), where every open and read costs milliseconds of latency.
+# While the current directories are parsed, a thread pool reads the files of the next directories of the walk
+# into memory. The contents travel with the DirectoryTask to the parsing process and are registered
+# in file_access, such that the parsers do not touch the file system again.
+# The bytes in flight are limited by a budget, files which do not fit are left to the parsers.
+
+MEGABYTE = 1 << 20
+
+
+class ByteBudget:
+    """Thread safe counter of the prefetched bytes which were not parsed yet"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def try_acquire(self, size):
+        """Reserves size bytes, returns False without waiting if they do not fit into the budget"""
+        with self.lock:
+            if self.used + size > self.limit:
+                return False
+            self.used += size
+            return True
+
+    def acquire(self, size):
+        """Reserves size bytes even beyond the limit, for contents which are in memory already (members of archives)"""
+        with self.lock:
+            self.used += size
+
+    def release(self, size):
+        with self.lock:
+            self.used -= size
+
+
+def selected_filenames(files, args):
+    """Returns the filenames which the enabled parsers may read"""
+    selected = []
+    if args.orca:
+        from parse_orca_calculation import prefetch_filenames
+        selected += prefetch_filenames(files)
+    if args.turbomole:
+        from parse_turbomole_calculation import prefetch_filenames
+        selected += prefetch_filenames(files, args.trajectory)
+    if args.censo:
+        from parse_censo_calculation import prefetch_filenames
+        selected += prefetch_filenames(files)
+    return list(dict.fromkeys(selected))
+
+
+def read_files(root, filenames, budget):
+    """
+    Reads the files of a directory within the budget, returns a dict of path -> bytes.
+    Files which can not be read or do not fit into the budget are skipped.
+    """
+    contents = {}
+    for filename in filenames:
+        path = os.path.join(root, filename)
+        try:
+            size = os.stat(path).st_size
+            if not budget.try_acquire(size):
+                continue
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            continue
+        # the file may have changed in between
+        budget.release(size - len(data))
+        contents[path] = data
+        profiling.profiler.count('prefetched files')
+        profiling.profiler.count('prefetched bytes', len(data))
+    return contents
+
+
+def contents_size(contents):
+    return sum(len(data) for data in contents.values())
+
+
+def prefetch_tasks(tasks, args, budget):
+    """
+    Yields the DirectoryTask tuples of tasks with the contents of their files,
+    which are read by args.prefetch_threads threads up to args.prefetch_dirs directories ahead.
+    Other items (cached DirectoryResult tuples) are passed through in order.
+    The budget has to be released with contents_size, after the directory was parsed.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=args.prefetch_threads) as executor:
+        pending = deque()
+        for task in tasks:
+            future = None
+            if getattr(task, 'contents', None):
+                # the members of archives are read by the walk
+                budget.acquire(contents_size(task.contents))
+            elif hasattr(task, 'contents'):
+                # compressed files are selected by their plain names and read compressed
+                compressed = file_access.compressed_files(task.files)
+                filenames = selected_filenames(file_access.plain_filenames(task.files, compressed), args)
+                filenames = [compressed.get(filename, filename) for filename in filenames]
+                future = executor.submit(read_files, task.root, filenames, budget)
+            pending.append((task, future))
+            if len(pending) > args.prefetch_dirs:
+                yield finished_task(*pending.popleft())
+        while pending:
+            yield finished_task(*pending.popleft())
+
+
+def finished_task(task, future):
+    """Waits for the files of the task"""
+    if future is None:
+        return task
+    with profiling.profiler.stage('prefetch wait'):
+        return task._replace(contents=future.result())
@@ -0,0 +1,178 @@
+import heapq
+import json
+import os
+import threading
+import time
+
+# Timers and counters of the crawl (--profile on).
+# The instrumented code calls profiling.profiler, which is a NullProfiler without any bookkeeping,
+# until enable() replaces it by a Profiler. Stages with a '/' in the name are part of the stage in front of it,
+# e.g. 'orca/is_orca_output' is included in 'orca'.
+# With --jobs > 1 every worker process has its own Profiler, whose data is merged into the main one per batch.
+
+REPORT_FILE = 'profile.json'
+TOP_DIRECTORIES = 20
+
+
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class NullProfiler:
+    """Profiler which does nothing, used while profiling is disabled"""
+    enabled = False
+
+    def stage(self, name):
+        return NULL_TIMER
+
+    def count(self, name, value=1):
+        pass
+
+    def directory(self, root, seconds):
+        pass
+
+    def timed(self, name, iterable):
+        return iterable
+
+    def collect(self):
+        return None
+
+    def merge(self, data):
+        pass
+
+
+class Timer:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    """
+    Accumulates the time and the number of calls per stage, counters (files opened, bytes read, records)
+    and the top_directories slowest directories.
+    """
+    enabled = True
+
+    def __init__(self, top_directories=TOP_DIRECTORIES):
+        self.top_directories = top_directories
+        self.start = time.perf_counter()
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.times = {}
+        self.calls = {}
+        self.counters = {}
+        self.directories = [] # heap of (seconds, root)
+
+    def stage(self, name):
+        return Timer(self, name)
+
+    def add_time(self, name, seconds, calls=1):
+        with self.lock:
+            self.times[name] = self.times.get(name, 0.0) + seconds
+            self.calls[name] = self.calls.get(name, 0) + calls
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def directory(self, root, seconds):
+        item = (seconds, root)
+        if len(self.directories) < self.top_directories:
+            heapq.heappush(self.directories, item)
+        elif item > self.directories[0]:
+            heapq.heapreplace(self.directories, item)
+
+    def timed(self, name, iterable):
+        """Yields the items of iterable and adds the time spent in the iterable (e.g. the walk) to the stage name"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(name, time.perf_counter() - start, 0)
+                return
+            self.add_time(name, time.perf_counter() - start)
+            yield item
+
+    def collect(self):
+        """Returns the data for merge() in another process and starts again"""
+        data = {'times': self.times, 'calls': self.calls, 'counters': self.counters, 'directories': self.directories}
+        self.reset()
+        return data
+
+    def merge(self, data):
+        if data is None:
+            return
+        for name, seconds in data['times'].items():
+            self.add_time(name, seconds, data['calls'].get(name, 0))
+        for name, value in data['counters'].items():
+            self.count(name, value)
+        for seconds, root in data['directories']:
+            self.directory(root, seconds)
+
+    def report(self):
+        """Returns the report as dictionary, stages sorted by time"""
+        wall_time = time.perf_counter() - self.start
+        stages = {name: {'seconds': round(seconds, 6), 'calls': self.calls[name],
+                         'share of wall time': round(seconds / wall_time, 4) if wall_time else None}
+                  for name, seconds in sorted(self.times.items(), key=lambda item: -item[1])}
+        directories = [{'root': root, 'seconds': round(seconds, 6)} for seconds, root in sorted(self.directories, reverse=True)]
+        return {
+            'wall time': round(wall_time, 6),
+            'pid': os.getpid(),
+            'stages': stages,
+            'counters': dict(sorted(self.counters.items())),
+            'slowest directories': directories,
+        }
+
+    def write(self, path=REPORT_FILE):
+        report = self.report()
+        with open(path, 'w') as file:
+            json.dump(report, file, indent=1)
+        return report
+
+
+profiler = NullProfiler()
+
+
+def enable(top_directories=TOP_DIRECTORIES):
+    """Starts profiling in this process, returns the Profiler"""
+    global profiler
+    if not profiler.enabled:
+        profiler = Profiler(top_directories)
+    return profiler
+
+
+def disable():
+    global profiler
+    profiler = NullProfiler()
+
+
+def print_summary(report, count=8):
+    print(f"Profile: wall time {report['wall time']:.3f} s")
+    for name, stage in list(report['stages'].items())[:count]:
+        print(f"  {name:32s} {stage['seconds']:10.3f} s {stage['calls']:10d} calls")
+    for name, value in report['counters'].items():
+        print(f"  {name:32s} {value:12d}")
+    if report['slowest directories']:
+        slowest = report['slowest directories'][0]
+        print(f"  slowest directory {slowest['root']} ({slowest['seconds']:.3f} s)")
@@ -1,172 +1,636 @@
 #!/usr/bin/env python3
 import os
-import pandas as pd
+import sys
+from collections import deque, namedtuple
+from contextlib import nullcontext
 
-import common_functions
+import manifest_cache
 import my_constants as mc
+import profiling
 from parse_args import get_arguments
-from parse_orca_calculation import parse_orca
-from parse_turbomole_calculation import parse_turbomole
-from parse_censo_calculation import parse_censo
 
-def ignore_dirs_by_name(top, ignore_names):
+# The parsers (numpy), pandas, pyarrow and the process pool are imported in the functions which use them,
+# such that 'qcdc.py --help' and small runs start fast.
+
+def read_ignore_folders(path):
+    """
+    Reads the file with the directories which are ignored during the walk (see scanner.py for the rules)
+    and adds the directories of qcdc itself.
+    """
+    ignore_folders = []
+    try:
+        with open(path, 'r') as file:
+            ignore_folders = [line.strip() for line in file]
+    except FileNotFoundError:
+        print(f"The file at {path} does not exist.")
+    ignore_folders.extend(['./' + mc.XYZDIR, '__pycache__', '.venv', '.git'])
+    ignore_folders.append(manifest_cache.CACHE_DIR)
+    return [pattern for pattern in ignore_folders if pattern and not pattern.startswith('#')]
+
+def ignore_rules(args, ignore_folders=None):
+    """Returns the scanner.IgnoreRules of the arguments"""
+    import scanner
+
+    if ignore_folders is None:
+        ignore_folders = read_ignore_folders(args.ignore_folders)
+    if args.prune_scratch:
+        ignore_folders = ignore_folders + list(getattr(mc, 'SCRATCH_DIRS', None) or [])
+    return scanner.IgnoreRules(ignore_folders)
+
+def directory_walk(top, args, ignore_folders=None):
+    """Returns the walk through the directories below top with the ignore rules of the arguments"""
+    import scanner
+
+    return scanner.scan(top, ignore_rules(args, ignore_folders), args.max_depth, args.follow_symlinks)
+
+def collect_directory(root, dirs, files, args, orca_verdicts=None):
     """
-    Walks through the directory tree from the top, ignoring directories with specified names.
-    
-    :param top: The top-level directory to start walking from.
-    :param ignore_names: A set of directory names to ignore.
+    Calls the parsers (orca, turbomole and censo) for one directory and
+    post-processes the resulting calculations (symmetry, thermochemistry, xyz files).
+    orca_verdicts : optional dict of filename -> is_orca_output result, see parse_orca
     """
-    for root, dirs, files in os.walk(top):
-        dirs[:] = [d for d in dirs if d not in ignore_names]
-        yield root, dirs, files
+    import common_functions
+    import elements
+    import symmetry
+    from parse_orca_calculation import parse_orca
+    from parse_turbomole_calculation import parse_turbomole
+    from parse_censo_calculation import parse_censo
+
+    # Parse ORCA calculations
+    combined = []
+    print('Root: ', root)
+    if args.orca:
+        with profiling.profiler.stage('orca'):
+            orca_calculations = parse_orca(root, dirs, files, orca_verdicts, args.trajectory)
+        if orca_calculations:
+            combined.extend(orca_calculations)
+            profiling.profiler.count('records orca', len(orca_calculations))
 
-def ignore_dirs_containing(walk, substring):
+    # Parse TURBOMOLE calculations
+    if args.turbomole:
+        with profiling.profiler.stage('turbomole'):
+            ser = parse_turbomole(root, dirs, files, args.trajectory)
+        if ser:
+            combined.append(ser)
+            profiling.profiler.count('records turbomole')
+
+    # Parse CENSO calculations
+    if args.censo:
+        with profiling.profiler.stage('censo'):
+            ser = parse_censo(root, dirs, files)
+        if ser:
+            combined.append(ser)
+            profiling.profiler.count('records censo')
+
+    # Post-processing for all calculations of a folder
+    for calculation in combined:
+
+        # Elements as uint8 atomic numbers and capitalized symbols, normalized once for all later steps
+        if calculation.get('Elements') is not None:
+            try:
+                calculation['Atomic Numbers'] = elements.atomic_numbers(calculation['Elements'])
+                calculation['Elements'] = elements.symbols(calculation['Atomic Numbers'])
+            except ValueError as e:
+                print(f"{e} in {calculation.get('RootFile')}")
+
+        # Symmetry assignment, only if there exist elements and coordinates
+        if calculation.get('Elements') is not None and calculation.get('xyz Coordinates') is not None and mc.COMPUTE_SYMMETRY:
+            # unknown elements (dummy atoms, e.g. X or DA) or elements without mass: the other properties are kept
+            try:
+                with profiling.profiler.stage('symmetry'):
+                    calculation['Point Group'], calculation['Symmetry Number'] = symmetry.point_group_and_symmetry_number(
+                        calculation.get('Atomic Numbers', calculation['Elements']), calculation['xyz Coordinates'])
+            except ValueError as e:
+                print(f"{e} in symmetry for {calculation.get('RootFile')}")
+                calculation['Point Group'], calculation['Symmetry Number'] = None, 1
+            if calculation['Symmetry Number'] is None:
+                raise KeyError(f"No symmetry number assigned for Point Group {calculation['Point Group']}, please add it to symmetry_number_lookup")
+        else:
+            calculation['Point Group'] = None
+            calculation['Symmetry Number'] = 1
+
+        if calculation.get('Single Point Energy'):
+            # the archive is written in the main process, see iter_results
+            if args.xyz == 'files':
+                with profiling.profiler.stage('xyz'):
+                    write_geometry(calculation, args)
+            # Extract the number in the /CONF string which is used in censo calculations.
+            calculation['Censo Conformer Number'] = common_functions.extract_conf_number(calculation.get('Root'))
+
+    return combined
+
+def write_geometry(calculation, args, archive=None):
     """
-    Walks through the directory tree from the top, ignoring directories containing a specific substring.
-    
-    :param top: The top-level directory to start walking from.
-    :param substring: The substring to look for in directory names to ignore.
+    Writes the geometry of a calculation with the energy in the comment line
+    to its xyz file or, if given, to the xyz_archive.XYZArchive.
     """
+    import common_functions
+
+    try:
+        info_string = common_functions.format_properties(
+            charge=calculation.get('Charge'),
+            s2=calculation.get('S2'),
+            dipole=calculation.get('Dipole Moment'),
+            vibration=calculation.get('Frequencies'),
+            zpe=calculation.get('Zero Point Energy')
+        )
+        energy = calculation['Single Point Energy']/mc.EH2KJMOL
+        if archive is not None:
+            archive.write(calculation['xyz File Name'], calculation['Elements'], calculation['xyz Coordinates'], energy)
+            return
+        common_functions.write_xyz(
+            calculation['Elements'],
+            calculation['xyz Coordinates'],
+            calculation['xyz File Name'],
+            comment=energy,
+            bottom_info='',
+            skip_unchanged=args.skip_unchanged
+        )
+        # t2energy: prints also vibrations, but not easily readable by other scripts
+        #common_functions.write_xyz(
+        #    calculation['Elements'],
+        #    calculation['xyz Coordinates'],
+        #    calculation['xyz File Name'],
+        #    comment="Generated by script",
+        #    bottom_info=info_string
+        #)
+    except KeyError as e:
+        print(f"{e} in write_xyz. Some data not found")
+
+# One directory of the walk, signature and orca_verdicts are only set if the manifest cache is used,
+# contents (path -> bytes) only if the files were read ahead (--prefetch_threads) or come from an archive (--archives)
+DirectoryTask = namedtuple('DirectoryTask', ['root', 'dirs', 'files', 'signature', 'orca_verdicts', 'contents'])
+# Result of one directory, error is None or a message if the directory could not be parsed,
+# cached is True for the results which are taken from the manifest cache
+DirectoryResult = namedtuple('DirectoryResult', ['root', 'calculations', 'error', 'signature', 'orca_verdicts', 'cached'],
+                             defaults=(False,))
+
+def collect_batch(batch, args, worker=False):
+    """
+    Collects the calculations of a batch of directories and derives their thermochemistry.
+    Errors are caught per directory, such that one corrupted folder does not stop the crawl.
+
+    :param batch: list of DirectoryTask tuples from the walk.
+    :param worker: True in the processes of the pool, their profile is returned for the main process.
+    :return: list of DirectoryResult tuples in the order of the batch, profile data or None.
+    """
+    import time
+    import common_functions
+    import file_access
+
+    if worker and args.profile:
+        profiling.enable(args.profile_top)
+
+    results = []
+    for task in batch:
+        orca_verdicts = dict(task.orca_verdicts)
+        start = time.perf_counter()
+        try:
+            # compressed files are parsed under their plain names, see file_access
+            compressed = file_access.compressed_files(task.files)
+            with file_access.registered(task.contents), file_access.registered_compressed(task.root, compressed):
+                calculations = collect_directory(
+                    task.root, task.dirs, file_access.plain_filenames(task.files, compressed), args, orca_verdicts)
+            results.append(DirectoryResult(task.root, calculations, None, task.signature, orca_verdicts))
+        except Exception as e:
+            results.append(DirectoryResult(task.root, [], f"{type(e).__name__}: {e}", task.signature, orca_verdicts))
+        profiling.profiler.directory(task.root, time.perf_counter() - start)
+
+    # Thermochemistry of all frequency calculations of the batch at once.
+    # If frequencies are present, coordinates should also be present
+    with profiling.profiler.stage('thermochemistry'):
+        common_functions.derive_data_batch([calculation for result in results for calculation in result.calculations])
+    return results, profiling.profiler.collect() if worker else None
+
+def walk_tasks(walk, manifest=None, args=None):
+    """
+    Yields a DirectoryTask tuple for every directory of the walk,
+    or a DirectoryResult tuple for directories found in the manifest cache.
+    With args.archives the directories in the tar and zip archives of a directory follow it, see archives.py.
+    """
+    keep = None
+    if args is not None and args.archives:
+        import archives
+        keep = archives.keep_filter(args)
+
     for root, dirs, files in walk:
-        dirs[:] = [d for d in dirs if substring not in d]
-        yield root, dirs, files
+        # the walk is already pruned, the workers must not change the dirs list
+        yield cached_task(DirectoryTask(root, list(dirs), files, None, {}, {}), manifest)
+        if keep is None:
+            continue
+        for filename in files:
+            if archives.archive_format(filename) is None:
+                continue
+            members = archives.walk_archive(os.path.join(root, filename), keep)
+            for archive_root, archive_dirs, archive_files, signature, contents in profiling.profiler.timed('archives', members):
+                yield cached_task(DirectoryTask(archive_root, archive_dirs, archive_files, signature, {}, contents), manifest)
 
-def main():
+def cached_task(task, manifest):
+    """
+    Returns the DirectoryResult of the manifest cache if the files of the task did not change,
+    otherwise the task with the signature of its files. Tasks from archives bring their signature.
+    """
+    if manifest is None:
+        return task
+    root = task.root
+    with profiling.profiler.stage('cache lookup'):
+        signature = task.signature if task.signature is not None else manifest_cache.directory_signature(root, task.files)
+        calculations = manifest.lookup(root, signature)
+    if calculations is not None:
+        return DirectoryResult(root, calculations, None, signature, manifest.known_orca_verdicts(root, signature), True)
+    return task._replace(signature=signature, orca_verdicts=manifest.known_orca_verdicts(root, signature))
+
+def batched(items, batch_size):
+    """Groups items into lists of length batch_size"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def merge_batch(batch, results):
+    """Puts the results of the parsed directories back in between the cached ones"""
+    results = iter(results)
+    return [item if isinstance(item, DirectoryResult) else next(results) for item in batch]
+
+def crawl(walk, args, manifest=None):
+    """
+    Hands batches of directories from the walk to the collectors and
+    yields the list of DirectoryResult tuples per batch in the order of the walk.
+
+    With args.jobs > 1 the batches are parsed in a process pool.
+    The walk stays in this process and only a limited number of batches is in flight,
+    such that the order of the results is deterministic and the memory stays bounded.
+    If a worker process dies (e.g. killed by the OOM killer on a huge output), the directories of the batches
+    in flight are lost: they become errors, which are parsed again in the next run, and a new pool continues the walk.
+    Directories which did not change since the last run are taken from the manifest cache.
+    With args.prefetch_threads > 0 the files of the next directories are read ahead in threads, see prefetch.py.
+    """
+    tasks = walk_tasks(walk, manifest, args)
+    budget = None
+    if args.prefetch_threads > 0:
+        import prefetch
+        budget = prefetch.ByteBudget(args.prefetch_mb * prefetch.MEGABYTE)
+        tasks = prefetch.prefetch_tasks(tasks, args, budget)
+    batches = batched(tasks, args.batch_size)
+
+    def finished(batch, results):
+        """Releases the prefetched bytes of the parsed batch and merges the profile of the worker"""
+        results, profile = results
+        profiling.profiler.merge(profile)
+        if budget is not None:
+            budget.release(sum(prefetch.contents_size(item.contents) for item in batch if isinstance(item, DirectoryTask)))
+        return merge_batch(batch, results)
+
+    if args.jobs <= 1:
+        for batch in batches:
+            tasks = [item for item in batch if isinstance(item, DirectoryTask)]
+            yield finished(batch, collect_batch(tasks, args))
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+
+    def lost(batch):
+        """The results of a batch whose worker process died, the parsed directories become errors"""
+        if budget is not None:
+            budget.release(sum(prefetch.contents_size(item.contents) for item in batch if isinstance(item, DirectoryTask)))
+        error = "BrokenProcessPool: the worker process died while the batch was parsed"
+        return [item if isinstance(item, DirectoryResult) else DirectoryResult(item.root, [], error, item.signature, item.orca_verdicts)
+                for item in batch]
+
+    def wait(batch, future):
+        """Returns the results of a batch and True if the pool is broken"""
+        with profiling.profiler.stage('wait for workers'):
+            try:
+                return finished(batch, future.result()), False
+            except BrokenProcessPool:
+                n_lost = sum(isinstance(item, DirectoryTask) for item in batch)
+                print(f"A worker process died, {n_lost} directories of a batch in flight are lost", file=sys.stderr)
+                return lost(batch), True
+
+    max_in_flight = 2 * args.jobs
+    batch = next(batches, None)
+    while batch is not None:
+        # a new pool after a worker process died, the batch which could not be submitted is submitted again
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            futures = deque()
+            broken = False
+            while batch is not None and not broken:
+                tasks = [item for item in batch if isinstance(item, DirectoryTask)]
+                try:
+                    futures.append((batch, executor.submit(collect_batch, tasks, args, True)))
+                except BrokenProcessPool:
+                    break
+                batch = next(batches, None)
+                if len(futures) >= max_in_flight:
+                    results, broken = wait(*futures.popleft())
+                    yield results
+            while futures:
+                results, _ = wait(*futures.popleft())
+                yield results
+
+def write_thermo_grid(calculations, args):
+    """
+    Writes the free energies of all frequency calculations for every pair of the temperatures and pressures
+    of the arguments as long table to thermo_grid.<format>.
+    """
+    import common_functions
+    import output_writers
+
+    temperatures = args.temperatures if args.temperatures is not None else [mc.TEMPERATURE]
+    pressures = args.pressures if args.pressures is not None else [mc.PRESSURE]
+    table = common_functions.derive_grid(calculations, temperatures, pressures)
+    path, rows = output_writers.write_columns(table, 'thermo_grid', args)
+    print(f"Thermochemistry of {rows} (calculation, temperature, pressure) combinations written to {path}")
+
+def write_censo_grid(calculations, args):
+    """
+    Writes the Boltzmann weights of the conformers and the ensemble free energies of all CENSO calculations
+    for every temperature of the arguments as long table to censo_grid.<format>.
+    """
+    import output_writers
+    from parse_censo_calculation import derive_censo_grid
+
+    table = derive_censo_grid(calculations, args.temperatures)
+    if table is None:
+        return
+    path, rows = output_writers.write_columns(table, 'censo_grid', args)
+    print(f"Boltzmann weights of {rows} (conformer, temperature) combinations written to {path}")
+
+def write_ensembles(calculations, args):
+    """
+    Writes the Boltzmann averages of the conformers in CONF<n> directories, one row per ensemble, to ensembles.<format>.
+    """
+    import ensembles
+    import output_writers
+
+    table = ensembles.boltzmann_averages(calculations)
+    if table is None:
+        print("No ensembles (CONF<n> directories) found")
+        return
+    path, rows = output_writers.write_columns(table, 'ensembles', args)
+    print(f"Boltzmann averages of {rows} ensembles written to {path}")
+    dropped = int(table['Dropped Conformers'].sum())
+    if dropped:
+        print(f"{dropped} conformers without the free energy of their ensemble were dropped, see 'Dropped Conformers'")
+
+def write_derived(calculations, args):
+    """Writes the tables which are derived from all calculations: the grids (--temperatures, --pressures) and the ensembles"""
+    if args.temperatures is not None or args.pressures is not None:
+        with profiling.profiler.stage('thermo grid'):
+            write_thermo_grid(calculations, args)
+            if args.temperatures is not None:
+                write_censo_grid(calculations, args)
+
+    if args.ensembles:
+        with profiling.profiler.stage('ensembles'):
+            write_ensembles(calculations, args)
+
+def iter_results(top, args, manifest=None, walk=None):
+    """
+    Walks from top and yields the DirectoryResult of every directory as soon as its batch is finished.
+    Successful results are stored in the manifest, the manifest is saved by the caller.
+    With --xyz archive the geometries are appended to the archive here, in one process.
+    With --xyz files the geometries of the cached results are written here, the parsed ones are written by collect_directory.
+    walk : (root, dirs, files) of the directories to be parsed instead of the walk from top, e.g. the changed ones of watch.py.
+    """
+    walk = profiling.profiler.timed('walk', directory_walk(top, args) if walk is None else walk)
+    archive = None
+    if args.xyz == 'archive':
+        import xyz_archive
+        archive = xyz_archive.XYZArchive(mc.XYZDIR, skip_unchanged=args.skip_unchanged)
+
+    with archive if archive is not None else nullcontext():
+        for results in crawl(walk, args, manifest):
+            for result in results:
+                if result.error is None and manifest is not None:
+                    manifest.store(result.root, result.signature, result.calculations, result.orca_verdicts)
+                if result.error is None and (archive is not None or (args.xyz == 'files' and result.cached)):
+                    for calculation in result.calculations:
+                        if calculation.get('Single Point Energy'):
+                            with profiling.profiler.stage('xyz'):
+                                write_geometry(calculation, args, archive)
+                yield result
+
+def iter_calculations(top=os.path.curdir, options=None):
+    """
+    Yields the finished calculation dictionaries (parsed, symmetry, thermochemistry) while the walk progresses.
+
+    for calculation in qcdc.iter_calculations('.'):
+        ...
+
+    :param top: The directory to start walking from, the xyz files are written relative to the working directory.
+    :param options: parsed arguments of parse_args.get_arguments, default: the defaults of the command line.
+    Directories which could not be parsed are reported on stderr.
+    The manifest cache (options.cache) is only saved if the walk is consumed completely.
+    """
+    if options is None:
+        options = get_arguments([])
+    if options.xyz == 'files' and not os.path.exists(mc.XYZDIR):
+        os.makedirs(mc.XYZDIR)
+    manifest = manifest_cache.Manifest.load(options) if options.cache else None
+    for result in iter_results(top, options, manifest):
+        if result.error is not None:
+            print(f"Error in {result.root}: {result.error}", file=sys.stderr)
+            continue
+        yield from result.calculations
+    if manifest is not None:
+        manifest.save()
+
+def rewrite_data(calculations, args, exclude):
+    """Writes data.<format> into a temporary file, which replaces the old one, such that readers never see a partial file"""
+    import output_writers
+
+    path = output_writers.output_path('data', args.format)
+    temporary = output_writers.output_path('data.tmp', args.format)
+    if args.format == 'jsonl':
+        with output_writers.JsonLinesWriter(temporary, args.columns, exclude) as writer:
+            for calculation in calculations:
+                writer.write(calculation)
+    else:
+        output_writers.write_records(calculations, 'data.tmp', args, exclude)
+    os.replace(temporary, path)
+    return path
+
+def drop_entries(manifest, roots):
+    """Removes the entries of the roots and of the directories below them from the manifest, True if they had calculations"""
+    if not roots:
+        return False
+    roots = set(roots)
+    prefixes = tuple(root + os.sep for root in roots)
+    dropped = [root for root in manifest.entries if root in roots or root.startswith(prefixes)]
+    had_calculations = False
+    for root in dropped:
+        had_calculations |= bool(manifest.entries.pop(root)['calculations'])
+    return had_calculations
+
+def watch_directories(args):
+    """
+    Crawls the working directory and polls the directories every args.watch_interval seconds until Ctrl+C or SIGTERM, see watch.py.
+    Directories with new or finished calculations are parsed again, their calculations are upserted into the store
+    and data.<format> (with the grids and ensembles, if requested) is rewritten, if any calculation changed.
+    The calculations of all directories are kept in the manifest in memory, which is saved at the end with --cache on.
+    """
+    import signal
+    import time
+    import output_writers
+    import scanner
+    import watch
+
+    # stop on SIGTERM (kill, the end of a batch job) like on Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    manifest = manifest_cache.Manifest.load(args) if args.cache else manifest_cache.Manifest(manifest_cache.settings_key(args))
+    exclude = output_writers.MEMORY_COLUMNS + ([] if args.savexyz else output_writers.XYZ_COLUMNS)
+    own_files = [output_writers.output_path(stem, args.format) for stem in ('data', 'data.tmp', 'thermo_grid', 'censo_grid', 'ensembles')]
+    own_files.append(profiling.REPORT_FILE)
+    store = None
+    if args.store is not None:
+        import sqlite_store
+        path = sqlite_store.parse_store(args.store)[1]
+        store = sqlite_store.SQLiteStore(path)
+        own_files += [path, path + '-wal', path + '-shm', path + '-journal']
+    rules = ignore_rules(args)
+    watcher = watch.Watcher(os.path.curdir, args, rules, manifest.entries, own_files)
+
+    def ingest(walk):
+        """Parses the directories of the walk, returns True if calculations were parsed"""
+        parsed = False
+        for result in iter_results(os.path.curdir, args, manifest, walk):
+            if result.error is not None:
+                print(f"Error in {result.root}: {result.error}", file=sys.stderr)
+                continue
+            parsed |= bool(result.calculations)
+            if store is not None:
+                with profiling.profiler.stage('store'):
+                    for calculation in result.calculations:
+                        store.write(calculation)
+        if store is not None:
+            store.commit()
+        return parsed
+
+    def write():
+        calculations = [calculation for entry in manifest.entries.values() for calculation in entry['calculations']]
+        with profiling.profiler.stage('output'):
+            path = rewrite_data(calculations, args, exclude)
+        write_derived(calculations, args)
+        print(f"{time.strftime('%H:%M:%S')} {len(calculations)} calculations written to {path}")
+
+    with store if store is not None else nullcontext():
+        ingest(watcher.track(scanner.scan(os.path.curdir, rules, args.max_depth, args.follow_symlinks)))
+        # the lookups of the polls see the entries of this run
+        manifest.old_entries = manifest.entries
+        watcher.start()
+        write()
+        print(f"Watching {len(watcher.listings)} directories ({len(watcher.pending)} with running calculations), stop with Ctrl+C")
+        try:
+            while True:
+                time.sleep(args.watch_interval)
+                with profiling.profiler.stage('watch poll'):
+                    ready, removed = watcher.poll()
+                changed = drop_entries(manifest, removed)
+                if ready:
+                    changed |= any(manifest.entries.get(root, {}).get('calculations') for root, _, _ in ready)
+                    if args.archives:
+                        # the directories of archives (not on disk) in the changed directories are parsed again or dropped
+                        prefixes = tuple(root + os.sep for root, _, _ in ready)
+                        changed |= drop_entries(manifest, [root for root in manifest.entries
+                                                           if root not in watcher.listings and root.startswith(prefixes)])
+                    changed |= ingest(ready)
+                if changed:
+                    write()
+        except KeyboardInterrupt:
+            print("Watch stopped")
+
+    if args.cache:
+        manifest.save()
+    if args.profile:
+        profiling.print_summary(profiling.profiler.write(profiling.REPORT_FILE))
+        print(f"Profile written to {profiling.REPORT_FILE}")
+
+def main(args):
     """
     Walks through directories and files, and calls the parsers (orca and turbomole).
+    With --format jsonl every calculation is written as soon as its directory is parsed,
+    otherwise the calculations are collected and written at the end.
     """
-    df = []  # Initialize an empty list to collect dataframes
-    if not os.path.exists(mc.XYZDIR):
+    import output_writers
+
+    if args.profile:
+        profiling.enable(args.profile_top)
+    print(f"Configuration: {mc.config_path()}")
+    if args.xyz == 'files' and not os.path.exists(mc.XYZDIR):
         os.makedirs(mc.XYZDIR)
+    print(f"Ignoring directories: \n {read_ignore_folders(args.ignore_folders)}")
+    if args.watch:
+        return watch_directories(args)
 
-    # Ignore folders in os.walk
+    manifest = manifest_cache.Manifest.load(args) if args.cache else None
+    exclude = output_writers.MEMORY_COLUMNS + ([] if args.savexyz else output_writers.XYZ_COLUMNS)
+    # the thermochemistry grid and the ensembles need all calculations at the end
+    keep = args.format != 'jsonl' or args.temperatures is not None or args.pressures is not None or args.ensembles
 
-    ignore_folders = []
-    try:
-        with open(args.ignore_folders, 'r') as file:
-            ignore_folders = file.readlines()
-            ignore_folders = [line.strip('\n') for line in ignore_folders]
-            ignore_folders = [line.strip('/') for line in ignore_folders]
-    except FileNotFoundError:
-        print(f"The file at {args.ignore_folders} does not exist.")
-    ignore_folders.append(['./xyz', './__pycache__', './.venv', './.git'])
-    print(f"Ignoring directories with the names: \n {ignore_folders}")
-
-    my_walk = ignore_dirs_by_name(os.path.curdir, ignore_folders)
-
-    #unwanted_substrings = ['CONF']
-    #for substring in unwanted_substrings:
-    #    my_walk = ignore_dirs_containing(my_walk, substring)
-
-    #for root, dirs, files in os.walk(os.path.curdir, ignore_folders):
-    for root, dirs, files in my_walk:
-        # Exclude specific folders
-        # if root.startswith('./xyz') or root.startswith('./__pycache__') or root.startswith('./.venv') or root.startswith('./.git'):
-        #     continue
-
-        #new_cycle = False
-        #for folder in ignore_folders:
-        #    if root.startswith(folder):
-        #        new_cycle = True 
-        #if new_cycle:
-        #    continue
-
-
-        # Parse ORCA calculations
-        combined = []
-        print('Root: ', root)
-        if args.orca:
-            orca_calculations = parse_orca(root, dirs, files)
-            if orca_calculations:
-                combined.extend(orca_calculations)
-
-        # Parse TURBOMOLE calculations
-        if args.turbomole:
-            ser = parse_turbomole(root, dirs, files)
-            if ser:
-                combined.append(ser)
-
-        # Parse CENSO calculations
-        if args.censo:
-            ser = parse_censo(root, dirs, files)
-            if ser:
-                combined.append(ser)
-
-
-        # Post-processing for all calculations of a folder
-        if combined:
-            for calculation in combined:
-
-                # Symmetry assignment, only if there exists an electronic energy
-                if calculation.get('Elements') is not None and mc.COMPUTE_SYMMETRY:
-                    calculation['Point Group'], calculation['Symmetry Number'] = common_functions.determine_point_group_and_symmetry_number(calculation['Elements'], calculation['xyz Coordinates'])
-                    if calculation['Symmetry Number'] is None:
-                        raise KeyError(f"No symmetry number assigned for Point Group {calculation['Point Group']}, please add it to symmetry_number_lookup")
-                else:
-                    calculation['Point Group'] = None
-                    calculation['Symmetry Number'] = 1
-
-                # If frequencies are present, coordinates should also be present
-                if calculation.get('Frequency Calculation'):
-                    try:
-                        common_functions.derive_data(
-                            calculation,
-                            calculation['Elements'],
-                            calculation['xyz Coordinates'],
-                            calculation['Frequencies'],
-                            calculation['Symmetry Number']
-                        )
-                    except KeyError as e:
-                        print(f"{e} in derive_data. Some data not found")
-                        pass
-
-                if calculation.get('Single Point Energy'):
-                    try:
-                        info_string = common_functions.format_properties(
-                            charge=calculation.get('Charge'),
-                            s2=calculation.get('S2'),
-                            dipole=calculation.get('Dipole Moment'),
-                            vibration=calculation.get('Frequencies'),
-                            zpe=calculation.get('Zero Point Energy')
-                        )
-                        common_functions.write_xyz(
-                            calculation['Elements'],
-                            calculation['xyz Coordinates'],
-                            calculation['xyz File Name'],
-                            comment=calculation['Single Point Energy']/mc.EH2KJMOL,
-                            bottom_info=''
-                        )
-                        # t2energy: prints also vibrations, but not easily readable by other scripts
-                        #common_functions.write_xyz(
-                        #    calculation['Elements'],
-                        #    calculation['xyz Coordinates'],
-                        #    calculation['xyz File Name'],
-                        #    comment="Generated by script",
-                        #    bottom_info=info_string
-                        #)
-                    except KeyError as e:
-                        print(f"{e} in write_xyz. Some data not found")
-                        pass
-                    # Extract the number in the /CONF string which is used in censo calculations.
-                    calculation['Censo Conformer Number'] = common_functions.extract_conf_number(calculation.get('Root'))
-
-            # Append the cleaned and calculated data of the folder
-            df.extend(combined)
+    store = None
+    if args.store is not None:
+        import sqlite_store
+        store = sqlite_store.SQLiteStore(sqlite_store.parse_store(args.store)[1])
+
+    calculations = []
+    failed = []
+    path = output_writers.output_path('data', args.format)
+    with output_writers.JsonLinesWriter(path, args.columns, exclude) if args.format == 'jsonl' else nullcontext() as writer, \
+            store if store is not None else nullcontext():
+        for result in iter_results(os.path.curdir, args, manifest):
+            if result.error is not None:
+                failed.append((result.root, result.error))
+                continue
+            if writer is not None:
+                with profiling.profiler.stage('output'):
+                    for calculation in result.calculations:
+                        writer.write(calculation)
+            if store is not None:
+                with profiling.profiler.stage('store'):
+                    for calculation in result.calculations:
+                        store.write(calculation)
+            if keep:
+                calculations.extend(result.calculations)
+
+    if manifest is not None:
+        manifest.save()
+        print(f"Cache: {manifest.hits} directories unchanged, {manifest.misses} directories parsed")
+
+    for root, message in failed:
+        print(f"Error in {root}: {message}", file=sys.stderr)
+    if failed:
+        print(f"{len(failed)} directories could not be parsed", file=sys.stderr)
 
     # Final part
-    df = pd.DataFrame(df)
-    if not args.savexyz:
-        df.drop('xyz Coordinates', axis=1, errors='ignore')
-        df.drop('Frequencies', axis=1, errors='ignore')
-        df.drop('Elements', axis=1, errors='ignore')
-    df.to_json('data.json')
+    if store is not None:
+        print(f"{store.count} calculations stored in {store.path}")
+    if writer is not None:
+        df = None # the records are not kept, read_json_lines reads them back
+        print(f"{writer.count} calculations written to {path}")
+    else:
+        with profiling.profiler.stage('output'):
+            path, df = output_writers.write_records(calculations, 'data', args, exclude)
+        print(f"{len(calculations)} calculations written to {path}")
+
+    write_derived(calculations, args)
 
+    if args.profile:
+        profiling.print_summary(profiling.profiler.write(profiling.REPORT_FILE))
+        print(f"Profile written to {profiling.REPORT_FILE}")
     return df
 
 
 if __name__ == '__main__':
     args = get_arguments()
-    df = main()
-    print(df)
-    print(df.keys())
-    print(df.info())
+    df = main(args)
+    if df is not None:
+        print(df)
+    if args.format == 'json' and df is not None:
+        print(df.keys())
+        print(df.info())
@@ -0,0 +1,125 @@
+import fnmatch
+import os
+import re
+
+# Directory walk with os.scandir, a replacement of os.walk for the crawl.
+# The type of the entries comes from the directory listing (d_type), directories are not stat'ed,
+# unless symlinks are followed, then every directory is identified by (device, inode) and visited once.
+# The order of the walk is the same as for os.walk (top-down, in the order of the listing).
+#
+# Ignore rules, e.g. in the file of --ignore_folders, one per line:
+#   name          a directory name at any depth, e.g. __pycache__
+#   *.tmp         a glob for directory names at any depth
+#   ./path        a path relative to the top (globs allowed), e.g. ./xyz or ./old/*
+#   re:regex      a regular expression searched in the path relative to the top, e.g. re:CONF\d+$
+#   # comment     empty lines and comments are skipped
+
+
+class IgnoreRules:
+    """Compiled ignore rules, see the comment above"""
+
+    def __init__(self, patterns=()):
+        names = set()
+        name_globs = []
+        paths = []
+        regexes = []
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern or pattern.startswith('#'):
+                continue
+            if pattern.startswith('re:'):
+                regexes.append(pattern[3:])
+                continue
+            anchored = pattern.startswith('./') or '/' in pattern.strip('/')
+            if pattern.startswith('./'):
+                pattern = pattern[2:]
+            pattern = pattern.strip('/')
+            if not pattern or pattern == '.':
+                continue
+            if anchored:
+                paths.append(fnmatch.translate(pattern))
+            elif any(char in pattern for char in '*?['):
+                name_globs.append(fnmatch.translate(pattern))
+            else:
+                names.add(pattern)
+        self.names = frozenset(names)
+        self.name_re = re.compile('|'.join(name_globs)) if name_globs else None
+        self.path_re = re.compile('|'.join(paths)) if paths else None
+        self.search_re = re.compile('|'.join(f'(?:{regex})' for regex in regexes)) if regexes else None
+
+    def ignored(self, name, relative_path):
+        """Checks a directory by its name and its path relative to the top ('a/b/name')"""
+        if name in self.names:
+            return True
+        if self.name_re is not None and self.name_re.match(name):
+            return True
+        if self.path_re is not None and self.path_re.match(relative_path):
+            return True
+        return self.search_re is not None and self.search_re.search(relative_path) is not None
+
+
+def scan(top, rules=None, max_depth=None, follow_symlinks=False, relative='', depth=0):
+    """
+    Walks through the directory tree from the top like os.walk and yields (root, dirs, files).
+    Ignored directories are not in dirs and are not entered, dirs can be pruned further by the caller.
+
+    :param rules: IgnoreRules or None.
+    :param max_depth: directories deeper than max_depth below the top are not entered (None: no limit).
+    :param follow_symlinks: enter symlinked directories, every directory (device, inode) is visited only once.
+    :param relative, depth: path and depth of top below the top of the rules, to walk again below a known directory.
+    """
+    seen = set()
+    if follow_symlinks:
+        try:
+            status = os.stat(top)
+        except OSError:
+            return
+        seen.add((status.st_dev, status.st_ino))
+
+    stack = [(top, relative, depth)]
+    while stack:
+        root, relative, depth = stack.pop()
+        try:
+            iterator = os.scandir(root)
+        except OSError:
+            continue
+
+        dirs, files, entries = [], [], {}
+        add_file = files.append
+        with iterator:
+            for entry in iterator:
+                try:
+                    if not entry.is_dir():
+                        add_file(entry.name)
+                        continue
+                except OSError:
+                    add_file(entry.name)
+                    continue
+                name = entry.name
+                if rules is not None and rules.ignored(name, relative + '/' + name if relative else name):
+                    continue
+                dirs.append(name)
+                entries[name] = entry
+
+        yield root, dirs, files
+
+        if max_depth is not None and depth >= max_depth:
+            continue
+        children = []
+        for name in dirs:
+            entry = entries.get(name)
+            if entry is None:
+                continue
+            if follow_symlinks:
+                try:
+                    status = entry.stat()
+                except OSError:
+                    continue
+                key = (status.st_dev, status.st_ino)
+                if key in seen:
+                    continue
+                seen.add(key)
+            elif entry.is_symlink():
+                continue
+            children.append((os.path.join(root, name), relative + '/' + name if relative else name, depth + 1))
+        stack.extend(reversed(children))
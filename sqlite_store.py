@@ -0,0 +1,198 @@
+import json
+import os
+
+import numpy as np
+
+import output_writers
+
+# SQLite store of the calculations (--store sqlite:path.db), which can be queried without loading everything.
+#
+# calculations : one row per RootFile, every scalar property is a column (added when it appears first,
+#                without type affinity, such that numbers stay numbers), lists and dictionaries are JSON text.
+#                The columns of INDEXED_COLUMNS are indexed.
+# geometries   : atomic numbers (uint8) and coordinates (float64, Nx3, Angstroem) as blobs
+# frequencies  : frequencies (float64, cm-1) as blob and the number of imaginary modes (indexed)
+#
+# Every crawl upserts the rows by RootFile, rows of deleted calculations stay in the store.
+#
+#   import sqlite_store
+#   df = sqlite_store.query('results.db', 'SELECT c.RootFile FROM calculations c JOIN frequencies f USING (RootFile) '
+#                                         'WHERE c."Group" = ? AND f.n_imaginary > 0', ('./group/',))
+#   connection = sqlite_store.connect('results.db')
+#   frequencies = sqlite_store.frequencies(connection, df['RootFile'][0])
+
+INDEXED_COLUMNS = ['Root', 'Group', 'Type of Calculation', 'Single Point Energy', 'Final Gibbs Free Energy',
+                   'Chemical Potential', 'qRRHO', 'Frequency Calculation', 'Geometry Optimization', 'Point Group']
+# Properties in the side tables or not stored at all (geometries and gradients of the trajectories), not in calculations
+SIDE_COLUMNS = ['xyz Coordinates', 'xyz Input Coordinates', 'Atomic Numbers', 'Elements', 'Frequencies',
+                'Trajectory Coordinates', 'Trajectory Gradients'] + output_writers.MEMORY_COLUMNS
+COMMIT_INTERVAL = 1000 # records per transaction
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS calculations ("RootFile" TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS geometries (
+    "RootFile" TEXT PRIMARY KEY REFERENCES calculations ("RootFile") ON DELETE CASCADE,
+    n_atoms INTEGER,
+    atomic_numbers BLOB,
+    coordinates BLOB,
+    input_coordinates BLOB
+);
+CREATE TABLE IF NOT EXISTS frequencies (
+    "RootFile" TEXT PRIMARY KEY REFERENCES calculations ("RootFile") ON DELETE CASCADE,
+    n_modes INTEGER,
+    n_imaginary INTEGER,
+    frequencies BLOB
+);
+CREATE INDEX IF NOT EXISTS frequencies_n_imaginary ON frequencies (n_imaginary);
+'''
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def parse_store(value):
+    """Splits --store 'sqlite:path.db' into the backend and the path"""
+    backend, _, path = value.partition(':')
+    if backend != 'sqlite' or not path:
+        raise ValueError("Accepted values are 'sqlite:path.db'.")
+    return backend, path
+
+
+def connect(path):
+    import sqlite3
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA journal_mode = WAL')
+    connection.execute('PRAGMA synchronous = NORMAL')
+    connection.execute('PRAGMA foreign_keys = ON')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def sql_value(value):
+    """Converts a property into a value of SQLite, lists, arrays and dictionaries into JSON"""
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (set, frozenset)):
+        value = sorted(value, key=str)
+    return json.dumps(value, default=output_writers.json_default)
+
+
+def array_blob(value, dtype):
+    if output_writers.is_missing(value):
+        return None
+    return np.ascontiguousarray(value, dtype=dtype).tobytes()
+
+
+class SQLiteStore:
+    """
+    Writes calculations into the SQLite database at path.
+
+    with SQLiteStore('results.db') as store:
+        store.write(calculation)
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.connection = connect(path)
+        self.columns = [row[1] for row in self.connection.execute('PRAGMA table_info(calculations)')]
+        self.insert_sql = None
+        self.pending = 0
+        self.count = 0
+
+    def add_columns(self, record):
+        """Adds the columns of new properties and indexes the INDEXED_COLUMNS"""
+        for key, value in record.items():
+            if key in self.columns or key in SIDE_COLUMNS:
+                continue
+            self.connection.execute(f'ALTER TABLE calculations ADD COLUMN {quote(key)}')
+            self.columns.append(key)
+            self.insert_sql = None
+            if key in INDEXED_COLUMNS:
+                index_name = quote('calculations_' + key.replace(' ', '_'))
+                self.connection.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON calculations ({quote(key)})')
+
+    def write(self, record):
+        """Inserts or updates the calculation with the RootFile of the record"""
+        root_file = record['RootFile']
+        self.add_columns(record)
+        if self.insert_sql is None:
+            names = ', '.join(quote(column) for column in self.columns)
+            placeholders = ', '.join('?' for _ in self.columns)
+            updates = ', '.join(f'{quote(column)} = excluded.{quote(column)}' for column in self.columns if column != 'RootFile')
+            self.insert_sql = (f'INSERT INTO calculations ({names}) VALUES ({placeholders}) '
+                               f'ON CONFLICT ("RootFile") DO UPDATE SET {updates}')
+        self.connection.execute(self.insert_sql, [sql_value(record.get(column)) for column in self.columns])
+
+        self.connection.execute('DELETE FROM geometries WHERE "RootFile" = ?', (root_file,))
+        numbers = record.get('Atomic Numbers')
+        coordinates = record.get('xyz Coordinates')
+        input_coordinates = record.get('xyz Input Coordinates')
+        if not (output_writers.is_missing(coordinates) and output_writers.is_missing(input_coordinates)):
+            n_atoms = len(numbers) if not output_writers.is_missing(numbers) else None
+            self.connection.execute(
+                'INSERT INTO geometries VALUES (?, ?, ?, ?, ?)',
+                (root_file, n_atoms, array_blob(numbers, np.uint8),
+                 array_blob(coordinates, np.float64), array_blob(input_coordinates, np.float64)))
+
+        self.connection.execute('DELETE FROM frequencies WHERE "RootFile" = ?', (root_file,))
+        values = record.get('Frequencies')
+        if not output_writers.is_missing(values):
+            values = np.asarray(values, dtype=np.float64)
+            self.connection.execute('INSERT INTO frequencies VALUES (?, ?, ?, ?)',
+                                    (root_file, len(values), int(np.count_nonzero(values < 0)), values.tobytes()))
+
+        self.count += 1
+        self.pending += 1
+        if self.pending >= COMMIT_INTERVAL:
+            self.connection.commit()
+            self.pending = 0
+
+    def commit(self):
+        """Commits the pending records, such that other connections see them"""
+        self.connection.commit()
+        self.pending = 0
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.execute('PRAGMA optimize')
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def geometry(connection, root_file):
+    """Returns the atomic numbers and the Nx3 coordinates of a calculation, or None"""
+    row = connection.execute('SELECT atomic_numbers, coordinates FROM geometries WHERE "RootFile" = ?', (root_file,)).fetchone()
+    if row is None:
+        return None
+    numbers = np.frombuffer(row[0], dtype=np.uint8) if row[0] is not None else None
+    coordinates = np.frombuffer(row[1], dtype=np.float64).reshape(-1, 3) if row[1] is not None else None
+    return numbers, coordinates
+
+
+def frequencies(connection, root_file):
+    """Returns the frequencies of a calculation in cm-1, or None"""
+    row = connection.execute('SELECT frequencies FROM frequencies WHERE "RootFile" = ?', (root_file,)).fetchone()
+    return np.frombuffer(row[0], dtype=np.float64) if row is not None else None
+
+
+def query(path, sql, parameters=()):
+    """Runs a query on the store at path and returns a DataFrame"""
+    import pandas as pd
+    connection = connect(path)
+    try:
+        return pd.read_sql_query(sql, connection, params=parameters)
+    finally:
+        connection.close()
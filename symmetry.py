@@ -0,0 +1,191 @@
+import hashlib
+import itertools
+
+import numpy as np
+
+import common_functions
+import elements
+
+# Point groups for the symmetry numbers of the rotational partition function.
+# The results are cached by a fingerprint of the geometry, such that opt -> freq -> SP chains are analyzed once.
+# Linear molecules and asymmetric tops (three different moments of inertia) are settled here:
+# the symmetry elements of an asymmetric top can only be C2 axes along the principal axes,
+# mirror planes perpendicular to them and the inversion, which are all diagonal in the frame of the principal axes.
+# Symmetric and spherical tops are handed to the PointGroupAnalyzer of pymatgen.
+# Tolerances and tests are the same as in the PointGroupAnalyzer.
+
+TOLERANCE = 0.3 # Angstrom
+EIGEN_TOLERANCE = 0.01
+FINGERPRINT_RESOLUTION = 1e-3 # Angstrom
+CACHE_SIZE = 100000
+
+_cache = {}
+# number of point groups from the cache, from the principal moments and from pymatgen
+counts = {'cached': 0, 'principal moments': 0, 'pymatgen': 0}
+
+
+def fingerprint(numbers, coordinates):
+    """
+    Returns a hash of the geometry, which does not depend on the position and the order of the atoms.
+    The coordinates relative to the centroid are rounded to FINGERPRINT_RESOLUTION.
+    """
+    centered = coordinates - coordinates.mean(axis=0)
+    grid = np.round(centered / FINGERPRINT_RESOLUTION).astype(np.int64)
+    rows = np.column_stack([numbers.astype(np.int64), grid])
+    rows = rows[np.lexsort(rows.T[::-1])]
+    return hashlib.blake2b(rows.tobytes(), digest_size=16).digest()
+
+
+def principal_axes(masses, coordinates):
+    """
+    Returns the coordinates relative to the center of mass,
+    the eigenvalues of the inertia tensor normalized by the total inertia and the principal axes (rows).
+    """
+    centered = coordinates - np.average(coordinates, axis=0, weights=masses)
+    weighted = masses[:, None] * centered
+    total_inertia = np.sum(weighted * centered)
+    tensor = np.eye(3) * total_inertia - weighted.T @ centered
+    eigenvalues, eigenvectors = np.linalg.eig(tensor / total_inertia)
+    return centered, eigenvalues, eigenvectors.T
+
+
+def valid_operations(numbers, centered, matrices, tolerance=TOLERANCE, chunk_elements=1 << 22):
+    """
+    Checks for a stack of operation matrices, that every atom is mapped onto exactly one atom of the same element.
+    The atoms are tested in growing blocks, operations which fail on a block are not tested further.
+    Returns a boolean array.
+    """
+    n_atoms = len(numbers)
+    valid = np.zeros(len(matrices), dtype=bool)
+    step = max(1, chunk_elements // (n_atoms * 3))
+    for first in range(0, len(matrices), step):
+        candidates = np.arange(first, min(first + step, len(matrices)))
+        start, block = 0, 1
+        while start < n_atoms and len(candidates):
+            block = max(1, min(block, chunk_elements // (len(candidates) * n_atoms * 3)))
+            transformed = np.einsum('kij,aj->kai', matrices[candidates], centered[start:start + block])
+            close = np.all(np.abs(transformed[:, :, None, :] - centered[None, None, :, :]) < tolerance, axis=3)
+            ok = (close.sum(axis=2) == 1) & (numbers[close.argmax(axis=2)] == numbers[start:start + block])
+            candidates = candidates[ok.all(axis=1)]
+            start += block
+            block *= 4
+        valid[candidates] = True
+    return valid
+
+
+def is_valid_operation(numbers, centered, matrix, tolerance=TOLERANCE):
+    """Checks, that the operation maps every atom onto exactly one atom of the same element"""
+    return bool(valid_operations(numbers, centered, matrix[None], tolerance)[0])
+
+
+def reflections(normals):
+    """Returns the matrices of the reflections at the planes through the origin with the given normals"""
+    units = normals / np.linalg.norm(normals, axis=1)[:, None]
+    return np.eye(3) - 2 * units[:, :, None] * units[:, None, :]
+
+
+def has_pair_mirror(numbers, centered, axes, tolerance=TOLERANCE):
+    """
+    Searches mirror planes between pairs of atoms of the same element like PointGroupAnalyzer._find_mirror,
+    the normal of the plane has to fulfill dot(normal, axis) < tolerance for one of the axes.
+    """
+    i, j = np.triu_indices(len(numbers), 1)
+    same = numbers[i] == numbers[j]
+    normals = centered[i[same]] - centered[j[same]]
+    normals = normals[np.any(normals @ np.atleast_2d(axes).T < tolerance, axis=1)]
+    if not len(normals):
+        return False
+    return bool(valid_operations(numbers, centered, reflections(normals), tolerance).any())
+
+
+def principal_moments_point_group(numbers, masses, coordinates, tolerance=TOLERANCE, eigen_tolerance=EIGEN_TOLERANCE):
+    """
+    Returns the point group of linear molecules and asymmetric tops,
+    or None if the molecule has to be analyzed by pymatgen.
+    """
+    centered, eigenvalues, axes = principal_axes(masses, coordinates)
+    v1, v2, v3 = eigenvalues
+    inversion = -np.eye(3)
+
+    if abs(v1 * v2 * v3) < eigen_tolerance:
+        return 'D*h' if is_valid_operation(numbers, centered, inversion, tolerance) else 'C*v'
+    if not (abs(v1 - v2) > eigen_tolerance and abs(v1 - v3) > eigen_tolerance and abs(v2 - v3) > eigen_tolerance):
+        return None
+
+    # the 7 diagonal operations in the frame of the principal axes, tested at once
+    diagonals = [diagonal for diagonal in itertools.product((1.0, -1.0), repeat=3) if diagonal != (1.0, 1.0, 1.0)]
+    matrices = np.einsum('ji,kj,jl->kil', axes, np.array(diagonals), axes)
+    validity = dict(zip(diagonals, valid_operations(numbers, centered, matrices, tolerance)))
+
+    def valid(diagonal):
+        return validity[diagonal]
+
+    def rotation(i):
+        return tuple(1.0 if j == i else -1.0 for j in range(3))
+
+    def mirror(i):
+        return tuple(-1.0 if j == i else 1.0 for j in range(3))
+
+    rotations = [i for i in range(3) if valid(rotation(i))]
+    if not rotations:
+        if valid((-1.0, -1.0, -1.0)):
+            return 'Ci'
+        if any(valid(mirror(i)) for i in range(3)) or has_pair_mirror(numbers, centered, axes, tolerance):
+            return 'Cs'
+        return 'C1'
+    if len(rotations) == 1:
+        main = rotations[0]
+        if valid(mirror(main)):
+            return 'C2h'
+        if has_pair_mirror(numbers, centered, axes[main], tolerance):
+            return 'C2v'
+        # rotoreflection by 90 degrees about the main axis
+        s4 = np.diag(mirror(main))
+        others = [i for i in range(3) if i != main]
+        s4[others[0], others[0]] = s4[others[1], others[1]] = 0.0
+        s4[others[0], others[1]], s4[others[1], others[0]] = -1.0, 1.0
+        if is_valid_operation(numbers, centered, axes.T @ s4 @ axes, tolerance):
+            return 'S4'
+        return 'C2'
+    if len(rotations) == 3:
+        main = rotations[0]
+        if valid(mirror(main)):
+            return 'D2h'
+        if has_pair_mirror(numbers, centered, axes[main], tolerance):
+            return 'D2d'
+        return 'D2'
+    return None
+
+
+def point_group_and_symmetry_number(element_symbols, coordinates):
+    """
+    Same as common_functions.determine_point_group_and_symmetry_number, with cache and principal moments prefilter.
+
+    element_symbols : element symbols or atomic numbers
+    coordinates : Nx3 coordinates in Angstroem
+    Returns the point group and the symmetry number (None, if the point group is not in symmetry_number_lookup).
+    """
+    numbers = elements.atomic_numbers(element_symbols)
+    coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 3)
+    if len(numbers) != len(coordinates):
+        raise ValueError("The number of elements must match the number of coordinates.")
+    if len(numbers) == 1:
+        return "Single Atom", 1
+
+    key = fingerprint(numbers, coordinates)
+    if key in _cache:
+        counts['cached'] += 1
+        return _cache[key]
+
+    point_group = principal_moments_point_group(numbers, elements.masses(numbers), coordinates)
+    if point_group is None:
+        counts['pymatgen'] += 1
+        result = common_functions.determine_point_group_and_symmetry_number(elements.symbols(numbers), coordinates)
+    else:
+        counts['principal moments'] += 1
+        result = point_group, common_functions.symmetry_number_lookup.get(point_group, None)
+
+    if len(_cache) >= CACHE_SIZE:
+        _cache.clear()
+    _cache[key] = result
+    return result
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The modules of qcdc are imported from the top of the repository, like in benchmarks/run_benchmarks.py,
+# the files of the tests are written by the generators of benchmarks/synthetic.py
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TEST_DIR))
+sys.path.insert(0, os.path.join(os.path.dirname(TEST_DIR), 'benchmarks'))
@@ -0,0 +1,79 @@
+import json
+import os
+
+import manifest_cache
+import qcdc
+import synthetic
+from manifest_cache import Manifest, directory_signature
+from output_writers import json_value
+from parse_args import get_arguments
+
+
+def comparable(calculations):
+    """The calculations as JSON, such that arrays and NaN compare equal"""
+    return json.dumps(json_value(calculations), sort_keys=True, default=str)
+
+
+def test_lookup(tmp_path):
+    synthetic.write(tmp_path / 'water.out', 'first\n')
+    root = str(tmp_path)
+    signature = directory_signature(root, ['water.out', 'vanished.out'])
+    assert signature['vanished.out'] is None
+
+    manifest = Manifest(('settings',), {root: {'signature': signature, 'calculations': [{'a': 1}], 'orca_verdicts': {'water.out': True}}})
+    assert manifest.lookup(root, signature) == [{'a': 1}]
+    assert manifest.known_orca_verdicts(root, signature) == {'water.out': True}
+
+    synthetic.write(tmp_path / 'water.out', 'changed\n')
+    changed = directory_signature(root, ['water.out', 'vanished.out'])
+    assert manifest.lookup(root, changed) is None
+    assert manifest.known_orca_verdicts(root, changed) == {}
+    assert (manifest.hits, manifest.misses) == (1, 1)
+
+
+def test_save_load(tmp_path, capsys):
+    cache_dir = str(tmp_path / 'cache')
+    args = get_arguments([])
+    manifest = Manifest.load(args, cache_dir)
+    manifest.store('./calc', {'water.out': (1, 2, 3)}, [{'Single Point Energy': -1.0}], None)
+    manifest.save(cache_dir)
+
+    loaded = Manifest.load(args, cache_dir)
+    assert loaded.lookup('./calc', {'water.out': (1, 2, 3)}) == [{'Single Point Energy': -1.0}]
+    # only the entries of this run are saved
+    assert loaded.entries == {}
+
+    # settings which change the records discard the manifest
+    assert Manifest.load(get_arguments(['--trajectory', 'on']), cache_dir).old_entries == {}
+    assert 'Settings changed' in capsys.readouterr().out
+
+    with open(os.path.join(cache_dir, manifest_cache.MANIFEST_FILE), 'wb') as file:
+        file.write(b'corrupted')
+    assert Manifest.load(args, cache_dir).old_entries == {}
+
+
+def test_recrawl(tmp_path, monkeypatch):
+    """A second crawl takes everything from the cache and returns the same calculations as the first"""
+    monkeypatch.chdir(tmp_path)
+    synthetic.write_directory('orca', {'water.out': synthetic.orca_output(n_atoms=3, n_cycles=2, filler_lines=1)})
+    synthetic.write_directory('turbomole', synthetic.turbomole_files(n_atoms=3, n_cycles=2))
+    synthetic.write_directory('censo', {'censo.out': synthetic.censo_output(n_conformers=3, n_parts=1, filler_lines=1)})
+    args = get_arguments(['--cache', 'on', '--xyz', 'off', '--turbomole', 'on', '--censo', 'on'])
+
+    def crawl():
+        manifest = Manifest.load(args)
+        results = list(qcdc.iter_results(os.curdir, args, manifest))
+        manifest.save()
+        assert all(result.error is None for result in results)
+        return manifest, {result.root: result.calculations for result in results}
+
+    _, uncached = crawl()
+    assert len([root for root, calculations in uncached.items() if calculations]) == 3
+    manifest, cached = crawl()
+    assert manifest.misses == 0 and manifest.hits == len(uncached)
+    assert comparable(cached) == comparable(uncached)
+
+    # a changed directory is parsed again
+    synthetic.write('orca/water.out', synthetic.orca_output(n_atoms=3, n_cycles=3, filler_lines=1))
+    manifest, _ = crawl()
+    assert manifest.misses == 1
@@ -0,0 +1,51 @@
+import json
+
+import numpy as np
+import pytest
+
+from output_writers import JsonLinesWriter, json_value, read_json_lines
+from parse_censo_calculation import censo_table
+
+
+def strict_loads(line):
+    """json.loads which rejects NaN and Infinity, like strict JSON readers"""
+    def reject(constant):
+        raise ValueError(f"{constant} is not valid JSON")
+    return json.loads(line, parse_constant=reject)
+
+
+def test_json_value():
+    assert json_value(np.nan) is None
+    assert json_value(np.float32('inf')) is None
+    assert json_value(np.array([[1.0, np.nan], [np.inf, 2.0]])) == [[1.0, None], [None, 2.0]]
+    assert json_value([1.5, float('nan'), {'a': (np.nan, 2)}]) == [1.5, None, {'a': [None, 2]}]
+    assert json_value(np.arange(3, dtype=np.uint8)) == [0, 1, 2]
+    assert json_value({'def2-TZVP', 'def2-SVP'}) == ['def2-SVP', 'def2-TZVP']
+    assert json_value('NaN') == 'NaN'
+
+
+def test_json_lines(tmp_path):
+    rows = [['CONF1', '-40.1', '0.00', '-39.1', '-0.01', '0.2', '-38.9', '0.00', '100.0'],
+            ['CONF2', '-40.0', '0.50', '-39.0', '-0.01', '0.2', '---', '---', '---']]
+    records = [
+        {'RootFile': './a/water.out', 'Single Point Energy': -200588.2, 'Zero Point Energy': np.nan,
+         'Frequencies': np.array([1628.39, np.nan, 3850.0]), 'Trajectory Energies': [np.nan, -200588.2],
+         'CENSO Tables': [censo_table(rows)], 'Number of Atoms': np.int64(3)},
+        {'RootFile': './b/water.out', 'Single Point Energy': np.float32(np.nan)},
+    ]
+    path = str(tmp_path / 'data.jsonl')
+    with JsonLinesWriter(path, exclude=['Number of Atoms']) as writer:
+        for record in records:
+            writer.write(record)
+    with open(path) as file:
+        lines = [strict_loads(line) for line in file]
+    assert writer.count == len(lines) == 2
+    first, second = lines
+    assert first['Zero Point Energy'] is None
+    assert first['Frequencies'] == [1628.39, None, 3850.0]
+    assert first['Trajectory Energies'] == [None, -200588.2]
+    assert first['CENSO Tables'][0][1][6] is None
+    assert 'Number of Atoms' not in first
+    assert second == {'RootFile': './b/water.out', 'Single Point Energy': None}
+    pytest.importorskip('pandas')
+    assert list(read_json_lines(path)['RootFile']) == ['./a/water.out', './b/water.out']
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+import my_constants as mc
+import synthetic
+from parse_censo_calculation import censo_table, derive_censo_grid, parse_censo, reweight
+from physical_constants import R, milli
+
+
+def failed_conformer_output(placeholder):
+    """censo.out of three conformers, the last one failed in the last part and has placeholders instead of numbers"""
+    text = synthetic.censo_output(n_conformers=3, n_parts=2, filler_lines=2)
+    head, _, tail = text.rpartition('CONF3 ')
+    row, _, rest = tail.partition('\n')
+    cells = row.split()
+    return head + 'CONF3  ' + '  '.join(cells[:5] + [placeholder] * 3 + cells[8:]) + '\n' + rest
+
+
+def test_parse_censo(tmp_path):
+    synthetic.write(tmp_path / 'censo.out', synthetic.censo_output(n_conformers=4, n_parts=2, filler_lines=2))
+    ser = parse_censo(str(tmp_path), [], ['censo.out'])
+    assert len(ser['CENSO Tables']) == 2
+    assert ser['Conformers'] == 4
+    table = ser['CENSO Tables'][-1]
+    assert table['lowest'].sum() == 1
+    assert ser['CONF#'] == f"CONF{table['CONF#'][table['lowest']][0]}"
+    assert np.isfinite(ser['Ensemble Free Energy'])
+
+
+def test_failed_conformer(tmp_path):
+    for placeholder in ('---', 'NaN*'):
+        synthetic.write(tmp_path / 'censo.out', failed_conformer_output(placeholder))
+        ser = parse_censo(str(tmp_path), [], ['censo.out'])
+        table = ser['CENSO Tables'][-1]
+        assert list(table['CONF#']) == [1, 2, 3]
+        assert np.isnan(table['Gtot'][2]) and np.isfinite(table['Gtot'][:2]).all()
+        # the ensemble consists of the other conformers
+        weights, free_energy = reweight(table, [298.15])
+        assert weights[0, 2] == 0
+        assert np.isclose(weights.sum(), 1)
+        assert np.isfinite(ser['Ensemble Free Energy'])
+        # the best conformer of the strings is kept
+        assert ser['Gtot'] is not None
+
+
+def test_censo_table():
+    rows = [['CONF1', '-40.1', '0.00', '-39.1', '-0.01', '0.2', '-38.9', '0.00', '60.0'],
+            ['CONF7', '-40.0', '0.50', '-39.0', '-0.01', '0.2', '---', 'NaN*', '40.0']]
+    table = censo_table(rows)
+    assert list(table['CONF#']) == [1, 7]
+    assert table['Gtot'][0] == -38.9 and np.isnan(table['Gtot'][1]) and np.isnan(table['dGtot'][1])
+    assert list(table['lowest']) == [True, False]
+
+
+def test_reweight(tmp_path):
+    synthetic.write(tmp_path / 'censo.out', synthetic.censo_output(n_conformers=5, n_parts=1, filler_lines=1))
+    table = parse_censo(str(tmp_path), [], ['censo.out'])['CENSO Tables'][-1]
+    temperatures = [200.0, 298.15, 1000.0]
+    weights, free_energies = reweight(table, temperatures)
+    assert weights.shape == (3, 5)
+    assert np.allclose(weights.sum(axis=1), 1)
+    # the lowest conformer has the largest weight, which decreases with the temperature
+    lowest = np.argmin(table['Gtot'])
+    assert (np.argmax(weights, axis=1) == lowest).all()
+    assert weights[0, lowest] > weights[1, lowest] > weights[2, lowest]
+    for temperature, weights_t, free_energy in zip(temperatures, weights, free_energies):
+        kt = R * milli / mc.EH2KJMOL * temperature
+        # G = -kT ln(sum exp(-G_i/kT)), relative to the lowest Gtot against overflows
+        relative = np.exp(-(table['Gtot'] - table['Gtot'].min()) / kt)
+        assert np.allclose(weights_t, relative / relative.sum())
+        assert free_energy == pytest.approx(table['Gtot'].min() - kt * np.log(relative.sum()))
+
+
+def test_derive_censo_grid(tmp_path):
+    synthetic.write(tmp_path / 'censo.out', synthetic.censo_output(n_conformers=4, n_parts=2, filler_lines=1))
+    ser = parse_censo(str(tmp_path), [], ['censo.out'])
+    table = derive_censo_grid([ser, {'RootFile': 'without tables'}], [250.0, 300.0])
+    assert set(table) == {'RootFile', 'Temperature', 'CONF#', 'Gtot', 'Boltzmann Weight', 'Ensemble Free Energy'}
+    assert all(len(values) == 8 for values in table.values())
+    assert list(table['Temperature']) == [250.0] * 4 + [300.0] * 4
+    assert np.allclose(table['Gtot'][:4], ser['CENSO Tables'][-1]['Gtot'] * mc.EH2KJMOL)
+    assert np.isclose(table['Boltzmann Weight'][4:].sum(), 1)
+    assert derive_censo_grid([{'RootFile': 'without tables'}], [300.0]) is None
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+import my_constants as mc
+import synthetic
+from parse_orca_calculation import parse_orca, read_orca_output
+
+SURFACE = '''
+The Calculated Surface using the 'Actual Energy'
+   1.00000000 -800.12345678
+   1.10000000 -800.13345678
+   1.20000000 -800.12845678
+
+'''
+
+
+def orca_file(tmp_path, text, filename='calc.out'):
+    synthetic.write(tmp_path / filename, text)
+    return str(tmp_path / filename)
+
+
+def test_read_orca_output(tmp_path):
+    path = orca_file(tmp_path, synthetic.orca_output(n_atoms=4, n_cycles=3, filler_lines=5))
+    output = read_orca_output(path)
+    assert output['ORCA Output']
+    assert output['Input'][0].strip() == '! b3lyp def2-svp opt freq'
+    properties = output['Properties']
+    assert properties['Number of Atoms'] == 4
+    assert properties['Temperature'] == 298.15
+    assert properties['zpe'] == 0.15
+    assert properties['G-E(el) Energy'] == pytest.approx(0.11 * mc.EH2KJMOL)
+    assert properties['Total Dipole Moment'] == [-0.123456, 0.234567, 0.345678]
+    assert len(output['Frequencies']) == 12
+    # only the last geometry without --trajectory
+    assert len(output['Geometries']) == 1 and len(output['Geometries'][0]) == 4
+    assert output['Surface'] is None
+
+    output = read_orca_output(path, trajectory=True)
+    assert len(output['Geometries']) == len(output['Energies']) == len(output['Convergence']) == 3
+    assert properties['Single Point Energy'] == pytest.approx(output['Energies'][-1] * mc.EH2KJMOL)
+
+
+def test_surface(tmp_path):
+    text = synthetic.orca_output(n_atoms=3, n_cycles=1, frequencies=False, filler_lines=1)
+    text = text.replace('Total Dipole Moment', SURFACE + 'Total Dipole Moment')
+    output = read_orca_output(orca_file(tmp_path, text))
+    assert list(output['Surface']) == ['0', '1', '2']
+    assert output['Surface']['1'] == pytest.approx([1.1, -800.13345678 * mc.EH2KJMOL])
+
+
+def test_parse_orca(tmp_path):
+    orca_file(tmp_path, synthetic.orca_output(n_atoms=4, n_cycles=2, filler_lines=5))
+    orca_file(tmp_path, 'no ORCA output\n', 'other.out')
+    calculations = parse_orca(str(tmp_path), [], ['calc.out', 'other.out'])
+    assert len(calculations) == 1
+    ser = calculations[0]
+    assert ser['Geometry Optimization'] and ser['Frequency Calculation']
+    assert ser['Number of Atoms'] == 4 and len(ser['Elements']) == 4
+    assert np.asarray(ser['xyz Coordinates']).shape == (4, 3)
+    # the 6 zero frequencies of translation and rotation are kept, sorted
+    assert len(ser['Frequencies']) == 12 and ser['Frequencies'] == sorted(ser['Frequencies'])
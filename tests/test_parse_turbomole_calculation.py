@@ -0,0 +1,57 @@
+import pytest
+
+import my_constants as mc
+import synthetic
+from parse_turbomole_calculation import get_cosmors, get_eiger, parse_turbomole
+
+
+def cosmotherm_table(gsolv='-6.37412'):
+    """
+    out.tab of a cosmotherm run for the compound 'out' (no real output is in the repository),
+    the last column, which starts at column 80, is the free energy of solvation in kcal/mol, None: truncated line
+    """
+    columns = f"{'Nr':>4} {'Compound':<27}" + ''.join(f'{name:>12}' for name in ('H_int', 'H_MF', 'H_HB', 'H_vdW'))
+    row = f"{1:>4} {'out':<27}" + ''.join(f'{value:>12.5f}' for value in (-0.91826, -0.01722, -3.11745, -5.66601))
+    assert len(columns) == len(row) == 80
+    return '\n'.join([
+        'COSMOtherm Version 19.0.4 (Revision 5140)',
+        'Settings  job   1 : T= 298.15 K ; x(1)= 1.0000 ; Liquid= h2o',
+        columns + '       Gsolv',
+        row + (f'{gsolv:>12}' if gsolv is not None else ''),
+        '',
+    ])
+
+
+def test_cosmors(tmp_path):
+    synthetic.write(tmp_path / 'out.tab', cosmotherm_table())
+    ser = {}
+    get_cosmors(ser, str(tmp_path))
+    assert ser['CosmoRS'] == pytest.approx(-6.37412 * mc.CAL2J)
+
+
+def test_cosmors_truncated(tmp_path):
+    # like the parser before the line tables, a line without the value is an error of the directory
+    synthetic.write(tmp_path / 'out.tab', cosmotherm_table(gsolv=None))
+    with pytest.raises(ValueError):
+        get_cosmors({}, str(tmp_path))
+
+
+def test_eiger(tmp_path):
+    synthetic.write(tmp_path / 'eiger.out', '\n'.join([
+        '   Nr.   Orbital    Occupation       Energy',
+        f"{'HOMO:':<6}{21:>3}{'5a':>6}{2.0:>13.3f}{-0.30219:>11.5f} H =     -8.223 eV",
+        f"{'LUMO:':<6}{22:>3}{'6a':>6}{0.0:>13.3f}{0.01435:>11.5f} H =      0.390 eV",
+        '',
+    ]))
+    ser = {}
+    get_eiger(ser, str(tmp_path))
+    assert ser == {'HOMO': -0.30219, 'n_MO (HOMO)': 21.0, 'LUMO': 0.01435, 'n_MO (LUMO)': 22.0}
+
+
+def test_parse_turbomole(tmp_path):
+    synthetic.write_directory(str(tmp_path), synthetic.turbomole_files(n_atoms=4, n_cycles=3))
+    synthetic.write(tmp_path / 'out.tab', cosmotherm_table())
+    files = sorted(path.name for path in tmp_path.iterdir())
+    ser = parse_turbomole(str(tmp_path), [], files)
+    assert ser['CosmoRS'] == pytest.approx(-6.37412 * mc.CAL2J)
+    assert len(ser['xyz Coordinates']) == 4
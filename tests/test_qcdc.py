@@ -0,0 +1,113 @@
+import json
+import math
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+import manifest_cache
+import my_constants as mc
+import output_writers
+import qcdc
+import synthetic
+from parse_args import get_arguments
+
+
+def orca_tree(top, n_directories):
+    """Directories calc00, calc01, ... with one ORCA output each, returns their walk"""
+    walk = []
+    for i in range(n_directories):
+        root = os.path.join(top, f'calc{i:02d}')
+        synthetic.write_directory(root, {'water.out': synthetic.orca_output(n_atoms=3, n_cycles=1, filler_lines=1, seed=i)})
+        walk.append((root, [], ['water.out']))
+    return walk
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason="the workers need the patched collect_directory")
+def test_crawl_worker_died(tmp_path, monkeypatch, capsys):
+    walk = orca_tree(str(tmp_path), 12)
+    killed = walk[0][0]
+    collect_directory = qcdc.collect_directory
+
+    def dying(root, *arguments):
+        if root == killed:
+            os._exit(1)
+        return collect_directory(root, *arguments)
+
+    monkeypatch.setattr(qcdc, 'collect_directory', dying)
+    args = get_arguments(['--jobs', '2', '--batch_size', '1', '--xyz', 'off'])
+    results = [result for results in qcdc.crawl(walk, args) for result in results]
+
+    # every directory once, in the order of the walk
+    assert [result.root for result in results] == [root for root, _, _ in walk]
+    assert results[0].error.startswith('BrokenProcessPool')
+    for result in results:
+        assert (result.error is None) == bool(result.calculations)
+    # the batches in flight (2 * jobs) may be lost, a new pool parses the others
+    assert all(result.error is None for result in results[4:])
+    assert 'A worker process died' in capsys.readouterr().err
+
+
+def crawl_xyz(options):
+    """Crawls the working directory like qcdc.py, returns the names of the written xyz files"""
+    args = get_arguments(options)
+    manifest = manifest_cache.Manifest.load(args) if args.cache else None
+    os.makedirs(mc.XYZDIR, exist_ok=True)
+    for result in qcdc.iter_results(os.curdir, args, manifest):
+        assert result.error is None
+    if manifest is not None:
+        manifest.save()
+    return sorted(os.listdir(mc.XYZDIR))
+
+
+def test_xyz_of_cached_directories(tmp_path, monkeypatch):
+    """The xyz files of directories from the manifest cache are written like the ones of parsed directories"""
+    monkeypatch.chdir(tmp_path)
+    orca_tree('.', 3)
+    expected = crawl_xyz([])
+    assert len(expected) == 3
+
+    for name in expected:
+        os.remove(os.path.join(mc.XYZDIR, name))
+    assert crawl_xyz(['--cache', 'on', '--xyz', 'off']) == []
+    assert crawl_xyz(['--cache', 'on']) == expected
+
+
+def same_json(a, b):
+    """Compares JSON values, floats up to the 10 digits of pandas.to_json"""
+    if isinstance(a, float) or isinstance(b, float):
+        return a is not None and b is not None and math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(same_json(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def test_iter_calculations_json_lines(tmp_path, monkeypatch):
+    """The generator API written as JSON Lines is strict JSON and has the values of the pandas JSON output"""
+    pytest.importorskip('pandas')
+    monkeypatch.chdir(tmp_path)
+    synthetic.write_directory('orca', {'water.out': synthetic.orca_output(n_atoms=4, n_cycles=3, filler_lines=1)})
+    synthetic.write_directory('turbomole', synthetic.turbomole_files(n_atoms=3, n_cycles=2))
+    synthetic.write_directory('censo', {'censo.out': synthetic.censo_output(n_conformers=3, n_parts=1, filler_lines=1)})
+    options = get_arguments(['--xyz', 'off', '--turbomole', 'on', '--censo', 'on', '--trajectory', 'on'])
+    calculations = list(qcdc.iter_calculations('.', options))
+    assert sorted(calculation['Type of Calculation'] for calculation in calculations) == ['censo', 'orca', 'turbomole']
+    # NaN in an array, like a failed value of a trajectory
+    calculations[0]['Trajectory Energies'] = np.array([np.nan, -1.0])
+
+    exclude = output_writers.MEMORY_COLUMNS
+    options.format = 'jsonl'
+    path = qcdc.rewrite_data(calculations, options, exclude)
+    with open(path) as file:
+        lines = [json.loads(line, parse_constant=lambda constant: pytest.fail(f"{constant} in {path}")) for line in file]
+    options.format = 'json'
+    path, _ = output_writers.write_records(calculations, 'data', options, exclude)
+    with open(path) as file:
+        columns = json.load(file)
+
+    assert len(lines) == len(calculations)
+    for i, line in enumerate(lines):
+        for key, value in line.items():
+            assert same_json(value, columns[key][str(i)]), key
+    assert lines[0]['Trajectory Energies'] == [None, -1.0]
@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pytest
+
+from xyz_archive import ARCHIVE_FILE, XYZArchive, read_geometry
+
+WATER = (['O', 'H', 'H'], [[0.0, 0.0, 0.1173], [0.0, 0.7572, -0.4692], [0.0, -0.7572, -0.4692]])
+
+
+def test_write_read(tmp_path):
+    directory = str(tmp_path / 'xyz')
+    name = './xyz/orca_opt_"water".xyz'
+    with XYZArchive(directory) as archive:
+        assert archive.write(name, *WATER, energy=-76.4)
+        assert not archive.write(name, *WATER, energy=-76.4)
+        assert archive.write('./xyz/other.xyz', *WATER)
+        assert (archive.written, archive.skipped) == (2, 1)
+
+    elements, coordinates, comment = read_geometry(name, directory)
+    assert elements == WATER[0]
+    assert np.allclose(coordinates, WATER[1])
+    assert 'energy=-76.4000000000' in comment
+    with XYZArchive(directory) as archive:
+        assert sorted(archive.names()) == sorted([name, './xyz/other.xyz'])
+        with pytest.raises(KeyError):
+            archive.read('./xyz/missing.xyz')
+
+
+def test_changed_and_compact(tmp_path):
+    directory = str(tmp_path / 'xyz')
+    moved = np.array(WATER[1]) + 0.1
+    with XYZArchive(directory) as archive:
+        archive.write('./xyz/a.xyz', *WATER)
+        archive.write('./xyz/a.xyz', WATER[0], moved)
+        archive.file.flush()
+        size = os.path.getsize(os.path.join(directory, ARCHIVE_FILE))
+        archive.compact()
+        assert os.path.getsize(os.path.join(directory, ARCHIVE_FILE)) < size
+        assert np.allclose(archive.read('./xyz/a.xyz')[1], moved)
+
+
+def test_interrupted(tmp_path):
+    """Frames written after the last saved index are found again, an incomplete frame is cut off"""
+    directory = str(tmp_path / 'xyz')
+    with XYZArchive(directory) as archive:
+        archive.write('./xyz/a.xyz', *WATER)
+    archive = XYZArchive(directory)
+    archive.write('./xyz/b.xyz', *WATER)
+    archive.file.write(b'3\nProperties=species:S:1:pos:R:3 name="./xyz/c.xyz"\nO 0.0')
+    archive.file.close()
+
+    with XYZArchive(directory) as archive:
+        assert sorted(archive.names()) == ['./xyz/a.xyz', './xyz/b.xyz']
+        assert np.allclose(archive.read('./xyz/b.xyz')[1], WATER[1])
@@ -0,0 +1,403 @@
+import numpy as np
+from physical_constants import h, k, c, N_A, R, pi, milli
+
+import my_constants as mc
+
+# Vectorized thermochemistry for many molecules at once.
+# Atoms and frequencies of all molecules are concatenated into flat arrays,
+# the offsets array holds the start of every molecule (and the total length as last element).
+# Sums over the atoms or frequencies of a molecule are done with np.bincount over the molecule index.
+# The formulas are the same as in common_functions (derive_data and the partition functions),
+# but the partition functions are combined in log space, such that large molecules do not overflow.
+
+
+def pack_ragged(arrays, dtype=float):
+    """
+    Concatenates a list of arrays with different lengths.
+    Returns the flat array and the offsets (length len(arrays)+1).
+    """
+    lengths = np.array([len(array) for array in arrays], dtype=np.int64)
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    if len(arrays) == 0:
+        return np.zeros(0, dtype=dtype), offsets
+    return np.concatenate([np.asarray(array, dtype=dtype) for array in arrays]), offsets
+
+
+def segment_index(offsets):
+    """Returns the molecule index of every element of a flat array"""
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+
+def segment_sum(values, index, n_segments):
+    """Sums the values of every molecule, empty molecules give 0"""
+    return np.bincount(index, weights=values, minlength=n_segments)
+
+
+def vibrational_log_terms(frequencies, temperature=None):
+    """
+    takes array of positive non-zero frequencies and
+    returns the logarithm of the vibrational partition function of every mode
+    """
+    if temperature is None:
+        temperature = mc.TEMPERATURE
+    return -np.log(1 - np.exp(-frequencies*100 *c*h/k/temperature))
+
+
+def vibrational_log_block(frequencies, temperatures):
+    """
+    Same as vibrational_log_terms for a column of frequencies and a row of temperatures,
+    evaluated in place, which halves the time for the large blocks of thermochemistry_grid
+    """
+    terms = frequencies * (-100*c*h/k / temperatures)
+    np.exp(terms, out=terms)
+    np.subtract(1, terms, out=terms)
+    np.log(terms, out=terms)
+    return np.negative(terms, out=terms)
+
+
+def grimme_terms(freq_cm, temperature=None):
+    """
+    takes np array with positive vibrational frequencies in wavenumbers and
+    returns the contribution of every mode to the qRRHO correction (see common_functions.calc_grimme_short)
+    """
+    if temperature is None:
+        temperature = mc.TEMPERATURE
+    Bav = 1e-44 #kg*m^2
+    freq_s = freq_cm*100.0*c #1/s
+    xx = freq_s*h/k/temperature #no unit
+    Sv = xx * (1.0 / (np.exp(xx)-1.0))  -  np.log(1.0 - np.exp(-xx)) #no unit
+    mue = h/(8.0 * pi**2.0 * freq_s) #J*s^2 = kgm^2
+    w_damp = 1.0 / (1.0 + (1e2/freq_cm)**4) #m^4
+    S_final = w_damp*R*Sv + ( (1.0-w_damp) *R*(1 + np.log(8.0*pi*pi*pi*mue*Bav /(mue + Bav) *k*temperature/h/h) ) /2) #m^4*J/mol/K
+    return (S_final - R*Sv )*milli*temperature #m^4*kJ/mol
+
+
+def linear_flags(coordinates, atom_offsets):
+    """
+    Vectorized version of common_functions.is_molecule_linear for all molecules.
+    Returns an object array with True (less than 3 atoms), False (bent) or None (all atoms on a line).
+    """
+    n_molecules = len(atom_offsets) - 1
+    n_atoms = np.diff(atom_offsets)
+    index = segment_index(atom_offsets)
+    # vectors between consecutive atoms of the same molecule
+    vectors = coordinates[1:] - coordinates[:-1]
+    vector_index = index[1:]
+    vectors = vectors[index[1:] == index[:-1]]
+    vector_index = vector_index[index[1:] == index[:-1]]
+    # cross products of consecutive vectors of the same molecule
+    same = vector_index[1:] == vector_index[:-1]
+    cross = np.cross(vectors[:-1][same], vectors[1:][same])
+    bent = np.zeros(n_molecules, dtype=bool)
+    if len(cross):
+        not_zero = ~np.all(np.isclose(cross, 0), axis=1)
+        bent[vector_index[1:][same][not_zero]] = True
+    flags = np.full(n_molecules, None, dtype=object)
+    flags[bent] = False
+    flags[n_atoms < 3] = True
+    return flags
+
+
+class ThermoContext:
+    """
+    Conditions of the thermochemistry.
+    Values which are not given are taken from config.yml when the context is created,
+    not when the module is imported.
+
+    temperature : K
+    pressure : Pa, gives the volume of the ideal gas
+    moles : amount of substance
+    liquid_volume : m^3, volume for the chemical potential in liquids
+    qrrho_cutoff : cm-1, modes below are corrected by the qRRHO approach
+    sign_inversion_threshold : cm-1, imaginary modes above -threshold are used with inverted sign
+    """
+
+    def __init__(self, temperature=None, pressure=None, moles=None, liquid_volume=1e-3,
+                 qrrho_cutoff=None, sign_inversion_threshold=None):
+        self.temperature = mc.TEMPERATURE if temperature is None else temperature
+        self.pressure = mc.PRESSURE if pressure is None else pressure
+        self.moles = mc.MOLES if moles is None else moles
+        self.liquid_volume = liquid_volume
+        self.qrrho_cutoff = mc.QRRHO_CUTOFF if qrrho_cutoff is None else qrrho_cutoff
+        self.sign_inversion_threshold = mc.SIGN_INV_THR if sign_inversion_threshold is None else sign_inversion_threshold
+
+    def __repr__(self):
+        return (f"ThermoContext(temperature={self.temperature}, pressure={self.pressure}, moles={self.moles}, "
+                f"liquid_volume={self.liquid_volume}, qrrho_cutoff={self.qrrho_cutoff}, "
+                f"sign_inversion_threshold={self.sign_inversion_threshold})")
+
+    def volume(self, temperature=None, pressure=None):
+        """Volume of the ideal gas (m^3), temperature and pressure can be arrays"""
+        temperature = self.temperature if temperature is None else temperature
+        pressure = self.pressure if pressure is None else pressure
+        return self.moles * R * temperature / pressure
+
+
+def molecular_properties(masses, coordinates, atom_offsets):
+    """
+    Temperature independent properties of every molecule:
+    molecular mass, single atom and linear flags and the moments of inertia (amu*bohr^2).
+    """
+    n_molecules = len(atom_offsets) - 1
+    atom_index = segment_index(atom_offsets)
+    columns = {}
+    molar_mass = segment_sum(masses, atom_index, n_molecules)
+    columns[mc.M_MASS] = molar_mass
+    columns['Single Atom'] = np.diff(atom_offsets) == 1
+    columns['Linear Molecule'] = linear_flags(coordinates, atom_offsets)
+
+    # moments of inertia from the centralized coordinates
+    bohr_coordinates = coordinates * mc.ANGSTROM2BOHR
+    center = np.stack([segment_sum(masses * bohr_coordinates[:, axis], atom_index, n_molecules) for axis in range(3)], axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        center /= molar_mass[:, None]
+    central = bohr_coordinates - center[atom_index]
+    squares = central * central
+    columns['I_xx'] = segment_sum(masses * (squares[:, 1] + squares[:, 2]), atom_index, n_molecules)
+    columns['I_yy'] = segment_sum(masses * (squares[:, 0] + squares[:, 2]), atom_index, n_molecules)
+    columns['I_zz'] = segment_sum(masses * (squares[:, 0] + squares[:, 1]), atom_index, n_molecules)
+    return columns
+
+
+def mode_masks(frequencies, context):
+    """
+    Returns |frequencies| and the masks of the nonzero modes, the modes of the normal variant,
+    the modes of the sign inverted variant and the modes below the qRRHO cutoff.
+    """
+    magnitudes = np.abs(frequencies)
+    nonzero = magnitudes > 0
+    positive = frequencies > 0
+    sign_inverted = (frequencies > -np.abs(context.sign_inversion_threshold)) & nonzero
+    low = nonzero & (magnitudes < context.qrrho_cutoff)
+    return magnitudes, nonzero, positive, sign_inverted, low
+
+
+def thermochemistry_batch(masses, coordinates, atom_offsets, frequencies, frequency_offsets, sigmas, context=None):
+    """
+    Calculates the thermochemistry of many molecules at once.
+
+    masses : flat array with the mass of every atom [g/mol]
+    coordinates : flat array (n_atoms_total, 3) in Angstroem
+    atom_offsets : start of the atoms of every molecule, see pack_ragged
+    frequencies : flat array of all frequencies [cm-1]
+    frequency_offsets : start of the frequencies of every molecule
+    sigmas : symmetry number of every molecule
+    context : ThermoContext, default: conditions of config.yml
+
+    Returns a dictionary of arrays with one value per molecule, the keys are the columns of derive_data.
+    The values of single atoms and linear molecules are calculated as well, assign_columns skips them.
+    """
+    if context is None:
+        context = ThermoContext()
+    temperature = context.temperature
+    volume = context.volume()
+    n_part = context.moles
+    n_molecules = len(atom_offsets) - 1
+    frequency_index = segment_index(frequency_offsets)
+    sigmas = np.asarray(sigmas, dtype=float)
+    columns = molecular_properties(masses, coordinates, atom_offsets)
+
+    # translational partition functions
+    mass = columns[mc.M_MASS]/1000/N_A #kg
+    columns['Translational Partition Function'] = (mass*temperature*2*pi*k/h/h)**1.5 * volume /n_part/N_A
+    columns['Translational Partition Function for Liquids'] = (mass*temperature*2*pi*k/h/h)**1.5 * context.liquid_volume /n_part/N_A
+    log_translation = 1.5*np.log(mass*temperature*2*pi*k/h/h) + np.log(volume/n_part/N_A)
+    log_translation_liquid = 1.5*np.log(mass*temperature*2*pi*k/h/h) + np.log(context.liquid_volume/n_part/N_A)
+
+    # rotational partition function
+    momi_product = columns['I_xx'] * columns['I_yy'] * columns['I_zz']
+    columns['Rotational Partition Function'] = (temperature*temperature*temperature * momi_product)**0.5 / sigmas * mc.CONSTANTX
+    with np.errstate(divide='ignore'):
+        log_rotation = 0.5*np.log(temperature*temperature*temperature * momi_product) - np.log(sigmas) + np.log(mc.CONSTANTX)
+
+    # every mode is evaluated once for |frequency|, the masks select the modes of the normal and the sign inverted variant
+    magnitudes, nonzero, positive, sign_inverted, low = mode_masks(frequencies, context)
+    log_vibration = np.zeros(len(frequencies))
+    grimme = np.zeros(len(frequencies))
+    log_vibration[nonzero] = vibrational_log_terms(magnitudes[nonzero], temperature)
+    grimme[low] = grimme_terms(magnitudes[low], temperature)
+
+    variants = (
+        ('', positive),
+        (' (sign inverted)', sign_inverted),
+    )
+    for suffix, mask in variants:
+        zpe = 0.5 * segment_sum(np.where(mask, magnitudes, 0.0), frequency_index, n_molecules) * mc.WAVENUMBERS2KJMOL
+        log_q_vibration = segment_sum(np.where(mask, log_vibration, 0.0), frequency_index, n_molecules)
+        qrrho = segment_sum(np.where(mask & low, grimme, 0.0), frequency_index, n_molecules)
+        if not suffix:
+            with np.errstate(over='ignore'):
+                columns['Vibrational Partition Function'] = np.exp(log_q_vibration)
+            columns['Zero Point Energy'] = zpe
+        columns['Chemical Potential' + suffix] = zpe - R*temperature*(log_translation + log_q_vibration + log_rotation)/1000 - qrrho
+        columns['Chemical Potential for Liquids' + suffix] = zpe - R*temperature*(log_translation_liquid + log_q_vibration + log_rotation)/1000 - qrrho
+        columns['qRRHO' + suffix] = qrrho
+
+    return columns
+
+
+# Number of matrix elements (modes x temperatures) evaluated at once in thermochemistry_grid
+GRID_CHUNK_ELEMENTS = 1 << 23
+
+
+def variant_sums(matrix, values, temperatures, terms, chunk_elements=GRID_CHUNK_ELEMENTS):
+    """
+    Evaluates terms(values, temperatures) for all modes and temperatures in chunks of temperatures
+    and sums them per molecule and variant with the sparse matrix.
+    Returns an array (matrix rows, n_temperatures).
+    """
+    sums = np.zeros((matrix.shape[0], len(temperatures)))
+    if len(values) == 0:
+        return sums
+    step = max(1, chunk_elements // len(values))
+    for start in range(0, len(temperatures), step):
+        chunk = temperatures[start:start + step]
+        sums[:, start:start + step] = matrix @ terms(values[:, None], chunk[None, :])
+    return sums
+
+
+def variant_matrix(index, masks, n_molecules):
+    """
+    Sparse matrix (len(masks) * n_molecules, len(index)), which sums the selected modes of every molecule.
+    The rows of the first mask come first.
+    """
+    from scipy.sparse import csr_matrix
+    rows = np.concatenate([index[mask] + i*n_molecules for i, mask in enumerate(masks)])
+    columns = np.concatenate([np.flatnonzero(mask) for mask in masks])
+    return csr_matrix((np.ones(len(rows)), (rows, columns)), shape=(len(masks)*n_molecules, len(index)))
+
+
+def thermochemistry_grid(masses, coordinates, atom_offsets, frequencies, frequency_offsets, sigmas,
+                         temperatures, pressures, context=None, chunk_elements=GRID_CHUNK_ELEMENTS):
+    """
+    Calculates the thermochemistry of many molecules for every pair of temperatures and pressures.
+    The arguments are the same as for thermochemistry_batch, the temperature and pressure of the context
+    are replaced by the arrays temperatures (K) and pressures (Pa).
+
+    Returns a dictionary of arrays with shape (n_molecules, n_temperatures, n_pressures).
+    The values of single atoms and linear molecules are NaN, because derive_data does not set them.
+    """
+    if context is None:
+        context = ThermoContext()
+    temperatures = np.asarray(temperatures, dtype=float)
+    pressures = np.asarray(pressures, dtype=float)
+    n_molecules = len(atom_offsets) - 1
+    shape = (n_molecules, len(temperatures), len(pressures))
+    n_part = context.moles
+    sigmas = np.asarray(sigmas, dtype=float)
+    properties = molecular_properties(masses, coordinates, atom_offsets)
+    skipped = properties['Single Atom'] | np.array([bool(flag) for flag in properties['Linear Molecule']], dtype=bool)
+    columns = {}
+
+    # translational partition functions, (molecules, temperatures, pressures)
+    mass = properties[mc.M_MASS]/1000/N_A #kg
+    log_thermal = 1.5*np.log(mass[:, None]*temperatures[None, :]*2*pi*k/h/h)
+    log_volume = np.log(context.volume(temperatures[:, None], pressures[None, :])/n_part/N_A)
+    log_translation = log_thermal[:, :, None] + log_volume[None, :, :]
+    log_translation_liquid = log_thermal + np.log(context.liquid_volume/n_part/N_A)
+
+    # rotational partition function, (molecules, temperatures)
+    momi_product = properties['I_xx'] * properties['I_yy'] * properties['I_zz']
+    with np.errstate(divide='ignore'):
+        log_rotation = (0.5*np.log(temperatures[None, :]**3 * momi_product[:, None])
+                        - np.log(sigmas)[:, None] + np.log(mc.CONSTANTX))
+
+    # vibrations: the terms of all nonzero modes are evaluated once per temperature,
+    # the sparse matrix sums the modes of the normal (first n_molecules rows) and the sign inverted variant
+    magnitudes, nonzero, positive, sign_inverted, low = mode_masks(frequencies, context)
+    frequency_index = segment_index(frequency_offsets)
+    selected = np.flatnonzero(nonzero)
+    matrix = variant_matrix(frequency_index[selected], (positive[selected], sign_inverted[selected]), n_molecules)
+    log_q_vibration = variant_sums(matrix, magnitudes[selected], temperatures, vibrational_log_block, chunk_elements)
+    selected = np.flatnonzero(low)
+    matrix = variant_matrix(frequency_index[selected], (positive[selected], sign_inverted[selected]), n_molecules)
+    qrrho = variant_sums(matrix, magnitudes[selected], temperatures, grimme_terms, chunk_elements)
+
+    with np.errstate(over='ignore'):
+        columns['Translational Partition Function'] = np.exp(log_translation)
+        columns['Rotational Partition Function'] = np.broadcast_to(np.exp(log_rotation)[:, :, None], shape)
+        columns['Vibrational Partition Function'] = np.broadcast_to(np.exp(log_q_vibration[:n_molecules])[:, :, None], shape)
+    RT = R*temperatures[None, :, None]/1000
+    variants = (
+        ('', slice(0, n_molecules), positive),
+        (' (sign inverted)', slice(n_molecules, 2*n_molecules), sign_inverted),
+    )
+    for suffix, rows, mask in variants:
+        zpe = 0.5 * segment_sum(np.where(mask, magnitudes, 0.0), frequency_index, n_molecules) * mc.WAVENUMBERS2KJMOL
+        log_q = log_q_vibration[rows][:, :, None] + log_rotation[:, :, None]
+        correction = qrrho[rows][:, :, None]
+        if not suffix:
+            columns['Zero Point Energy'] = np.broadcast_to(zpe[:, None, None], shape)
+        columns['Chemical Potential' + suffix] = zpe[:, None, None] - RT*(log_translation + log_q) - correction
+        columns['Chemical Potential for Liquids' + suffix] = np.broadcast_to(
+            zpe[:, None, None] - RT*(log_translation_liquid[:, :, None] + log_q) - correction, shape)
+        columns['qRRHO' + suffix] = np.broadcast_to(correction, shape)
+
+    for key, values in columns.items():
+        values = np.array(values, dtype=float)
+        values[skipped] = np.nan
+        columns[key] = values
+    return columns
+
+
+def grid_table(columns, temperatures, pressures):
+    """
+    Flattens the result of thermochemistry_grid into a long table (molecule x temperature x pressure).
+    Returns a dictionary of flat arrays with the additional columns 'Molecule', 'Temperature' and 'Pressure'.
+    """
+    shape = next(iter(columns.values())).shape
+    molecule, temperature, pressure = np.meshgrid(
+        np.arange(shape[0]), np.asarray(temperatures, dtype=float), np.asarray(pressures, dtype=float), indexing='ij')
+    table = {'Molecule': molecule.ravel(), 'Temperature': temperature.ravel(), 'Pressure': pressure.ravel()}
+    for key, values in columns.items():
+        table[key] = values.reshape(-1)
+    return table
+
+
+# Order in which derive_data writes the columns, after the molar mass (mc.M_MASS)
+PARTITION_COLUMNS = ['Translational Partition Function', 'Translational Partition Function for Liquids']
+MOLECULE_COLUMNS = [
+    'I_xx', 'I_yy', 'I_zz',
+    'Rotational Partition Function', 'Vibrational Partition Function', 'Zero Point Energy',
+    'Chemical Potential', 'Chemical Potential for Liquids', 'qRRHO',
+    'Chemical Potential (sign inverted)', 'Chemical Potential for Liquids (sign inverted)', 'qRRHO (sign inverted)',
+]
+
+
+def assign_columns(ser, columns, i):
+    """Writes the results of molecule i into ser, with the same keys and early exits as derive_data"""
+    for key in [mc.M_MASS, *PARTITION_COLUMNS]:
+        ser[key] = columns[key][i]
+    if columns['Single Atom'][i]:
+        ser['Single Atom'] = True
+        return
+    ser['Linear Molecule'] = columns['Linear Molecule'][i]
+    if ser['Linear Molecule']:
+        return
+    for key in MOLECULE_COLUMNS:
+        ser[key] = columns[key][i]
+
+
+def kb_hartree():
+    """Boltzmann constant in Eh/K, with the conversion factor of config.yml"""
+    return R * milli / mc.EH2KJMOL
+
+
+def boltzmann_ensemble(free_energies, temperatures):
+    """
+    Boltzmann populations and free energy of an ensemble of conformers for every temperature at once.
+    The free energies (Eh) of the conformers are taken as independent of the temperature (K).
+    Returns the populations (temperatures x conformers) and the ensemble free energies
+    G = G_min - kT ln(sum exp(-(G_i - G_min)/kT)) in Eh (temperatures).
+    """
+    energies = np.asarray(free_energies, dtype=float)
+    kt = kb_hartree() * np.atleast_1d(np.asarray(temperatures, dtype=float))
+    if energies.size == 0:
+        return np.zeros((len(kt), 0)), np.full(len(kt), np.nan)
+    lowest = energies.min()
+    weights = np.multiply.outer(1 / kt, lowest - energies)
+    np.exp(weights, out=weights)
+    sums = weights.sum(axis=1)
+    weights /= sums[:, None]
+    return weights, lowest - kt * np.log(sums)
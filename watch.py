@@ -0,0 +1,214 @@
+import os
+import time
+
+import file_access
+import manifest_cache
+import profiling
+
+# Watch mode (--watch on): after the first crawl the directories are polled and only the changed ones are parsed again.
+#
+# Every directory of the walk is kept with its mtime and listing. A poll stats the directories only,
+# a directory whose mtime changed (files or directories created, removed or renamed) is listed again,
+# new subdirectories are walked and removed ones are dropped with their calculations.
+# Changed directories are pending: the signatures (size, mtime, inode) of their files are compared in every poll,
+# a directory is parsed after its files did not change for --watch_settle seconds (debounce of files being written),
+# if they differ from the signature of its entry in the manifest (the last parse) and its calculations are complete:
+#   ORCA        outputs with the banner terminated (normally or by error)
+#   TURBOMOLE   control together with energy or vibspectrum
+#   CENSO       censo.out ends with 'CENSO all done!'
+# Directories of running jobs stay pending (also found in the first crawl), they are parsed again when they are complete,
+# or if they did not change for STALE_SECONDS (killed jobs). Appending to an output does not change the mtime
+# of its directory, therefore complete directories leave the pending ones and are only looked at again,
+# when their listing changes. Polling works on network file systems (NFS, Lustre), where inotify sees no remote changes.
+# The outputs of qcdc itself (data.<format>, the store, ...) are not part of the listings, they do not trigger a parse.
+
+# Outputs which did not change for this time are parsed, even if they are not complete (s)
+STALE_SECONDS = 3600
+# Directories modified this short before they were listed are listed again, coarse mtimes of network file systems (ns)
+MTIME_SLACK = 2 * 10**9
+# The end of ORCA outputs in which the termination is searched (bytes)
+TAIL_BYTES = 16 * 1024
+ORCA_BANNER = '* O   R   C   A *'
+ORCA_TERMINATIONS = ('ORCA TERMINATED NORMALLY', 'ORCA finished by error termination', 'aborting the run')
+TURBOMOLE_RESULTS = ('energy', 'vibspectrum')
+
+
+def orca_running(file_path):
+    """True for ORCA outputs without a termination message, compressed outputs are finished"""
+    if file_access.compression_of(file_path) is not None:
+        return False
+    with file_access.mapped(file_path) as buffer:
+        if buffer.find(ORCA_BANNER.encode(), 0, file_access.HEAD_BYTES) == -1:
+            return False
+        start = max(0, len(buffer) - TAIL_BYTES)
+        return not any(buffer.find(marker.encode(), start) != -1 for marker in ORCA_TERMINATIONS)
+
+
+def censo_running(file_path):
+    """True for CENSO outputs without the final message, compressed outputs are finished"""
+    from parse_censo_calculation import CENSO_DONE
+
+    if file_access.compression_of(file_path) is not None:
+        return False
+    with file_access.mapped(file_path) as buffer:
+        return buffer[-len(CENSO_DONE):] != CENSO_DONE.encode()
+
+
+def is_complete(root, files, args):
+    """
+    Checks the calculations of a directory of the enabled parsers, False if one of them is still running.
+    Compressed files are complete. Files which vanished in the meantime are skipped.
+    """
+    try:
+        if args.orca:
+            from parse_orca_calculation import filter_orca_candidates
+            if any(orca_running(os.path.join(root, filename)) for filename in filter_orca_candidates(files)):
+                return False
+        if args.turbomole and 'control' in files and not any(filename in files for filename in TURBOMOLE_RESULTS):
+            return False
+        if args.censo and 'censo.out' in files and censo_running(os.path.join(root, 'censo.out')):
+            return False
+    except OSError:
+        pass
+    return True
+
+
+class Listing:
+    """mtime (ns, None: list again) and the listing of a directory on disk"""
+
+    def __init__(self, mtime, dirs, files):
+        self.mtime = mtime
+        self.dirs = dirs
+        self.files = files
+
+
+class Pending:
+    """A changed directory: signature of its files, time of the last change and the signature which was parsed"""
+
+    def __init__(self, since, parsed=None):
+        self.signature = None
+        self.since = since
+        self.parsed = parsed
+
+
+class Watcher:
+    """
+    Directories of the walk below top and the pending ones, see above.
+    entries : entries of the manifest (root -> signature, calculations, ...), which are updated by the caller.
+    own_files : paths of the outputs of qcdc, which are left out of the listings.
+
+    watcher = Watcher(top, args, rules, manifest.entries, own_files)
+    for root, dirs, files in watcher.track(walk): ...  # the first crawl
+    watcher.start()
+    ready, removed = watcher.poll()                    # every --watch_interval seconds
+    """
+
+    def __init__(self, top, args, rules=None, entries=None, own_files=()):
+        self.top = top
+        self.args = args
+        self.rules = rules
+        self.entries = entries if entries is not None else {}
+        self.own_files = {}
+        for path in own_files:
+            directory, filename = os.path.split(os.path.normpath(path))
+            self.own_files.setdefault(directory or os.curdir, set()).add(filename)
+        self.listings = {} # root -> Listing
+        self.pending = {} # root -> Pending
+
+    def track(self, walk):
+        """Yields the (root, dirs, files) of the walk and keeps their listings"""
+        iterator = iter(walk)
+        while True:
+            listed = time.time_ns()
+            try:
+                root, dirs, files = next(iterator)
+            except StopIteration:
+                return
+            try:
+                mtime = os.stat(root).st_mtime_ns
+            except OSError:
+                mtime = None
+            # modified while or shortly before it was listed: list again in the next poll
+            if mtime is not None and mtime >= listed - MTIME_SLACK:
+                mtime = None
+            own_files = self.own_files.get(os.path.normpath(root)) if self.own_files else None
+            if own_files:
+                files = [filename for filename in files if filename not in own_files]
+            self.listings[root] = Listing(mtime, list(dirs), files)
+            yield root, dirs, files
+
+    def start(self):
+        """Directories of running calculations of the first crawl become pending"""
+        now = time.time()
+        for root, listing in self.listings.items():
+            if not is_complete(root, listing.files, self.args):
+                pending = self.pending[root] = Pending(now)
+                pending.signature = pending.parsed = manifest_cache.directory_signature(root, listing.files)
+
+    def relist(self, root):
+        """Lists a changed directory and walks through its new subdirectories, which become pending"""
+        relative = os.path.relpath(root, self.top)
+        relative = '' if relative == os.curdir else relative.replace(os.sep, '/')
+        depth = relative.count('/') + 1 if relative else 0
+
+        import scanner
+        walk = scanner.scan(root, self.rules, self.args.max_depth, self.args.follow_symlinks, relative, depth)
+        now = time.time()
+        old_dirs = self.listings[root].dirs if root in self.listings else []
+        removed = []
+        for path, dirs, files in self.track(walk):
+            if path == root:
+                removed = [os.path.join(root, name) for name in old_dirs if name not in dirs]
+            if path not in self.pending:
+                entry = self.entries.get(path)
+                self.pending[path] = Pending(now, entry['signature'] if entry is not None else None)
+            # the known subdirectories are polled themselves
+            dirs[:] = [name for name in dirs if os.path.join(path, name) not in self.listings]
+        return removed
+
+    def remove(self, root):
+        """Forgets a directory and its subdirectories, returns their roots"""
+        prefix = root + os.sep
+        roots = [path for path in self.listings if path == root or path.startswith(prefix)]
+        for path in roots:
+            self.listings.pop(path, None)
+            self.pending.pop(path, None)
+        return roots
+
+    def poll(self):
+        """
+        Stats the directories and the files of the pending ones.
+        Returns the (root, dirs, files) of the directories to be parsed and the roots of removed directories.
+        """
+        removed = []
+        for root in list(self.listings):
+            listing = self.listings.get(root)
+            if listing is None:
+                continue
+            try:
+                mtime = os.stat(root).st_mtime_ns
+            except OSError:
+                removed += self.remove(root)
+                continue
+            if mtime != listing.mtime:
+                for path in self.relist(root):
+                    removed += self.remove(path)
+        profiling.profiler.count('watch directories polled', len(self.listings))
+
+        now = time.time()
+        ready = []
+        for root, pending in list(self.pending.items()):
+            listing = self.listings[root]
+            signature = manifest_cache.directory_signature(root, listing.files)
+            if signature != pending.signature:
+                pending.signature, pending.since = signature, now
+                continue
+            if now - pending.since < self.args.watch_settle:
+                continue
+            complete = is_complete(root, listing.files, self.args)
+            if signature != pending.parsed and (complete or now - pending.since >= STALE_SECONDS):
+                ready.append((root, listing.dirs, listing.files))
+                pending.parsed = signature
+            if complete:
+                del self.pending[root]
+        return ready, removed
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+# All geometries in one multi-frame extxyz file instead of one small file per calculation.
+# The index (JSON) maps the 'xyz File Name' of a calculation to the byte offset and length of its frame,
+# such that a frame is read with one seek. A changed geometry is appended and the index points to the new frame,
+# the old frame stays in the file until compact().
+# If the run was interrupted before the index was saved, the frames behind the indexed size are scanned on opening.
+
+ARCHIVE_FILE = 'geometries.extxyz'
+INDEX_FILE = 'geometries.index.json'
+
+NAME_PATTERN = re.compile(r'name="((?:[^"\\]|\\.)*)"')
+
+
+def quote(text):
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def unquote(text):
+    return re.sub(r'\\(.)', r'\1', text)
+
+
+def format_frame(name, elements, coordinates, energy=None):
+    """Returns the extxyz frame of a geometry, energy in Eh is written to the comment line"""
+    coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 3)
+    if len(elements) != len(coordinates):
+        raise ValueError("The number of elements must match the number of coordinate sets.")
+    comment = f'Properties=species:S:1:pos:R:3 name={quote(name)}'
+    if energy is not None:
+        comment += f' energy={energy:.10f}'
+    lines = [str(len(elements)), comment]
+    lines += [f"{element} {x:.6f} {y:.6f} {z:.6f}" for element, (x, y, z) in zip(elements, coordinates)]
+    return '\n'.join(lines) + '\n'
+
+
+def parse_frame(text):
+    """Returns the elements, the Nx3 coordinates and the comment line of a frame"""
+    lines = text.splitlines()
+    n_atoms = int(lines[0])
+    rows = [line.split() for line in lines[2:2 + n_atoms]]
+    elements = [row[0] for row in rows]
+    coordinates = np.array([row[1:4] for row in rows], dtype=float).reshape(-1, 3)
+    return elements, coordinates, lines[1]
+
+
+def digest(frame):
+    return hashlib.blake2b(frame, digest_size=8).hexdigest()
+
+
+class XYZArchive:
+    """
+    Multi-frame extxyz archive with a byte offset index.
+
+    with XYZArchive('xyz') as archive:
+        archive.write('./xyz/orca_opt_water.xyz', elements, coordinates, energy)
+        elements, coordinates, comment = archive.read('./xyz/orca_opt_water.xyz')
+
+    skip_unchanged : frames which are identical to the indexed frame of the same name are not appended again
+    """
+
+    def __init__(self, directory, skip_unchanged=True):
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = os.path.join(directory, ARCHIVE_FILE)
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.skip_unchanged = skip_unchanged
+        self.written = 0
+        self.skipped = 0
+        self.changed = False
+        self.file = open(self.path, 'a+b')
+        self.index = self.load_index()
+
+    def load_index(self):
+        """Reads the index and adds the frames which were appended after it was saved"""
+        index, indexed_size = {}, 0
+        try:
+            with open(self.index_path, 'r') as file:
+                content = json.load(file)
+            index, indexed_size = content['frames'], content['size']
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        size = os.path.getsize(self.path)
+        if indexed_size > size:
+            index, indexed_size = {}, 0
+        if indexed_size < size:
+            self.scan(indexed_size, index)
+            self.changed = True
+        return index
+
+    def scan(self, start, index):
+        """
+        Adds the frames from the byte offset start to the end of the archive to the index,
+        an incomplete frame at the end (interrupted write) is cut off.
+        """
+        self.file.seek(start)
+        offset = start
+        while True:
+            header = self.file.readline()
+            if not header.strip():
+                break
+            comment = self.file.readline()
+            frame = header + comment
+            try:
+                for _ in range(int(header)):
+                    frame += self.file.readline()
+            except ValueError:
+                break
+            if not frame.endswith(b'\n') or frame.count(b'\n') != int(header) + 2:
+                break
+            match = NAME_PATTERN.search(comment.decode())
+            if match:
+                index[unquote(match.group(1))] = [offset, len(frame), digest(frame)]
+            offset += len(frame)
+        if offset < os.path.getsize(self.path):
+            self.file.truncate(offset)
+
+    def write(self, name, elements, coordinates, energy=None):
+        """Appends the geometry, returns False if the unchanged frame was skipped"""
+        frame = format_frame(name, elements, coordinates, energy).encode()
+        frame_digest = digest(frame)
+        entry = self.index.get(name)
+        if self.skip_unchanged and entry is not None and entry[2] == frame_digest:
+            self.skipped += 1
+            return False
+        self.file.seek(0, os.SEEK_END)
+        offset = self.file.tell()
+        self.file.write(frame)
+        self.index[name] = [offset, len(frame), frame_digest]
+        self.written += 1
+        self.changed = True
+        return True
+
+    def read(self, name):
+        """Returns the elements, coordinates and comment line of the geometry, KeyError if it is not archived"""
+        offset, length, _ = self.index[name]
+        self.file.flush()
+        self.file.seek(offset)
+        return parse_frame(self.file.read(length).decode())
+
+    def names(self):
+        return list(self.index)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def save_index(self):
+        """Writes the index, the file is replaced atomically"""
+        self.file.flush()
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump({'size': os.path.getsize(self.path), 'frames': self.index}, file)
+        os.replace(tmp_path, self.index_path)
+        self.changed = False
+
+    def compact(self):
+        """Rewrites the archive without the frames which were replaced"""
+        tmp_path = self.path + '.tmp'
+        index = {}
+        with open(tmp_path, 'wb') as file:
+            for name, (offset, length, frame_digest) in self.index.items():
+                self.file.seek(offset)
+                index[name] = [file.tell(), length, frame_digest]
+                file.write(self.file.read(length))
+        self.file.close()
+        os.replace(tmp_path, self.path)
+        self.file = open(self.path, 'a+b')
+        self.index = index
+        self.save_index()
+
+    def close(self):
+        if self.file is not None:
+            if self.changed:
+                self.save_index()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_geometry(name, directory='xyz'):
+    """Reads one geometry of the archive in directory (elements, coordinates, comment line)"""
+    with XYZArchive(directory) as archive:
+        return archive.read(name)